@@ -0,0 +1,203 @@
+# app/analytics/store.py
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterator, List, Optional
+
+
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", "app/analytics.sqlite3")
+ANALYTICS_LOG_FILE = "app/analytics_log.jsonl"
+ANALYTICS_PAGE_LIMIT = 500
+
+_INSERT = (
+    "INSERT INTO events (ts, request_type, session_id, question, sources_used, "
+    "llm_backend, record) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def to_epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Parses an ISO-8601 timestamp; naive values are taken as UTC, like the log's."""
+    if not timestamp:
+        return None
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class AnalyticsStore:
+    """
+    Analytics records in an indexed, WAL-mode SQLite table, so the analytics
+    API can filter, page and aggregate without reading the whole log. The
+    full record is kept as JSON next to the indexed columns.
+    """
+
+    def __init__(self, path: str = ANALYTICS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                request_type TEXT,
+                session_id TEXT,
+                question TEXT,
+                sources_used INTEGER,
+                llm_backend TEXT,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+            CREATE INDEX IF NOT EXISTS events_type_ts ON events (request_type, ts);
+            CREATE INDEX IF NOT EXISTS events_session_ts ON events (session_id, ts);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(record: dict) -> tuple:
+        question = record.get("user_input")
+        return (
+            to_epoch(record.get("timestamp")) or datetime.now(timezone.utc).timestamp(),
+            record.get("request_type"),
+            record.get("session_id"),
+            question.strip().lower() if isinstance(question, str) else None,
+            record.get("sources_used"),
+            record.get("llm_backend"),
+            json.dumps(record, default=str),
+        )
+
+    def insert_many(self, records: List[dict]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(_INSERT, [self._row(r) for r in records])
+
+    def backfill(self, log_path: str) -> int:
+        """Imports an existing JSONL log once; later calls, from any worker, do nothing."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone():
+                return 0
+            conn.execute("INSERT INTO meta (key, value) VALUES ('backfilled', ?)", (log_path,))
+            if not os.path.exists(log_path):
+                return 0
+            rows = []
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rows.append(self._row(json.loads(line)))
+                    except (ValueError, AttributeError):
+                        continue
+            conn.executemany(_INSERT, rows)
+        print(f"Imported {len(rows)} analytics records from {log_path}.")
+        return len(rows)
+
+    @staticmethod
+    def _where(start=None, end=None, request_type=None, session_id=None, after_id=None):
+        clauses, params = [], []
+        for clause, value in (
+            ("ts >= ?", to_epoch(start)),
+            ("ts < ?", to_epoch(end)),
+            ("request_type = ?", request_type),
+            ("session_id = ?", session_id),
+            ("id > ?", after_id),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit: int = 100, cursor: Optional[str] = None, **filters) -> dict:
+        """One page of records, oldest first, and the cursor for the next page."""
+        limit = max(1, min(limit, ANALYTICS_PAGE_LIMIT))
+        where, params = self._where(after_id=int(cursor) if cursor else None, **filters)
+        rows = self._connection().execute(
+            f"SELECT id, record FROM events{where} ORDER BY id LIMIT ?", params + [limit + 1]
+        ).fetchall()
+        page = rows[:limit]
+        return {
+            "data": [json.loads(record) for _, record in page],
+            "next_cursor": str(page[-1][0]) if len(rows) > limit else None,
+        }
+
+    def export(self, batch_size: int = 1000, **filters) -> Iterator[str]:
+        """Every matching record as JSONL lines, read in batches."""
+        after_id = None
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            while True:
+                where, params = self._where(after_id=after_id, **filters)
+                rows = conn.execute(
+                    f"SELECT id, record FROM events{where} ORDER BY id LIMIT ?",
+                    params + [batch_size],
+                ).fetchall()
+                if not rows:
+                    return
+                yield "".join(record + "\n" for _, record in rows)
+                after_id = rows[-1][0]
+        finally:
+            conn.close()
+
+    def summary(self, top: int = 10, **filters) -> dict:
+        where, params = self._where(**filters)
+        conn = self._connection()
+        total, avg_sources, routed, fallbacks = conn.execute(
+            f"SELECT COUNT(*), AVG(sources_used), COUNT(llm_backend), "
+            f"SUM(llm_backend = 'fallback') FROM events{where}",
+            params,
+        ).fetchone()
+        per_hour = conn.execute(
+            f"SELECT CAST(ts / 3600 AS INTEGER) AS hour, COUNT(*) FROM events{where} "
+            f"GROUP BY hour ORDER BY hour",
+            params,
+        ).fetchall()
+        question_filter = " AND question IS NOT NULL" if where else " WHERE question IS NOT NULL"
+        top_questions = conn.execute(
+            f"SELECT question, COUNT(*) AS n FROM events{where}{question_filter} "
+            f"GROUP BY question ORDER BY n DESC LIMIT ?",
+            params + [top],
+        ).fetchall()
+        by_type = conn.execute(
+            f"SELECT request_type, COUNT(*) FROM events{where} GROUP BY request_type",
+            params,
+        ).fetchall()
+        return {
+            "requests": total,
+            "requests_by_type": {t or "unknown": n for t, n in by_type},
+            "requests_per_hour": [
+                {
+                    "hour": datetime.fromtimestamp(hour * 3600, timezone.utc).isoformat(),
+                    "requests": n,
+                }
+                for hour, n in per_hour
+            ],
+            "top_questions": [{"question": q, "count": n} for q, n in top_questions],
+            "avg_sources_used": round(avg_sources, 2) if avg_sources is not None else None,
+            "fallback_rate": round(fallbacks / routed, 4) if routed else None,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_analytics_store() -> AnalyticsStore:
+    """The process-wide store, opened (and the JSONL log backfilled) on first use."""
+    store = AnalyticsStore()
+    store.backfill(ANALYTICS_LOG_FILE)
+    return store
@@ -0,0 +1,47 @@
+# app/analytics/trace.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+_TRACE: ContextVar[Optional[dict]] = ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def request_trace():
+    """
+    Opens a per-request dict that components deep inside a chain can annotate
+    and LearningAnalyzer can read. LangChain copies the context into every
+    step, thread and task it starts, and all the copies share this one dict.
+    """
+    token = _TRACE.set({})
+    try:
+        yield _TRACE.get()
+    finally:
+        _TRACE.reset(token)
+
+
+def annotate(**fields) -> None:
+    """Records fields on the current request's trace; a no-op outside a request."""
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+def current_trace() -> dict:
+    return dict(_TRACE.get() or {})
+
+
+class RequestTraceMiddleware:
+    """ASGI middleware that opens a request trace around every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_trace():
+            await self.app(scope, receive, send)
@@ -0,0 +1,170 @@
+# app/analytics/writer.py
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still whole-batch writes, just unlocked.
+    fcntl = None
+
+
+ANALYTICS_QUEUE_SIZE = int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000"))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "100"))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "1.0"))
+ANALYTICS_MAX_BYTES = int(os.getenv("ANALYTICS_MAX_BYTES", str(50 * 1024 * 1024)))
+ANALYTICS_BACKUPS = int(os.getenv("ANALYTICS_BACKUPS", "5"))
+# "drop" discards records when the queue is full; "block" waits up to
+# ANALYTICS_BLOCK_SECONDS for room and then drops.
+ANALYTICS_QUEUE_POLICY = os.getenv("ANALYTICS_QUEUE_POLICY", "drop")
+ANALYTICS_BLOCK_SECONDS = float(os.getenv("ANALYTICS_BLOCK_SECONDS", "0.05"))
+
+_STOP = object()
+
+
+class AnalyticsWriter:
+    """
+    Appends analytics records to a JSONL file from a background thread, so
+    requests only pay for a queue put. Records are flushed in batches when
+    `batch_size` are waiting or `flush_seconds` have passed. Each flush is one
+    append under an exclusive lock on `<path>.lock`, so several server
+    workers can share the file, and the file is rotated to `.1` ... `.N` once
+    it grows past `max_bytes`. Batches are also inserted into `store`, when
+    one is given, for the analytics API.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        queue_size: int = ANALYTICS_QUEUE_SIZE,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_seconds: float = ANALYTICS_FLUSH_SECONDS,
+        max_bytes: int = ANALYTICS_MAX_BYTES,
+        backups: int = ANALYTICS_BACKUPS,
+        policy: str = ANALYTICS_QUEUE_POLICY,
+        block_seconds: float = ANALYTICS_BLOCK_SECONDS,
+        store=None,
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown analytics queue policy: {policy}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.policy = policy
+        self.block_seconds = block_seconds
+        self.store = store
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="analytics-writer", daemon=True
+                )
+                self._thread.start()
+
+    def write(self, record: dict) -> bool:
+        """Queues a record; returns False if it was dropped."""
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put(record, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_seconds
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _flush(self, batch) -> None:
+        if not batch:
+            return
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if (
+                        self.backups
+                        and os.path.exists(self.path)
+                        and os.path.getsize(self.path) >= self.max_bytes
+                    ):
+                        self._rotate()
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(data)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+            self.written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Analytics flush of {len(batch)} records failed: {e}")
+        if self.store is not None:
+            try:
+                self.store.insert_many(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Analytics store insert of {len(batch)} records failed: {e}")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flushes queued records and stops the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("Analytics queue still full at shutdown; remaining records are lost.")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "policy": self.policy,
+        }
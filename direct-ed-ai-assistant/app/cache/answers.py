@@ -0,0 +1,237 @@
+# app/cache/answers.py
+
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from langchain_core.runnables import RunnableGenerator, RunnableLambda
+
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+SCOPE_FIELDS = ("request_type", "user_type", "difficulty_level", "subject")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(question: str) -> str:
+    return " ".join(_WORD_RE.findall((question or "").lower()))
+
+
+@dataclass
+class _Entry:
+    value: dict
+    vector: Optional[np.ndarray]
+    created: float
+    latency: float
+
+
+class SemanticAnswerCache:
+    """
+    Caches chain outputs per (request_type, user_type, difficulty_level,
+    subject) scope. A lookup first tries the normalized question exactly, then
+    the most similar cached question in the same scope whose cosine similarity
+    clears `similarity_threshold`. The whole cache is dropped when the vector
+    store on disk changes, so answers never outlive a re-ingestion.
+    """
+
+    def __init__(
+        self,
+        embeddings=None,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        index_path: Optional[str] = "app/vector_store",
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_path = index_path
+        self._entries: "OrderedDict[Tuple[tuple, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on invalidation, so answers computed before it are not stored after it.
+        self.generation = 0
+        self._index_version = self._read_index_version()
+        self._version_checked = time.monotonic()
+        self.stats: Dict[str, float] = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "latency_saved_seconds": 0.0,
+        }
+
+    # -- invalidation ---------------------------------------------------------
+
+    def _read_index_version(self):
+        if not self.index_path or not os.path.isdir(self.index_path):
+            return None
+        newest = 0.0
+        for root, _, files in os.walk(self.index_path):
+            for name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+        return newest
+
+    def _check_index_version(self) -> None:
+        now = time.monotonic()
+        if now - self._version_checked < 5:
+            return
+        self._version_checked = now
+        version = self._read_index_version()
+        if version != self._index_version:
+            self._index_version = version
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.stats["invalidations"] += 1
+
+    # -- lookup / store -------------------------------------------------------
+
+    @staticmethod
+    def scope_for(x: dict) -> tuple:
+        return tuple(x.get(field) for field in SCOPE_FIELDS)
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.embeddings is None or self.similarity_threshold >= 1:
+            return None
+        try:
+            vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        except Exception as e:
+            print(f"Answer cache embedding failed: {e}. Using exact matches only.")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - entry.created > self.ttl_seconds
+
+    def lookup(self, question: str, scope: tuple) -> Tuple[Optional[dict], Optional[np.ndarray]]:
+        """Returns (cached value or None, query vector for a later store)."""
+        self._check_index_version()
+        key = (scope, normalize(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                self.stats["latency_saved_seconds"] += entry.latency
+                return copy.deepcopy(entry.value), None
+
+        vector = self._embed(question)
+        if vector is not None:
+            with self._lock:
+                candidates = [
+                    (k, e)
+                    for k, e in self._entries.items()
+                    if k[0] == scope and e.vector is not None and not self._expired(e, now)
+                ]
+                if candidates:
+                    scores = np.stack([e.vector for _, e in candidates]) @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        best_key, entry = candidates[best]
+                        self._entries.move_to_end(best_key)
+                        self.stats["semantic_hits"] += 1
+                        self.stats["latency_saved_seconds"] += entry.latency
+                        return copy.deepcopy(entry.value), vector
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, vector
+
+    def store(
+        self,
+        question: str,
+        scope: tuple,
+        value: dict,
+        latency: float,
+        vector=None,
+        generation: Optional[int] = None,
+    ) -> None:
+        if not value or not value.get("answer"):
+            return
+        key = (scope, normalize(question))
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = _Entry(copy.deepcopy(value), vector, time.time(), latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            total = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+
+def with_answer_cache(chain, cache: SemanticAnswerCache, question_fn: Callable[[dict], str]):
+    """
+    Wraps `chain` so cached outputs are returned without running it. On a miss
+    the chain runs as usual (streaming included) and its output is stored.
+    """
+    if cache is None or not ANSWER_CACHE_ENABLED:
+        return chain
+
+    def recorder(question: str, scope: tuple, vector, start: float, generation: int):
+        def record(chunks):
+            final = None
+            for chunk in chunks:
+                final = chunk if final is None else final + chunk
+                yield chunk
+            cache.store(
+                question,
+                scope,
+                dict(final or {}),
+                time.perf_counter() - start,
+                vector,
+                generation,
+            )
+
+        async def arecord(chunks):
+            final = None
+            async for chunk in chunks:
+                final = chunk if final is None else final + chunk
+                yield chunk
+            cache.store(
+                question,
+                scope,
+                dict(final or {}),
+                time.perf_counter() - start,
+                vector,
+                generation,
+            )
+
+        return RunnableGenerator(record, arecord)
+
+    def route(x: dict):
+        question, scope = question_fn(x), cache.scope_for(x)
+        start = time.perf_counter()
+        generation = cache.generation
+        cached, vector = cache.lookup(question, scope)
+        if cached is not None:
+            return cached
+        return chain | recorder(question, scope, vector, start, generation)
+
+    return RunnableLambda(route).with_config({"run_name": "AnswerCache"})
@@ -0,0 +1,201 @@
+# app/cache/content_bank.py
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableLambda
+
+from app.retrieval.scoped import tokenize
+
+
+CONTENT_BANK_PATH = os.getenv("CONTENT_BANK_PATH", "app/content_bank.sqlite3")
+CONTENT_BANK_ENABLED = os.getenv("CONTENT_BANK_ENABLED", "true").lower() == "true"
+CONTENT_BANK_MIN_COVERAGE = float(os.getenv("CONTENT_BANK_MIN_COVERAGE", "0.6"))
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+# The defaults ContentGenerator's prompts fall back to.
+DEFAULT_DIFFICULTY = {"quiz_generation": "intermediate", "flashcard_creation": "beginner"}
+
+# Words that ask for content rather than name a topic ("make me a quiz on ...").
+REQUEST_WORDS = {
+    "quiz", "quizzes", "flashcard", "flashcards", "card", "cards", "question",
+    "questions", "practice", "test", "exam", "generate", "create", "make",
+    "give", "some", "set", "study", "revise", "review", "please", "beginner",
+    "intermediate", "advanced", "level", "topic", "topics", "lesson",
+}
+
+
+class ContentBank:
+    """
+    Quizzes and flashcards generated ahead of time for each curriculum
+    module and difficulty level, in a WAL-mode SQLite file written by
+    pregenerate_content.py. Each entry is committed as it is generated, so an
+    interrupted batch run resumes where it stopped, and a running server sees
+    new entries straight away.
+    """
+
+    def __init__(self, path: str = CONTENT_BANK_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, float] = {
+            "hits": 0,
+            "no_module": 0,
+            "too_specific": 0,
+            "not_generated": 0,
+            "latency_saved_seconds": 0.0,
+        }
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS content (
+                request_type TEXT NOT NULL,
+                track TEXT NOT NULL,
+                module TEXT NOT NULL,
+                difficulty_level TEXT NOT NULL,
+                variant INTEGER NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                generation_seconds REAL,
+                created REAL NOT NULL,
+                PRIMARY KEY (request_type, track, module, difficulty_level, variant)
+            );
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(
+        self,
+        request_type: str,
+        track: str,
+        module: str,
+        difficulty_level: str,
+        variant: int,
+        value: dict,
+        generation_seconds: float,
+    ) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                request_type,
+                track,
+                module,
+                difficulty_level,
+                variant,
+                value["answer"],
+                json.dumps(value.get("sources", [])),
+                generation_seconds,
+                time.time(),
+            ),
+        )
+
+    def keys(self) -> set:
+        """(request_type, track, module, difficulty_level, variant) of every stored entry."""
+        rows = self._connection().execute(
+            "SELECT request_type, track, module, difficulty_level, variant FROM content"
+        )
+        return {tuple(row) for row in rows}
+
+    def get(
+        self, request_type: str, track: str, module: str, difficulty_level: str
+    ) -> Optional[Tuple[dict, float]]:
+        """A random stored variant for the key and the time it took to generate, or None."""
+        rows = self._connection().execute(
+            "SELECT answer, sources, generation_seconds FROM content "
+            "WHERE request_type = ? AND track = ? AND module = ? AND difficulty_level = ?",
+            (request_type, track, module, difficulty_level),
+        ).fetchall()
+        if not rows:
+            return None
+        answer, sources, seconds = random.choice(rows)
+        return {"answer": answer, "sources": json.loads(sources)}, seconds or 0.0
+
+    def _count(self, outcome: str, seconds: float = 0.0) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["latency_saved_seconds"] += seconds
+
+    def match(self, x: dict, scope_router) -> Optional[dict]:
+        """
+        The banked content for a request, if its topic is a whole module: most
+        of the question's topic words (or the subject's, when the question has
+        none) are in the name of exactly one module or its track, so "quiz me
+        on React" is served from Module 2's bank and "quiz me on useEffect
+        cleanup" or "quiz me on Git" are generated live. Lesson names are not
+        matched, since the bank holds one set per module, not per lesson.
+        """
+        request_type = x.get("request_type")
+        if request_type not in DEFAULT_DIFFICULTY:
+            return None
+        terms = [t for t in tokenize(x.get("input") or "") if t not in REQUEST_WORDS]
+        if not terms:
+            terms = [t for t in tokenize(x.get("subject") or "") if t not in REQUEST_WORDS]
+        coverage = []
+        for track, module in scope_router.modules if terms else ():
+            name = set(tokenize(f"{track} {module}"))
+            coverage.append((sum(t in name for t in terms) / len(terms), (track, module)))
+        coverage.sort(reverse=True)
+        best = coverage[0][0] if coverage else 0.0
+        if not best or (len(coverage) > 1 and coverage[1][0] == best):
+            self._count("no_module")
+            return None
+        if best < CONTENT_BANK_MIN_COVERAGE:
+            self._count("too_specific")
+            return None
+        track, module = coverage[0][1]
+        difficulty = x.get("difficulty_level") or DEFAULT_DIFFICULTY[request_type]
+        found = self.get(request_type, track, module, difficulty)
+        if found is None:
+            self._count("not_generated")
+            return None
+        value, seconds = found
+        self._count("hits", seconds)
+        return value
+
+    def metrics(self) -> dict:
+        entries = self._connection().execute("SELECT COUNT(*) FROM content").fetchone()[0]
+        with self._lock:
+            lookups = sum(self.stats[k] for k in ("hits", "no_module", "too_specific", "not_generated"))
+            return {
+                **self.stats,
+                "entries": entries,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+def with_content_bank(chain, bank: ContentBank, get_router):
+    """
+    Serves quiz and flashcard requests whose topic is a whole module from the
+    bank and sends everything else to `chain`. `get_router` returns the scope
+    router of the index currently served, or None when routing is off.
+    """
+    if not CONTENT_BANK_ENABLED:
+        return chain
+
+    def route(x: dict):
+        scope_router = get_router()
+        if scope_router is None:
+            return chain
+        try:
+            banked = bank.match(x, scope_router)
+        except Exception as e:
+            print(f"Content bank lookup failed: {e}. Generating live.")
+            banked = None
+        return banked if banked is not None else chain
+
+    return RunnableLambda(route).with_config({"run_name": "ContentBank"})
+
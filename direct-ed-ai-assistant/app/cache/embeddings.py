@@ -0,0 +1,161 @@
+# app/cache/embeddings.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "app/embedding_cache.sqlite3")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# SQLite's default limit on host parameters per statement is 999.
+_LOOKUP_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with a disk cache keyed by (model, text hash).
+    Vectors are stored as float32 or float16 blobs in a WAL-mode SQLite file,
+    so the ingestion script and every server worker share the same cache.
+    When the cache grows past `max_bytes` the least recently used vectors are
+    evicted.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        path: str = EMBEDDING_CACHE_PATH,
+        dtype: str = EMBEDDING_CACHE_DTYPE,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        model: Optional[str] = None,
+    ):
+        self.underlying = underlying
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.model = model or getattr(underlying, "model", type(underlying).__name__)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        conn = self._connection()
+        for i in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[i : i + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})",
+                batch,
+            ).fetchall()
+            for key, dtype, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        if found:
+            now = time.time()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def _round_trip(self, vector: List[float]) -> List[float]:
+        """The vector as it will read back from the cache, so hits and misses agree."""
+        if self.dtype == np.float32:
+            return vector
+        return np.asarray(vector, dtype=self.dtype).astype(np.float32).tolist()
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (key, self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        if rows:
+            self._evict(len(rows[0][2]))
+
+    def _evict(self, row_bytes: int) -> None:
+        # Vectors of one model all have the same size, so the row count is
+        # enough to estimate the cache size without scanning the blobs.
+        max_rows = max(self.max_bytes // max(row_bytes, 1), 1)
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= max_rows:
+            return
+        # Trim to 90% of the budget so eviction does not run on every insert.
+        with conn:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - int(max_rows * 0.9),),
+            )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        self.hits += len(texts) - sum(1 for k in keys if k not in found)
+        self.misses += len(missing)
+        if missing:
+            by_key = dict(zip(keys, texts))
+            vectors = self.underlying.embed_documents([by_key[k] for k in missing])
+            computed = {k: self._round_trip(v) for k, v in zip(missing, vectors)}
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        vector = self._round_trip(self.underlying.embed_query(text))
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,315 @@
+# app/cache/single_flight.py
+
+import asyncio
+import copy
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableSerializable
+from pydantic import ConfigDict
+
+from app.cache.answers import SCOPE_FIELDS, normalize
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+def flight_key(x: dict) -> tuple:
+    """Requests with the same normalized question and scope share one execution."""
+    return (normalize(x.get("input") or ""),) + tuple(x.get(field) for field in SCOPE_FIELDS)
+
+
+class _LeaderGone(Exception):
+    """The request running a flight was cancelled before it finished."""
+
+
+class SharedGenerationCancelled(RuntimeError):
+    """
+    Raised to a follower whose leader was cancelled after some of its output
+    had already been replayed, so the answer cannot be completed or rerun.
+    """
+
+    def __init__(self):
+        super().__init__("shared generation was cancelled mid-stream")
+
+
+class _Flight:
+    """The output of one in-flight execution, replayed to every request that joins it."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._listeners = set()
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for listener in list(self._listeners):
+            listener()
+
+    def publish(self, chunk: Any) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._notify()
+
+    def replay(self) -> Iterator[Any]:
+        seen = 0
+        while True:
+            with self._cond:
+                while seen == len(self.chunks) and not self.done:
+                    self._cond.wait()
+                new, done, error = self.chunks[seen:], self.done, self.error
+            for chunk in new:
+                yield copy.deepcopy(chunk)
+            seen += len(new)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    async def areplay(self) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        seen = 0
+        while True:
+            changed = asyncio.Event()
+
+            def listener():
+                loop.call_soon_threadsafe(changed.set)
+
+            with self._cond:
+                new, done, error = self.chunks[seen:], self.done, self.error
+                if not new and not done:
+                    self._listeners.add(listener)
+            if not new and not done:
+                try:
+                    await changed.wait()
+                finally:
+                    with self._cond:
+                        self._listeners.discard(listener)
+                continue
+            for chunk in new:
+                yield copy.deepcopy(chunk)
+            seen += len(new)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Tracks executions in flight by key. The first request for a key leads and
+    runs the chain; requests that arrive while it runs follow, receiving the
+    leader's chunks as they are produced (or its error) instead of running the
+    chain again. A key leaves the table as soon as its leader finishes, so
+    later requests start fresh and the answer cache serves repeats from there.
+    """
+
+    def __init__(self):
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "leaders": 0,
+            "followers": 0,
+            "leaders_cancelled": 0,
+            "followers_rerun": 0,
+        }
+
+    def join(self, key: tuple):
+        """Returns (flight, True) for a new leader or (flight, False) for a follower."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["followers"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def land(self, key: tuple, flight: _Flight, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if isinstance(error, _LeaderGone):
+                self.stats["leaders_cancelled"] += 1
+        flight.finish(error)
+
+    def rerun(self) -> None:
+        with self._lock:
+            self.stats["followers_rerun"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            requests = self.stats["leaders"] + self.stats["followers"]
+            return {
+                **self.stats,
+                "requests": requests,
+                "in_flight": len(self._flights),
+                "coalescing_ratio": (
+                    round(self.stats["followers"] / requests, 4) if requests else 0.0
+                ),
+            }
+
+
+def _merge(chunks: Iterator[Any]) -> Any:
+    final = None
+    for chunk in chunks:
+        final = chunk if final is None else final + chunk
+    return final
+
+
+class SingleFlightRunnable(RunnableSerializable):
+    """Runs `bound` once per key among concurrent requests; see SingleFlight."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    bound: Runnable
+    flights: Any
+    key_fn: Callable[[Any], tuple]
+
+    @property
+    def InputType(self):
+        return self.bound.InputType
+
+    @property
+    def OutputType(self):
+        return self.bound.OutputType
+
+    def _lead(self, key, flight, chunks: Iterator[Any]) -> Iterator[Any]:
+        try:
+            for chunk in chunks:
+                flight.publish(chunk)
+                yield chunk
+        except Exception as e:
+            self.flights.land(key, flight, e)
+            raise
+        except BaseException:
+            self.flights.land(key, flight, _LeaderGone())
+            raise
+        self.flights.land(key, flight)
+
+    async def _alead(self, key, flight, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        try:
+            async for chunk in chunks:
+                flight.publish(chunk)
+                yield chunk
+        except Exception as e:
+            self.flights.land(key, flight, e)
+            raise
+        except BaseException:
+            self.flights.land(key, flight, _LeaderGone())
+            raise
+        self.flights.land(key, flight)
+
+    def _follow(self, flight, rerun: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Replays the leader's output; reruns the chain if the leader was
+        cancelled before its first chunk, and raises SharedGenerationCancelled
+        if it was cancelled after.
+        """
+        replayed = False
+        try:
+            for chunk in flight.replay():
+                replayed = True
+                yield chunk
+        except _LeaderGone:
+            if replayed:
+                raise SharedGenerationCancelled() from None
+            self.flights.rerun()
+            yield from rerun()
+
+    async def _afollow(self, flight, rerun: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        replayed = False
+        try:
+            async for chunk in flight.areplay():
+                replayed = True
+                yield chunk
+        except _LeaderGone:
+            if replayed:
+                raise SharedGenerationCancelled() from None
+            self.flights.rerun()
+            async for chunk in rerun():
+                yield chunk
+
+    def _once(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[Any]:
+        yield self.bound.invoke(input, config, **kwargs)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = self.key_fn(input)
+        flight, leader = self.flights.join(key)
+        if leader:
+            return _merge(self._lead(key, flight, self._once(input, config, **kwargs)))
+        return _merge(self._follow(flight, lambda: self._once(input, config, **kwargs)))
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        key = self.key_fn(input)
+        flight, leader = self.flights.join(key)
+        if leader:
+            try:
+                output = await self.bound.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self.flights.land(key, flight, e)
+                raise
+            except BaseException:
+                self.flights.land(key, flight, _LeaderGone())
+                raise
+            flight.publish(output)
+            self.flights.land(key, flight)
+            return output
+
+        async def rerun():
+            yield await self.bound.ainvoke(input, config, **kwargs)
+
+        final = None
+        async for chunk in self._afollow(flight, rerun):
+            final = chunk if final is None else final + chunk
+        return final
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        key = self.key_fn(input)
+        flight, leader = self.flights.join(key)
+        if leader:
+            yield from self._lead(key, flight, self.bound.stream(input, config, **kwargs))
+        else:
+            yield from self._follow(flight, lambda: self.bound.stream(input, config, **kwargs))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        key = self.key_fn(input)
+        flight, leader = self.flights.join(key)
+        if leader:
+            chunks = self._alead(key, flight, self.bound.astream(input, config, **kwargs))
+        else:
+            chunks = self._afollow(flight, lambda: self.bound.astream(input, config, **kwargs))
+        async for chunk in chunks:
+            yield chunk
+
+    def transform(
+        self, input: Iterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[Any]:
+        # The key needs the whole request, so the input is collected first.
+        yield from self.stream(_merge(input), config, **kwargs)
+
+    async def atransform(
+        self, input: AsyncIterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        final = None
+        async for chunk in input:
+            final = chunk if final is None else final + chunk
+        async for chunk in self.astream(final, config, **kwargs):
+            yield chunk
+
+
+def with_single_flight(chain: Runnable, flights: SingleFlight, key_fn=flight_key) -> Runnable:
+    """`chain` with concurrent identical requests coalesced, unless SINGLE_FLIGHT_ENABLED is off."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return chain
+    return SingleFlightRunnable(bound=chain, flights=flights, key_fn=key_fn)
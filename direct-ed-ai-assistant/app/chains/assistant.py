@@ -0,0 +1,120 @@
+# app/chains/assistant.py
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncio
+import os
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.history import RunnableWithMessageHistory
+
+from app.memory.history import build_history_store
+from app.monitoring.callbacks import StageMetricsHandler
+from app.schemas.api_models import ChatInput, ChatOutput
+
+
+# "background" warms up after startup while /ready reports 503, "blocking"
+# warms up before the server accepts requests, "off" builds on first use.
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background")
+
+_router = None
+_lock = threading.Lock()
+startup = {"loaded": False, "load_seconds": None, "warmed_up": False, "warmup": None, "error": None}
+
+
+def load_router():
+    """
+    Imports app.chains.router, which builds the vector store, LLM and
+    embedding clients, caches and chains, the first time it is needed.
+    """
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                start = time.perf_counter()
+                import app.chains.router as router
+
+                startup["load_seconds"] = round(time.perf_counter() - start, 3)
+                startup["loaded"] = True
+                _router = router
+    return _router
+
+
+async def aload_router():
+    """load_router() without blocking the event loop while the router is built."""
+    if _router is not None:
+        return _router
+    return await asyncio.to_thread(load_router)
+
+
+def loaded_router():
+    """The router module if it has been built, else None."""
+    return _router
+
+
+def warm_up() -> dict:
+    try:
+        startup["warmup"] = load_router().warm_up()
+        startup["warmed_up"] = True
+        print(f"Warm-up finished: loaded in {startup['load_seconds']}s, {startup['warmup']}")
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+        print(f"Warm-up failed: {startup['error']}")
+    return startup
+
+
+def is_ready() -> bool:
+    if WARMUP_MODE == "off":
+        return startup["error"] is None
+    return startup["warmed_up"]
+
+
+def deferred(name: str):
+    """A runnable that resolves to `router.<name>` at call time, building it if needed."""
+
+    async def aresolve(x):
+        return getattr(await aload_router(), name)
+
+    return RunnableLambda(lambda x: getattr(load_router(), name), afunc=aresolve, name=name)
+
+
+history_store = build_history_store()
+
+
+def get_memory_for_session(session_id: str):
+    return history_store.get(session_id)
+
+
+stage_metrics = StageMetricsHandler(
+    stages=[
+        "HistoryPolicy",
+        "CondenseQuestion",
+        "EducationalRetriever",
+        "EducationalRetriever_Quiz",
+        "EducationalRetriever_Flashcard",
+        "AdaptiveConversationLLM",
+        "QuizGenerator",
+        "FlashcardGenerator",
+        "LearningAnalyzer",
+    ]
+)
+
+chat_chain_with_history = RunnableWithMessageHistory(
+    deferred("educational_assistant_chain"),
+    get_memory_for_session,
+    input_messages_key="input",
+    history_messages_key="chat_history",
+    output_messages_key="answer",
+).with_types(input_type=ChatInput, output_type=ChatOutput).with_config(
+    {"callbacks": [stage_metrics]}
+)
+
+content_generation_chain = (
+    deferred("content_generation_chain")
+    .with_types(input_type=ChatInput, output_type=ChatOutput)
+    .with_config({"callbacks": [stage_metrics]})
+)
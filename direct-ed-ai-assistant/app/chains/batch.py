@@ -0,0 +1,84 @@
+# app/chains/batch.py
+
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List
+
+from app.analytics.trace import request_trace
+from app.llms.scheduler import AdmissionRejected
+from app.retrieval.shared import shared_retrieval
+
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+
+async def _run_item(chain, index: int, item: dict, semaphore: asyncio.Semaphore) -> dict:
+    # Each item is logged as its own request, so it gets its own trace rather
+    # than annotating the batch request's.
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            with request_trace():
+                output = await chain.ainvoke(item)
+            result = {
+                "index": index,
+                "status": "ok",
+                "output": {"answer": output.get("answer"), "sources": output.get("sources")},
+            }
+        except AdmissionRejected as e:
+            result = {
+                "index": index,
+                "status": "error",
+                "status_code": e.status_code,
+                "retry_after": e.retry_after,
+                "error": e.detail,
+            }
+        except Exception as e:
+            result = {
+                "index": index,
+                "status": "error",
+                "status_code": 500,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+
+async def run_batch(chain, items: List[dict], concurrency: int) -> AsyncIterator[dict]:
+    """
+    Runs `chain` on every item, at most `concurrency` at a time, and yields
+    each item's result as soon as it completes, then a summary. Items whose
+    retrieval query is the same share one search. A failed item is reported
+    in its result and does not stop the others.
+    """
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    # The tasks copy the context they are created in, so they all see this batch's retrieval.
+    with shared_retrieval() as shared:
+        tasks = [
+            asyncio.create_task(_run_item(chain, i, item, semaphore))
+            for i, item in enumerate(items)
+        ]
+    counts = {"ok": 0, "error": 0}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            counts[result["status"]] += 1
+            yield result
+    finally:
+        # The client went away: stop the items that have not finished.
+        for task in tasks:
+            task.cancel()
+    yield {
+        "summary": {
+            "items": len(items),
+            "succeeded": counts["ok"],
+            "failed": counts["error"],
+            "concurrency": concurrency,
+            "retrieval": dict(shared.stats),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    }
@@ -0,0 +1,122 @@
+# app/chains/condense.py
+
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple
+
+from langchain_core.messages import HumanMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from app.prompts.templates import condense_question_prompt
+
+
+# Words that usually point back at something earlier in the conversation.
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "this", "that", "these", "those", "they", "them",
+    "their", "he", "she", "him", "her", "there", "above", "previous",
+    "earlier", "same", "again", "more", "else", "other", "another", "former",
+    "latter", "one", "ones",
+}
+FOLLOW_UP_OPENERS = (
+    "and ", "but ", "so ", "also ", "then ", "what about", "how about",
+    "why", "example", "elaborate", "explain more", "continue", "go on",
+)
+MIN_SELF_CONTAINED_WORDS = 4
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+def is_self_contained(question: str) -> bool:
+    """Cheap check for follow-ups that can be retrieved for as they are."""
+    normalized = normalize_question(question)
+    words = normalized.split()
+    if len(words) < MIN_SELF_CONTAINED_WORDS:
+        return False
+    if normalized.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not FOLLOW_UP_WORDS.intersection(words)
+
+
+class CondenseQuestionStage:
+    """
+    Decides per request whether the condense-question LLM call is needed.
+    Empty history, history without any user turns, and questions that are
+    already self-contained skip the call; everything else is condensed once
+    per (history digest, question) and served from an LRU cache afterwards.
+    """
+
+    def __init__(self, llm, max_cache_entries: int = 2048):
+        self.chain = condense_question_prompt | llm | StrOutputParser()
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _plan(self, x: dict) -> Tuple[str, Optional[str], Optional[dict]]:
+        question = x["input"]
+        history = x.get("chat_history") or []
+        if not history:
+            return "bypass_empty_history", question, None
+        if not any(isinstance(m, HumanMessage) for m in history):
+            return "bypass_irrelevant_history", question, None
+        if is_self_contained(question):
+            return "bypass_self_contained", question, None
+
+        buffer = get_buffer_string(history)
+        key = (hashlib.sha1(buffer.encode("utf-8")).hexdigest(), normalize_question(question))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return "cache_hit", cached, None
+        return "llm", None, {"key": key, "question": question, "chat_history": buffer}
+
+    def _remember(self, key, standalone: str) -> None:
+        with self._lock:
+            self._cache[key] = standalone
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+    def _finish(self, x: dict, route: str, standalone: str) -> dict:
+        with self._lock:
+            self.stats[route] += 1
+            self.stats["requests"] += 1
+        return {**x, "standalone_question": standalone, "condense_route": route}
+
+    def run(self, x: dict, config: RunnableConfig) -> dict:
+        route, standalone, pending = self._plan(x)
+        if pending:
+            standalone = self.chain.invoke(
+                {"question": pending["question"], "chat_history": pending["chat_history"]},
+                config,
+            )
+            self._remember(pending["key"], standalone)
+        return self._finish(x, route, standalone)
+
+    async def arun(self, x: dict, config: RunnableConfig) -> dict:
+        route, standalone, pending = self._plan(x)
+        if pending:
+            standalone = await self.chain.ainvoke(
+                {"question": pending["question"], "chat_history": pending["chat_history"]},
+                config,
+            )
+            self._remember(pending["key"], standalone)
+        return self._finish(x, route, standalone)
+
+    def llm_avoided_ratio(self) -> float:
+        with self._lock:
+            total = self.stats["requests"]
+            return (total - self.stats["llm"]) / total if total else 0.0
+
+    def as_runnable(self):
+        return RunnableLambda(self.run, afunc=self.arun).with_config(
+            {"run_name": "CondenseQuestion"}
+        )
@@ -2,13 +2,16 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-import json
 from datetime import datetime
 import os
+import time
+from typing import Optional
 
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 from app.llms.custom import CustomChatModel
+from app.llms.routing import RoutingChatModel
+from app.llms.scheduler import llm_scheduler, scheduled
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import (
     RunnableBranch,
@@ -17,29 +20,141 @@ from langchain_core.runnables import (
     RunnablePassthrough,
 )
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import get_buffer_string
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 
-from app.schemas.api_models import ChatInput, ChatOutput
+from app.analytics.store import ANALYTICS_LOG_FILE, get_analytics_store
+from app.analytics.trace import current_trace
+from app.analytics.writer import AnalyticsWriter
+from app.monitoring.collectors import (
+    analytics_collector,
+    cache_collector,
+    condense_collector,
+    content_bank_collector,
+    history_collector,
+    retrieval_collector,
+    routing_collector,
+    scheduler_collector,
+    single_flight_collector,
+)
+from app.monitoring.metrics import registry
 from app.prompts.templates import (
     rag_prompt,
     quiz_generator_prompt,
     flashcard_generator_prompt,
-    condense_question_prompt,
 )
-
-vector_store = Chroma(
-    persist_directory="app/vector_store",
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
+from app.chains.condense import CondenseQuestionStage
+from app.memory.policy import HISTORY_SUMMARY_ENABLED, HistoryPolicy
+from app.cache.answers import SemanticAnswerCache, with_answer_cache
+from app.cache.content_bank import ContentBank, with_content_bank
+from app.cache.embeddings import CachedEmbeddings
+from app.cache.single_flight import SingleFlight, with_single_flight
+from app.retrieval.bm25 import load_or_build
+from app.retrieval.numpy_index import load_or_export
+from app.retrieval.packing import (
+    CONTEXT_BUDGET_FINETUNED,
+    CONTEXT_BUDGET_OPENAI,
+    ContextPacker,
 )
+from app.retrieval.scoped import SCOPED_RETRIEVAL_ENABLED, ScopedRetriever, ScopeRouter
+from app.retrieval.snapshots import IndexManager, IndexVersion, load_meta, snapshot_path
+from app.retrieval.shared import shared_candidates
+
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", "app/vector_store/numpy_index")
+NUMPY_INDEX_QUANTIZE = os.getenv("NUMPY_INDEX_QUANTIZE", "false").lower() == "true"
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "app/vector_store/bm25_index")
+
+embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+
+
+def open_index(version):
+    """
+    Loads a published index snapshot, or the working store in app/vector_store
+    when ingest_data.py has not published one yet.
+    """
+    if version is None:
+        vector_store = Chroma(persist_directory="app/vector_store", embedding_function=embeddings)
+        numpy_path, bm25_path = NUMPY_INDEX_PATH, BM25_INDEX_PATH
+    else:
+        path = snapshot_path(version)
+        vector_store = Chroma(
+            collection_name=load_meta(version)["collection"],
+            persist_directory=os.path.join(path, "chroma"),
+            embedding_function=embeddings,
+        )
+        numpy_path, bm25_path = (
+            os.path.join(path, "numpy_index"),
+            os.path.join(path, "bm25_index"),
+        )
+    numpy_index = (
+        load_or_export(vector_store, numpy_path, quantize=NUMPY_INDEX_QUANTIZE)
+        if RETRIEVER_BACKEND == "numpy"
+        else None
+    )
+    scope_router = None
+    if SCOPED_RETRIEVAL_ENABLED:
+        scope_router = (
+            ScopeRouter(numpy_index.metadatas)
+            if numpy_index is not None
+            else ScopeRouter.from_vector_store(vector_store)
+        )
+    return IndexVersion(
+        version,
+        vector_store,
+        numpy_index=numpy_index,
+        lexical_index=load_or_build(vector_store, bm25_path) if HYBRID_RETRIEVAL_ENABLED else None,
+        scope_router=scope_router,
+    )
+
+
+index_manager = IndexManager(open_index)
 openai_llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.1)
-finetuned_llm = CustomChatModel(
-    api_url="https://nutnell-e-learning-platform.hf.space/generate"
-).with_fallbacks([openai_llm])
+custom_llm = CustomChatModel(
+    api_url="https://nutnell-e-learning-platform.hf.space/generate",
+    stream_url=os.getenv("CUSTOM_LLM_STREAM_URL"),
+)
+finetuned_llm = RoutingChatModel(primary=custom_llm, fallback=openai_llm)
+condense_stage = CondenseQuestionStage(scheduled(openai_llm, "tutoring"))
+# Rolling summaries are background work and wait in the lowest-weight LLM queue.
+history_policy = HistoryPolicy(
+    scheduled(openai_llm, "history_summary") if HISTORY_SUMMARY_ENABLED else None
+)
+# Swapping the index clears the cache (see activate_index), so it does not watch the files.
+answer_cache = SemanticAnswerCache(embeddings, index_path=None)
+content_flights = SingleFlight()
+content_bank = ContentBank()
+retriever = ScopedRetriever(
+    search=index_manager.current.search,
+    embeddings=embeddings,
+    router=index_manager.current.scope_router,
+    lexical=index_manager.current.lexical_index,
+    vectors=index_manager.current.vectors,
+    k=15,
+)
+
+
+def activate_index(index) -> None:
+    """Sends new searches to `index` and drops answers built from the previous one."""
+    retriever.swap(index.search, index.scope_router, index.lexical_index, index.vectors)
+    answer_cache.invalidate()
+
+
+index_manager.on_swap.append(activate_index)
+index_manager.start_watching()
+
+# Prompts go to the fine-tuned model unless its breaker is open, in which case
+# they go straight to GPT-3.5 and can use that model's larger budget.
+context_packer = ContextPacker(
+    budget=lambda: (
+        CONTEXT_BUDGET_OPENAI
+        if finetuned_llm.breaker.state == "open"
+        else CONTEXT_BUDGET_FINETUNED
+    )
+)
+
 
 def format_docs(docs):
-    return "\n---\n".join(doc.page_content for doc in docs)
+    return context_packer.pack(docs)
 
 
 def get_sources_from_docs(docs):
@@ -52,40 +167,36 @@ def get_sources_from_docs(docs):
     ]
 
 
-memories = {}
-
-
-def get_memory_for_session(session_id: str):
-    if session_id not in memories:
-        memories[session_id] = ChatMessageHistory()
-    return memories[session_id]
-
-
-def EducationalRetriever():
-    """Component 1: Identifies relevant curriculum content."""
-    return vector_store.as_retriever(search_kwargs={"k": 15})
+def EducationalRetriever(question_key: str = "input", profile: Optional[str] = None):
+    """
+    Component 1: Identifies relevant curriculum content. `profile` selects the
+    chain's k range for adaptive retrieval (see ScopedRetriever).
+    """
+    return RunnableLambda(
+        lambda x, config: retriever.invoke(
+            x[question_key],
+            config,
+            subject=x.get("subject"),
+            module=x.get("module"),
+            profile=profile,
+            candidates=shared_candidates(
+                x[question_key],
+                x.get("subject"),
+                x.get("module"),
+                lambda: retriever.fetch_candidates(
+                    x[question_key], x.get("subject"), x.get("module")
+                ),
+            ),
+        )
+    )
 
 
 def AdaptiveConversationChain():
     """Component 2: Produces personalized explanations using structured prompts and context."""
-    retriever = EducationalRetriever()
-    condense_question_chain = (
-        RunnableLambda(
-            lambda x: {
-                "question": x["input"],
-                "chat_history": get_buffer_string(x["chat_history"]),
-            }
+    answer_chain = RunnablePassthrough.assign(
+        context=EducationalRetriever("standalone_question", "tutoring").with_config(
+            {"run_name": "EducationalRetriever"}
         )
-        | condense_question_prompt
-        | openai_llm
-        | StrOutputParser()
-    )
-    return RunnablePassthrough.assign(
-        standalone_question=condense_question_chain
-    ).assign(
-        context=(
-            RunnableLambda(lambda x: x["standalone_question"]) | retriever
-        ).with_config({"run_name": "EducationalRetriever"})
     ) | RunnableParallel(
         answer=(
             RunnableLambda(
@@ -98,19 +209,24 @@ def AdaptiveConversationChain():
                 }
             )
             | rag_prompt
-            | finetuned_llm.with_config({"run_name": "AdaptiveConversationLLM"})
+            | scheduled(
+                finetuned_llm.with_config({"run_name": "AdaptiveConversationLLM"}), "tutoring"
+            )
             | StrOutputParser()
         ),
         sources=RunnableLambda(lambda x: get_sources_from_docs(x["context"])),
     )
+    return (
+        history_policy.as_runnable()
+        | condense_stage.as_runnable()
+        | with_answer_cache(answer_chain, answer_cache, lambda x: x["standalone_question"])
+    )
 
 
-def ContentGenerator():
-    """Component 3: Creates practice questions, flashcards, and assessments."""
-    retriever = EducationalRetriever()
-
+def ContentGenerationChain():
+    """Retrieval and generation for quizzes and flashcards, without caching."""
     QuizGenerationChain = RunnablePassthrough.assign(
-        context=(RunnableLambda(lambda x: x["input"]) | retriever).with_config(
+        context=EducationalRetriever(profile="quiz_generation").with_config(
             {"run_name": "EducationalRetriever_Quiz"}
         )
     ) | RunnableParallel(
@@ -123,14 +239,16 @@ def ContentGenerator():
                 }
             )
             | quiz_generator_prompt
-            | finetuned_llm.with_config({"run_name": "QuizGenerator"})
+            | scheduled(
+                finetuned_llm.with_config({"run_name": "QuizGenerator"}), "quiz_generation"
+            )
             | StrOutputParser()
         ),
         sources=RunnableLambda(lambda x: get_sources_from_docs(x["context"])),
     )
 
     FlashcardGenerationChain = RunnablePassthrough.assign(
-        context=(RunnableLambda(lambda x: x["input"]) | retriever).with_config(
+        context=EducationalRetriever(profile="flashcard_creation").with_config(
             {"run_name": "EducationalRetriever_Flashcard"}
         )
     ) | RunnableParallel(
@@ -142,7 +260,10 @@ def ContentGenerator():
                 }
             )
             | flashcard_generator_prompt
-            | finetuned_llm.with_config({"run_name": "FlashcardGenerator"})
+            | scheduled(
+                finetuned_llm.with_config({"run_name": "FlashcardGenerator"}),
+                "flashcard_creation",
+            )
             | StrOutputParser()
         ),
         sources=RunnableLambda(lambda x: get_sources_from_docs(x["context"])),
@@ -160,15 +281,27 @@ def ContentGenerator():
     )
 
 
-LOG_FILE = "app/analytics_log.jsonl"
+def ContentGenerator():
+    """Component 3: Creates practice questions, flashcards, and assessments."""
+    content_chain = ContentGenerationChain()
+    # Identical requests in flight at once (a whole class asking the same
+    # thing) share one retrieval and generation; the answer cache covers repeats.
+    live_chain = with_single_flight(
+        with_answer_cache(content_chain, answer_cache, lambda x: x["input"]), content_flights
+    )
+    # Whole-module requests are served from the pre-generated bank.
+    return with_content_bank(live_chain, content_bank, lambda: retriever.router)
+
+
+LOG_FILE = ANALYTICS_LOG_FILE
+analytics_store = get_analytics_store()
+analytics_writer = AnalyticsWriter(LOG_FILE, store=analytics_store)
 
 
 def LearningAnalyzer():
     """Component 4: Monitors user engagement and adapts response approaches."""
 
-    def analyze(input_data):
-        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-
+    def analyze(input_data, config):
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "user_input": input_data.get("input"),
@@ -177,35 +310,58 @@ def LearningAnalyzer():
             "sources_used": len(input_data.get("sources", [])),
             "session_id": input_data.get("config", {})
             .get("configurable", {})
-            .get("session_id"),
+            .get("session_id")
+            or config.get("configurable", {}).get("session_id"),
         }
+        # Which LLM backend answered, recorded by the routing model.
+        log_entry.update(current_trace())
 
-        with open(LOG_FILE, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        analytics_writer.write(log_entry)
 
         return input_data
 
     return RunnableLambda(analyze).with_config({"run_name": "LearningAnalyzer"})
 
 
+content_generator = ContentGenerator()
+
+
 def run_educational_assistant():
     """Central function that invokes components based on user requests."""
     return RunnableBranch(
         (lambda x: x.get("request_type") == "tutoring", AdaptiveConversationChain()),
-        ContentGenerator(),
+        content_generator,
     )
 
 
 educational_assistant_chain = run_educational_assistant() | LearningAnalyzer()
-
-chat_chain_with_history = RunnableWithMessageHistory(
-    educational_assistant_chain,
-    get_memory_for_session,
-    input_messages_key="input",
-    history_messages_key="chat_history",
-    output_messages_key="answer",
-).with_types(input_type=ChatInput, output_type=ChatOutput)
-
-content_generation_chain = (ContentGenerator() | LearningAnalyzer()).with_types(
-    input_type=ChatInput, output_type=ChatOutput
-)
+content_generation_chain = content_generator | LearningAnalyzer()
+
+registry.register_collector(routing_collector(finetuned_llm))
+registry.register_collector(cache_collector(answer_cache, embeddings))
+registry.register_collector(condense_collector(condense_stage))
+registry.register_collector(history_collector(history_policy))
+registry.register_collector(retrieval_collector(retriever, context_packer))
+registry.register_collector(analytics_collector(analytics_writer))
+registry.register_collector(scheduler_collector(llm_scheduler))
+registry.register_collector(single_flight_collector(content_flights))
+registry.register_collector(content_bank_collector(content_bank))
+
+
+def warm_up() -> dict:
+    """
+    Pays the first request's one-off costs up front: loads the vector index
+    into memory with one search and creates the fine-tuned model's connection
+    pools. Returns the seconds each step took.
+    """
+    timings = {}
+
+    # Chroma loads its HNSW index on first search.
+    start = time.perf_counter()
+    index_manager.current.warm()
+    timings["vector_index"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    custom_llm.open()
+    timings["llm_clients"] = round(time.perf_counter() - start, 3)
+    return timings
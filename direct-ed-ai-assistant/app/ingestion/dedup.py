@@ -0,0 +1,148 @@
+# app/ingestion/dedup.py
+
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.85"))
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always collide.
+SHINGLE_WORDS = 5
+# Mersenne prime, so (a * h + b) stays inside uint64 for 32-bit a, b and h.
+_PRIME = (1 << 61) - 1
+_WORD_RE = re.compile(r"\w+")
+
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the text's word 5-gram shingles."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = {
+        " ".join(words[i : i + SHINGLE_WORDS])
+        for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))
+    }
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint64)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+class DedupIndex:
+    """
+    MinHash/LSH index over the canonical chunks in the vector store, persisted
+    beside it so incremental runs can dedupe new chunks against files that are
+    not re-read. Signatures are split into bands; chunks sharing any band
+    bucket are candidates and are confirmed on the full signature. A chunk
+    only matches chunks of the same scope (see `scope_of`), so a duplicate is
+    never folded into a chunk that retrieval filters would place elsewhere.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.scopes: Dict[str, Optional[str]] = {}
+        self._buckets: Dict[tuple, List[str]] = defaultdict(list)
+
+    def _bands(self, signature: np.ndarray):
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            yield band, signature[band * rows : (band + 1) * rows].tobytes()
+
+    def add(self, chunk_id: str, signature: np.ndarray, scope: Optional[str] = None) -> None:
+        self.signatures[chunk_id] = signature
+        self.scopes[chunk_id] = scope
+        for key in self._bands(signature):
+            self._buckets[key].append(chunk_id)
+
+    def remove(self, chunk_ids) -> None:
+        for chunk_id in chunk_ids:
+            signature = self.signatures.pop(chunk_id, None)
+            self.scopes.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for key in self._bands(signature):
+                bucket = self._buckets[key]
+                bucket.remove(chunk_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def find(self, signature: np.ndarray, scope: Optional[str] = None) -> Optional[str]:
+        """The most similar indexed chunk of `scope` at or above the threshold, if any."""
+        best, best_score = None, self.threshold
+        candidates = {c for key in self._bands(signature) for c in self._buckets.get(key, ())}
+        for candidate in candidates:
+            if self.scopes.get(candidate) != scope:
+                continue
+            score = similarity(signature, self.signatures[candidate])
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        ids = list(self.signatures)
+        matrix = (
+            np.stack([self.signatures[i] for i in ids])
+            if ids
+            else np.zeros((0, NUM_PERM), dtype=np.uint64)
+        )
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(ids, dtype=str),
+                signatures=matrix,
+                scopes=np.array([self.scopes.get(i) or "" for i in ids], dtype=str),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = DEDUP_THRESHOLD):
+        index = cls(threshold)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                ids = data["ids"].tolist()
+                # Indexes saved before scopes existed load with no scope.
+                scopes = data["scopes"].tolist() if "scopes" in data.files else [""] * len(ids)
+                for chunk_id, signature, scope in zip(ids, data["signatures"], scopes):
+                    index.add(chunk_id, signature, scope or None)
+        return index
+
+    def unscoped(self) -> bool:
+        return any(scope is None for scope in self.scopes.values())
+
+
+def scope_of(metadata: dict) -> str:
+    """The track and module a chunk is filtered by; duplicates are only merged within one."""
+    return f"{metadata.get('track')}\x1f{metadata.get('module')}"
+
+
+def merge_source_names(*names: str) -> str:
+    """Joins source names, keeping order and dropping repeats."""
+    merged = []
+    for name in names:
+        for part in (name or "").split("; "):
+            if part and part not in merged:
+                merged.append(part)
+    return "; ".join(merged)
+
+
+def path_of(chunk_id: str) -> str:
+    return chunk_id.rsplit("__", 1)[0]
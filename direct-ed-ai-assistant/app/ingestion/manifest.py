@@ -0,0 +1,102 @@
+# app/ingestion/manifest.py
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_metadata(metadata: dict) -> str:
+    return hash_bytes(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+
+
+def chunk_ids_for(path: str, texts: List[str], metadata_hash: str) -> Dict[str, str]:
+    """
+    Content-addressed chunk ids: `{path}__{hash}` where the hash covers the
+    chunk text and the file metadata. Unchanged chunks keep their id when text
+    is inserted or removed elsewhere in the file, so only the changed chunks
+    need embedding. Repeated chunks within a file get an occurrence suffix.
+    """
+    ids: Dict[str, str] = {}
+    seen: Dict[str, int] = {}
+    for text in texts:
+        digest = hash_bytes(f"{metadata_hash}\n{text}".encode("utf-8"))[:20]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        chunk_id = f"{path}__{digest}" if occurrence == 0 else f"{path}__{digest}_{occurrence}"
+        ids[chunk_id] = digest
+    return ids
+
+
+class IngestManifest:
+    """
+    Per-file and per-chunk content hashes of what is currently in the vector
+    store, persisted as JSON next to the index. A file whose bytes and
+    metadata hash match the manifest is skipped without loading it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+
+    def is_unchanged(self, path: str, file_hash: str, metadata_hash: str) -> bool:
+        entry = self.files.get(path)
+        return bool(
+            entry
+            and entry.get("file_hash") == file_hash
+            and entry.get("metadata_hash") == metadata_hash
+        )
+
+    def chunk_ids(self, path: str) -> Optional[List[str]]:
+        entry = self.files.get(path)
+        return list(entry["chunks"]) if entry else None
+
+    def aliases(self, path: str) -> Dict[str, str]:
+        """Chunks of `path` not stored because they duplicate another chunk, by canonical id."""
+        entry = self.files.get(path)
+        return dict(entry.get("aliases", {})) if entry else {}
+
+    def update(
+        self,
+        path: str,
+        file_hash: str,
+        metadata_hash: str,
+        chunks: Dict[str, str],
+        aliases: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.files[path] = {
+            "file_hash": file_hash,
+            "metadata_hash": metadata_hash,
+            "chunks": chunks,
+            "aliases": aliases or {},
+        }
+
+    def remove(self, path: str) -> None:
+        self.files.pop(path, None)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
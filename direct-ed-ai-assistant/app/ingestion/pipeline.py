@@ -0,0 +1,113 @@
+# app/ingestion/pipeline.py
+
+import random
+import time
+from typing import Iterable, List, Optional
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def load_chunks(path: str, metadata: dict):
+    """
+    Loads and splits a single document, tagging every chunk with `metadata`.
+    Module-level and free of side effects so it can run in a process pool.
+    """
+    if path.endswith(".pdf"):
+        loader = PyPDFLoader(path)
+    elif path.endswith(".txt"):
+        loader = TextLoader(path, encoding="utf-8")
+    else:
+        return None
+
+    docs = loader.load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = splitter.split_documents(docs)
+    for c in chunks:
+        c.metadata.update(metadata)
+    return chunks
+
+
+def batched(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def embed_with_retry(embeddings, texts: List[str], max_retries: int = 6, base_delay: float = 1.0):
+    """
+    Embeds `texts`, backing off exponentially (with jitter, or for as long as
+    the server's Retry-After asks) when the provider rate-limits us.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = _retry_after(e) if _is_rate_limit(e) else None
+            if delay is None:
+                delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            kind = "Rate limited" if _is_rate_limit(e) else f"Embedding failed ({e})"
+            print(f"{kind}; retrying batch of {len(texts)} in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+class StageStats:
+    """Wall time and item counts for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.files = 0
+        self.chunks = 0
+        self.tokens = 0
+        self.started = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed += time.perf_counter() - self.started
+        return False
+
+    def report(self) -> str:
+        seconds = max(self.elapsed, 1e-9)
+        parts = [f"{self.name:<10} {self.elapsed:7.2f}s"]
+        if self.files:
+            parts.append(f"{self.files} files ({self.files / seconds:.1f}/s)")
+        if self.chunks:
+            parts.append(f"{self.chunks} chunks ({self.chunks / seconds:.1f}/s)")
+        if self.tokens:
+            parts.append(f"{self.tokens} tokens ({self.tokens / seconds:,.0f}/s)")
+        return "  ".join(parts)
+
+
+def token_counter():
+    """Returns a function that counts tokens the way the embedding model does."""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: len(text) // 4
@@ -1,42 +1,158 @@
 # app/llms/custom.py
 
-import requests
-import json
-from typing import Any, List, Optional
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+import httpx
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models.chat_models import SimpleChatModel
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+SPLIT_MARKERS = [
+    "Helpful Answer:",
+    "Quiz Questions:",
+    "Flashcards:",
+]
+
+
+class _StreamParser:
+    """
+    Incremental version of CustomChatModel._parse_response. Text is held back
+    until the marker _parse_response would split on is known, then everything
+    after it is released as it arrives. Markers are tried in priority order,
+    so only the first one can be chosen mid-stream; a lower-priority marker is
+    only chosen once the stream has ended without a higher one. If the stream
+    ends without any marker the whole buffered text is released, as the
+    non-streaming parser does.
+    """
+
+    def __init__(self, markers: List[str]):
+        self.markers = markers
+        self.buffer = ""
+        self.found = False
+        self.started = False
+        self.pending_ws = ""
+
+    def _release(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self.started = True
+        # Hold back trailing whitespace so the final answer is stripped.
+        text = self.pending_ws + text
+        stripped = text.rstrip()
+        self.pending_ws = text[len(stripped):]
+        return stripped
+
+    def _split(self, marker: str) -> str:
+        self.found = True
+        remainder = self.buffer.split(marker, 1)[1]
+        self.buffer = ""
+        return remainder
+
+    def feed(self, text: str) -> str:
+        if self.found:
+            return self._release(text)
+        self.buffer += text
+        if self.markers and self.markers[0] in self.buffer:
+            return self._release(self._split(self.markers[0]))
+        return ""
+
+    def finish(self) -> str:
+        if self.found:
+            return ""
+        for marker in self.markers:
+            if marker in self.buffer:
+                text = self._split(marker).strip()
+                return self._release(text) if text else ""
+        text, self.buffer = self.buffer.strip(), ""
+        return self._release(text) if text else ""
 
 
 class CustomChatModel(SimpleChatModel):
     """A custom chat model that calls a remote FastAPI endpoint."""
 
     api_url: str
+    stream_url: Optional[str] = None
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+
+    _client: Optional[httpx.Client] = PrivateAttr(default=None)
+    _async_client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            self.read_timeout, connect=self.connect_timeout, pool=self.connect_timeout
+        )
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=self._timeout(), limits=self._limits())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                timeout=self._timeout(), limits=self._limits()
+            )
+        return self._async_client
+
+    def open(self) -> None:
+        """Creates the pooled clients ahead of the first request."""
+        self.client
+        self.async_client
+
+    async def aclose(self) -> None:
+        """Closes the pooled connections; called on server shutdown."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
 
     def _parse_response(self, full_text: str) -> str:
         """
         Parses the full model output to extract only the final generated answer,
         removing any "instruction echoing."
         """
-        
-        split_markers = [
-            "Helpful Answer:",
-            "Quiz Questions:",
-            "Flashcards:",
-        ]
-
-        for marker in split_markers:
+
+        for marker in SPLIT_MARKERS:
             if marker in full_text:
-                
                 return full_text.split(marker, 1)[1].strip()
 
-        
         return full_text
 
     @property
     def _llm_type(self) -> str:
         return "custom_chat_model"
 
+    def _payload(self, messages: List[BaseMessage], **kwargs: Any) -> dict:
+        return {"prompt": messages[-1].content, **kwargs}
+
+    def _answer_from(self, response: httpx.Response) -> str:
+        response.raise_for_status()
+        full_text = response.json().get("response", "").strip()
+        assistant_response = self._parse_response(full_text)
+        if not assistant_response:
+            raise ValueError("Model returned an empty response after parsing.")
+        return assistant_response
+
     def _call(
         self,
         messages: List[BaseMessage],
@@ -44,26 +160,99 @@ class CustomChatModel(SimpleChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> str:
-        raw_prompt = messages[-1].content
-        data = {"prompt": raw_prompt, **kwargs}
-        headers = {"Content-Type": "application/json"}
+        try:
+            response = self.client.post(self.api_url, json=self._payload(messages, **kwargs))
+            return self._answer_from(response)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Custom model failed: {e}. Attempting fallback.")
+            raise
 
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
         try:
-            response = requests.post(
-                self.api_url, headers=headers, data=json.dumps(data)
+            response = await self.async_client.post(
+                self.api_url, json=self._payload(messages, **kwargs)
             )
-            response.raise_for_status()
-
-            result = response.json()
-            full_text = result.get("response", "").strip()
+            answer = self._answer_from(response)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Custom model failed: {e}. Attempting fallback.")
+            raise
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
 
-            assistant_response = self._parse_response(full_text)
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if not self.stream_url:
+            text = self._call(messages, stop, run_manager, **kwargs)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            return
 
-            if not assistant_response:
+        parser = _StreamParser(SPLIT_MARKERS)
+        emitted = False
+        try:
+            with self.client.stream(
+                "POST", self.stream_url, json=self._payload(messages, **kwargs)
+            ) as response:
+                response.raise_for_status()
+                for raw in response.iter_text():
+                    text = parser.feed(raw)
+                    if text:
+                        emitted = True
+                        if run_manager:
+                            run_manager.on_llm_new_token(text)
+                        yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            text = parser.finish()
+            if text:
+                emitted = True
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if not emitted:
                 raise ValueError("Model returned an empty response after parsing.")
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Custom model failed: {e}. Attempting fallback.")
+            raise
 
-            return assistant_response
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if not self.stream_url:
+            result = await self._agenerate(messages, stop, run_manager, **kwargs)
+            text = result.generations[0].message.content
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            return
 
-        except (requests.exceptions.RequestException, ValueError) as e:
+        parser = _StreamParser(SPLIT_MARKERS)
+        emitted = False
+        try:
+            async with self.async_client.stream(
+                "POST", self.stream_url, json=self._payload(messages, **kwargs)
+            ) as response:
+                response.raise_for_status()
+                async for raw in response.aiter_text():
+                    text = parser.feed(raw)
+                    if text:
+                        emitted = True
+                        if run_manager:
+                            await run_manager.on_llm_new_token(text)
+                        yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            text = parser.finish()
+            if text:
+                emitted = True
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if not emitted:
+                raise ValueError("Model returned an empty response after parsing.")
+        except (httpx.HTTPError, ValueError) as e:
             print(f"Custom model failed: {e}. Attempting fallback.")
             raise
@@ -0,0 +1,467 @@
+# app/llms/routing.py
+
+import asyncio
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from app.analytics.trace import annotate
+
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "20"))
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+HEDGE_MAX_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MAX_DELAY_SECONDS", "10.0"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, float("inf"))
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a rolling window for percentile estimates."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = 256):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.samples = 0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.samples += 1
+            self.recent.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self.recent:
+                return None
+            ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets, self.counts):
+                running += count
+                cumulative.append(("+Inf" if bound == float("inf") else bound, running))
+            return {"buckets": cumulative, "count": self.samples, "sum": self.total}
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures or slow calls.
+    Open -> half-open after `reset_seconds`, when one trial call is let through;
+    a success closes the breaker again, a failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        slow_call_seconds: float = SLOW_CALL_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self.slow_calls = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether the primary may be called right now."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != "closed" or self.consecutive_failures > 0
+
+    def _open(self) -> None:
+        if self.state != "open":
+            self.times_opened += 1
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def record_success(self, seconds: float) -> None:
+        if seconds >= self.slow_call_seconds:
+            self.record_failure(slow=True)
+            return
+        with self._lock:
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            self.state = "closed"
+
+    def record_failure(self, slow: bool = False) -> None:
+        """An error, or with `slow` a call that took too long or lost to the hedge."""
+        with self._lock:
+            self.slow_calls += int(slow)
+            self.consecutive_failures += 1
+            was_trial = self.trial_in_flight
+            self.trial_in_flight = False
+            if was_trial or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """Gives back a half-open trial slot when the call was cancelled."""
+        with self._lock:
+            self.trial_in_flight = False
+
+
+class _Attempt:
+    """One hedged primary call, whose outcome is recorded by whichever side settles it first."""
+
+    __slots__ = ("_lock", "settled")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.settled = False
+
+    def settle(self) -> bool:
+        with self._lock:
+            first, self.settled = not self.settled, True
+            return first
+
+
+def _settle(attempt: Optional[_Attempt]) -> bool:
+    return attempt is None or attempt.settle()
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    Sends requests to `primary` (the fine-tuned model) and falls back to
+    `fallback` (OpenAI) on errors. A circuit breaker sends traffic straight to
+    the fallback while the primary is failing, and while the primary is
+    degraded a hedged fallback request is started if the primary has not
+    answered within its recent p95 latency.
+    """
+
+    primary: BaseChatModel
+    fallback: BaseChatModel
+    hedge_percentile: float = HEDGE_PERCENTILE
+    hedge_min_delay: float = HEDGE_MIN_DELAY_SECONDS
+    hedge_max_delay: float = HEDGE_MAX_DELAY_SECONDS
+
+    _breaker: CircuitBreaker = PrivateAttr(default_factory=CircuitBreaker)
+    _latency: Dict[str, LatencyHistogram] = PrivateAttr(
+        default_factory=lambda: {"primary": LatencyHistogram(), "fallback": LatencyHistogram()}
+    )
+    _counters: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {
+            "primary_calls": 0,
+            "primary_failures": 0,
+            "fallback_calls": 0,
+            "short_circuited": 0,
+            "hedges_started": 0,
+            "hedges_won": 0,
+        }
+    )
+    _counter_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _executor: ThreadPoolExecutor = PrivateAttr(
+        default_factory=lambda: ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+    )
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing_chat_model"
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    def hedge_delay(self) -> float:
+        p = self._latency["primary"].percentile(self.hedge_percentile)
+        if p is None:
+            return self.hedge_max_delay
+        return min(max(p, self.hedge_min_delay), self.hedge_max_delay)
+
+    def _count(self, name: str) -> None:
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return {
+            "breaker": {
+                "state": self._breaker.state,
+                "consecutive_failures": self._breaker.consecutive_failures,
+                "times_opened": self._breaker.times_opened,
+                "slow_calls": self._breaker.slow_calls,
+            },
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+            "counters": counters,
+            "latency": {name: h.snapshot() for name, h in self._latency.items()},
+        }
+
+    # -- single backend calls -------------------------------------------------
+
+    def _call_primary(self, messages, stop, run_manager, attempt=None, **kwargs) -> ChatResult:
+        """`attempt` is set on hedged calls; a call that lost to the hedge is already recorded."""
+        self._count("primary_calls")
+        start = time.perf_counter()
+        try:
+            result = self.primary._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except Exception:
+            self._count("primary_failures")
+            if _settle(attempt):
+                self._breaker.record_failure()
+            raise
+        elapsed = time.perf_counter() - start
+        self._latency["primary"].observe(elapsed)
+        if _settle(attempt):
+            self._breaker.record_success(elapsed)
+        annotate(llm_backend="primary")
+        return result
+
+    def _call_fallback(self, messages, stop, run_manager, **kwargs) -> ChatResult:
+        self._count("fallback_calls")
+        start = time.perf_counter()
+        result = self.fallback._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._latency["fallback"].observe(time.perf_counter() - start)
+        annotate(llm_backend="fallback")
+        return result
+
+    async def _acall_primary(
+        self, messages, stop, run_manager, attempt=None, **kwargs
+    ) -> ChatResult:
+        self._count("primary_calls")
+        start = time.perf_counter()
+        try:
+            result = await self.primary._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+        except asyncio.CancelledError:
+            # Cancelled by the caller; a call that lost to the hedge was settled as slow.
+            if _settle(attempt):
+                self._breaker.release()
+            raise
+        except Exception:
+            self._count("primary_failures")
+            if _settle(attempt):
+                self._breaker.record_failure()
+            raise
+        elapsed = time.perf_counter() - start
+        self._latency["primary"].observe(elapsed)
+        if _settle(attempt):
+            self._breaker.record_success(elapsed)
+        annotate(llm_backend="primary")
+        return result
+
+    async def _acall_fallback(self, messages, stop, run_manager, **kwargs) -> ChatResult:
+        self._count("fallback_calls")
+        start = time.perf_counter()
+        result = await self.fallback._agenerate(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+        self._latency["fallback"].observe(time.perf_counter() - start)
+        annotate(llm_backend="fallback")
+        return result
+
+    # -- routing ----------------------------------------------------------------
+
+    def _submit(self, fn, *args, **kwargs):
+        """Runs `fn` on the executor in a copy of the caller's context, for `annotate`."""
+        return self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not self._breaker.allow():
+            self._count("short_circuited")
+            return self._call_fallback(messages, stop, run_manager, **kwargs)
+
+        if not self._breaker.degraded:
+            try:
+                return self._call_primary(messages, stop, run_manager, **kwargs)
+            except Exception:
+                return self._call_fallback(messages, stop, run_manager, **kwargs)
+
+        attempt = _Attempt()
+        primary = self._submit(self._call_primary, messages, stop, run_manager, attempt, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done and not primary.exception():
+            return primary.result()
+        if done:
+            return self._call_fallback(messages, stop, run_manager, **kwargs)
+
+        self._count("hedges_started")
+        hedge = self._submit(self._call_fallback, messages, stop, run_manager, **kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.exception():
+                    if future is hedge:
+                        self._hedge_won(attempt)
+                    return future.result()
+        return hedge.result()
+
+    def _hedge_won(self, attempt: _Attempt) -> None:
+        """The primary is still running past the hedge delay: count it as a slow call."""
+        self._count("hedges_won")
+        if attempt.settle():
+            self._breaker.record_failure(slow=True)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not self._breaker.allow():
+            self._count("short_circuited")
+            return await self._acall_fallback(messages, stop, run_manager, **kwargs)
+
+        if not self._breaker.degraded:
+            try:
+                return await self._acall_primary(messages, stop, run_manager, **kwargs)
+            except Exception:
+                return await self._acall_fallback(messages, stop, run_manager, **kwargs)
+
+        attempt = _Attempt()
+        primary = asyncio.ensure_future(
+            self._acall_primary(messages, stop, run_manager, attempt, **kwargs)
+        )
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+        if done and not primary.exception():
+            return primary.result()
+        if done:
+            return await self._acall_fallback(messages, stop, run_manager, **kwargs)
+
+        self._count("hedges_started")
+        hedge = asyncio.ensure_future(
+            self._acall_fallback(messages, stop, run_manager, **kwargs)
+        )
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception():
+                        if task is hedge:
+                            self._hedge_won(attempt)
+                        return task.result()
+            return hedge.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self._breaker.allow():
+            self._count("primary_calls")
+            start = time.perf_counter()
+            emitted = recorded = False
+            try:
+                for chunk in self.primary._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    emitted = True
+                    yield chunk
+                elapsed = time.perf_counter() - start
+                self._latency["primary"].observe(elapsed)
+                recorded = True
+                self._breaker.record_success(elapsed)
+                annotate(llm_backend="primary")
+                return
+            except Exception:
+                self._count("primary_failures")
+                recorded = True
+                self._breaker.record_failure()
+                if emitted:
+                    raise
+            finally:
+                # Closed early by the consumer (GeneratorExit): give back a half-open trial.
+                if not recorded:
+                    self._breaker.release()
+        else:
+            self._count("short_circuited")
+        self._count("fallback_calls")
+        start = time.perf_counter()
+        yield from self.fallback._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._latency["fallback"].observe(time.perf_counter() - start)
+        annotate(llm_backend="fallback")
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self._breaker.allow():
+            self._count("primary_calls")
+            start = time.perf_counter()
+            emitted = recorded = False
+            try:
+                async for chunk in self.primary._astream(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                ):
+                    emitted = True
+                    yield chunk
+                elapsed = time.perf_counter() - start
+                self._latency["primary"].observe(elapsed)
+                recorded = True
+                self._breaker.record_success(elapsed)
+                annotate(llm_backend="primary")
+                return
+            except Exception:
+                self._count("primary_failures")
+                recorded = True
+                self._breaker.record_failure()
+                if emitted:
+                    raise
+            finally:
+                # Cancelled, or closed early by the consumer (GeneratorExit): give back
+                # a half-open trial.
+                if not recorded:
+                    self._breaker.release()
+        else:
+            self._count("short_circuited")
+        self._count("fallback_calls")
+        start = time.perf_counter()
+        async for chunk in self.fallback._astream(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        ):
+            yield chunk
+        self._latency["fallback"].observe(time.perf_counter() - start)
+        annotate(llm_backend="fallback")
@@ -0,0 +1,294 @@
+# app/llms/scheduler.py
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, NamedTuple, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableSerializable
+from pydantic import ConfigDict
+
+from app.llms.routing import LatencyHistogram
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TUTORING_WEIGHT = int(os.getenv("LLM_TUTORING_WEIGHT", "4"))
+LLM_TUTORING_QUEUE_LIMIT = int(os.getenv("LLM_TUTORING_QUEUE_LIMIT", "64"))
+LLM_TUTORING_QUEUE_TIMEOUT = float(os.getenv("LLM_TUTORING_QUEUE_TIMEOUT", "10"))
+LLM_CONTENT_WEIGHT = int(os.getenv("LLM_CONTENT_WEIGHT", "1"))
+LLM_CONTENT_QUEUE_LIMIT = int(os.getenv("LLM_CONTENT_QUEUE_LIMIT", "32"))
+LLM_CONTENT_QUEUE_TIMEOUT = float(os.getenv("LLM_CONTENT_QUEUE_TIMEOUT", "30"))
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class QueueClass(NamedTuple):
+    weight: int
+    queue_limit: int
+    queue_timeout: float
+
+
+DEFAULT_CLASSES = {
+    "tutoring": QueueClass(
+        LLM_TUTORING_WEIGHT, LLM_TUTORING_QUEUE_LIMIT, LLM_TUTORING_QUEUE_TIMEOUT
+    ),
+    "quiz_generation": QueueClass(
+        LLM_CONTENT_WEIGHT, LLM_CONTENT_QUEUE_LIMIT, LLM_CONTENT_QUEUE_TIMEOUT
+    ),
+    "flashcard_creation": QueueClass(
+        LLM_CONTENT_WEIGHT, LLM_CONTENT_QUEUE_LIMIT, LLM_CONTENT_QUEUE_TIMEOUT
+    ),
+}
+
+
+class AdmissionRejected(Exception):
+    """An LLM call that was not admitted; the server answers it with `status_code`."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class _Waiter:
+    __slots__ = ("queue", "enqueued", "notify", "granted")
+
+    def __init__(self, queue: str, notify):
+        self.queue = queue
+        self.enqueued = time.monotonic()
+        self.notify = notify
+        self.granted = False
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class LLMScheduler:
+    """
+    Caps concurrent upstream LLM calls at `max_concurrency`. Calls beyond the
+    cap wait in one queue per request_type, and freed slots go to the queues
+    by smooth weighted round-robin, so live tutoring is served ahead of bulk
+    quiz and flashcard generation without starving it. A call that finds its
+    queue full is rejected with 429, and one that waits longer than its
+    queue's timeout with 503, both with a Retry-After estimate.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        classes: Optional[Dict[str, QueueClass]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.classes = dict(classes or DEFAULT_CLASSES)
+        # Unknown request types share the lowest-weight queue.
+        self.default_queue = min(self.classes, key=lambda name: self.classes[name].weight)
+        self._active = 0
+        self._service_seconds: Optional[float] = None
+        self._queues: Dict[str, deque] = {name: deque() for name in self.classes}
+        self._credit = {name: 0 for name in self.classes}
+        self._waits = {name: LatencyHistogram() for name in self.classes}
+        self._counters = {
+            name: {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+            for name in self.classes
+        }
+        self._lock = threading.Lock()
+
+    def _queue_for(self, request_type: Optional[str]) -> str:
+        return request_type if request_type in self.classes else self.default_queue
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained, from recent call times."""
+        waiting = sum(len(q) for q in self._queues.values())
+        service = self._service_seconds or 1.0
+        estimate = math.ceil((waiting + 1) * service / self.max_concurrency)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, estimate))
+
+    def _reject_if_full(self, queue: str) -> None:
+        if len(self._queues[queue]) >= self.classes[queue].queue_limit:
+            self._counters[queue]["rejected"] += 1
+            raise AdmissionRejected(429, self._retry_after(), f"Too many pending {queue} requests.")
+
+    def check(self, request_type: Optional[str]) -> None:
+        """Raises AdmissionRejected now if a call for `request_type` would be turned away."""
+        with self._lock:
+            queue = self._queue_for(request_type)
+            if self._active >= self.max_concurrency:
+                self._reject_if_full(queue)
+
+    def _enter(self, request_type: Optional[str], notify) -> Optional[_Waiter]:
+        """Takes a free slot and returns None, or queues and returns a waiter."""
+        with self._lock:
+            queue = self._queue_for(request_type)
+            if self._active < self.max_concurrency:
+                self._active += 1
+                self._counters[queue]["admitted"] += 1
+                self._waits[queue].observe(0.0)
+                return None
+            self._reject_if_full(queue)
+            waiter = _Waiter(queue, notify)
+            self._queues[queue].append(waiter)
+            self._counters[queue]["queued"] += 1
+            return waiter
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiters; called with the lock held."""
+        while self._active < self.max_concurrency:
+            ready = [name for name, q in self._queues.items() if q]
+            if not ready:
+                return
+            for name in ready:
+                self._credit[name] += self.classes[name].weight
+            chosen = max(ready, key=lambda name: self._credit[name])
+            self._credit[chosen] -= sum(self.classes[name].weight for name in ready)
+            waiter = self._queues[chosen].popleft()
+            waiter.granted = True
+            self._active += 1
+            self._counters[chosen]["admitted"] += 1
+            self._waits[chosen].observe(time.monotonic() - waiter.enqueued)
+            waiter.notify()
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Dequeues a waiter that gave up; False if it was granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queues[waiter.queue].remove(waiter)
+            return True
+
+    def _timed_out(self, waiter: _Waiter) -> AdmissionRejected:
+        with self._lock:
+            self._counters[waiter.queue]["timed_out"] += 1
+            retry_after = self._retry_after()
+        timeout = self.classes[waiter.queue].queue_timeout
+        return AdmissionRejected(
+            503, retry_after, f"No LLM capacity for {waiter.queue} within {timeout:g}s."
+        )
+
+    def _release(self, seconds: Optional[float]) -> None:
+        with self._lock:
+            self._active -= 1
+            if seconds is not None:
+                self._service_seconds = (
+                    seconds
+                    if self._service_seconds is None
+                    else 0.8 * self._service_seconds + 0.2 * seconds
+                )
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, request_type: Optional[str]) -> Iterator[None]:
+        granted = threading.Event()
+        waiter = self._enter(request_type, granted.set)
+        if waiter is not None:
+            timeout = self.classes[waiter.queue].queue_timeout
+            if not granted.wait(timeout) and self._abandon(waiter):
+                raise self._timed_out(waiter)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self, request_type: Optional[str]) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        waiter = self._enter(request_type, lambda: loop.call_soon_threadsafe(_resolve, granted))
+        if waiter is not None:
+            timeout = self.classes[waiter.queue].queue_timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise self._timed_out(waiter)
+            except asyncio.CancelledError:
+                if not self._abandon(waiter):
+                    self._release(None)
+                raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "retry_after_seconds": self._retry_after(),
+                "queues": {
+                    name: {
+                        **config._asdict(),
+                        "waiting": len(self._queues[name]),
+                        **self._counters[name],
+                        "wait_p95_seconds": self._waits[name].percentile(95),
+                        "wait": self._waits[name].snapshot(),
+                    }
+                    for name, config in self.classes.items()
+                },
+            }
+
+
+class ScheduledRunnable(RunnableSerializable):
+    """Runs `bound` (an LLM) once `scheduler` grants a slot to `request_type`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    bound: Runnable
+    scheduler: Any
+    request_type: str
+
+    @property
+    def InputType(self):
+        return self.bound.InputType
+
+    @property
+    def OutputType(self):
+        return self.bound.OutputType
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        with self.scheduler.slot(self.request_type):
+            return self.bound.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        async with self.scheduler.aslot(self.request_type):
+            return await self.bound.ainvoke(input, config, **kwargs)
+
+    def transform(
+        self, input: Iterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[Any]:
+        with self.scheduler.slot(self.request_type):
+            yield from self.bound.transform(input, config, **kwargs)
+
+    async def atransform(
+        self, input: AsyncIterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        async with self.scheduler.aslot(self.request_type):
+            async for chunk in self.bound.atransform(input, config, **kwargs):
+                yield chunk
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        yield from self.transform(iter([input]), config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        async def single():
+            yield input
+
+        async for chunk in self.atransform(single(), config, **kwargs):
+            yield chunk
+
+
+llm_scheduler = LLMScheduler()
+
+
+def scheduled(llm: Runnable, request_type: str) -> ScheduledRunnable:
+    """`llm`, admitted through the shared scheduler as a `request_type` call."""
+    return ScheduledRunnable(bound=llm, scheduler=llm_scheduler, request_type=request_type)
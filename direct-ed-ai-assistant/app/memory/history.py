@@ -0,0 +1,290 @@
+# app/memory/history.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "memory")
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "app/chat_history.sqlite3")
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "10000"))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))
+HISTORY_TTL_SECONDS = float(os.getenv("HISTORY_TTL_SECONDS", str(6 * 60 * 60)))
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _message_size(message: BaseMessage) -> int:
+    content = message.content
+    if isinstance(content, str):
+        return len(content)
+    return len(json.dumps(content))
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """An in-memory chat history that keeps only the most recent messages."""
+
+    def __init__(self, max_messages: int, on_resize=None):
+        self._messages: Deque[BaseMessage] = deque()
+        self._max_messages = max_messages
+        self._on_resize = on_resize
+        self.size = 0
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        delta = 0
+        for message in messages:
+            self._messages.append(message)
+            delta += _message_size(message)
+        while len(self._messages) > self._max_messages:
+            delta -= _message_size(self._messages.popleft())
+        self.size += delta
+        if self._on_resize and delta:
+            self._on_resize(delta)
+
+    def clear(self) -> None:
+        delta = -self.size
+        self._messages.clear()
+        self.size = 0
+        if self._on_resize and delta:
+            self._on_resize(delta)
+
+
+class InMemoryHistoryStore:
+    """
+    Process-local session histories with LRU, TTL and memory-size eviction.
+    Only suitable for a single uvicorn worker; use SQLiteHistoryStore to share
+    histories between workers.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = HISTORY_MAX_SESSIONS,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+        ttl_seconds: float = HISTORY_TTL_SECONDS,
+        max_bytes: int = HISTORY_MAX_BYTES,
+    ):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _resized(self, delta: int) -> None:
+        with self._lock:
+            self.total_bytes += delta
+            self._evict()
+
+    def _forget(self, history: BoundedChatMessageHistory) -> None:
+        # A request may still hold an evicted history; stop it counting towards
+        # the store's total once it is no longer reachable from here.
+        history._on_resize = None
+        self.total_bytes -= history.size
+        self.evictions += 1
+
+    def _drop(self, session_id: str) -> None:
+        history, _ = self._sessions.pop(session_id)
+        self._forget(history)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, (_, last_used) = next(iter(self._sessions.items()))
+            expired = self.ttl_seconds and now - last_used > self.ttl_seconds
+            over_count = len(self._sessions) > self.max_sessions
+            over_bytes = self.total_bytes > self.max_bytes and len(self._sessions) > 1
+            if not (expired or over_count or over_bytes):
+                break
+            self._drop(oldest_id)
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            now = time.monotonic()
+            if entry and self.ttl_seconds and now - entry[1] > self.ttl_seconds:
+                self._forget(entry[0])
+                entry = None
+            history = (
+                entry[0]
+                if entry
+                else BoundedChatMessageHistory(self.max_messages, self._resized)
+            )
+            self._sessions[session_id] = (history, now)
+            self._evict()
+            return history
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                for history, _ in self._sessions.values():
+                    history._on_resize = None
+                self._sessions.clear()
+                self.total_bytes = 0
+            elif session_id in self._sessions:
+                self._drop(session_id)
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """A chat history persisted in the shared SQLite session database."""
+
+    def __init__(self, store: "SQLiteHistoryStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        rows = self.store._connection().execute(
+            "SELECT payload FROM messages WHERE session_id = ? ORDER BY id",
+            (self.session_id,),
+        ).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store._append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+
+class SQLiteHistoryStore:
+    """
+    Session histories stored in a WAL-mode SQLite file, so every uvicorn worker
+    on the host sees the same conversation. Expired and surplus sessions are
+    pruned periodically on write.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(
+        self,
+        path: str = HISTORY_DB_PATH,
+        max_sessions: int = HISTORY_MAX_SESSIONS,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+        ttl_seconds: float = HISTORY_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "session_id TEXT NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        if self.ttl_seconds:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row and time.time() - row[0] > self.ttl_seconds:
+                self.clear(session_id)
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def _append(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        payloads = [(session_id, json.dumps(m)) for m in messages_to_dict(messages)]
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO messages (session_id, payload) VALUES (?, ?)", payloads
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages),
+            )
+            conn.execute(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, time.time()),
+            )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Deletes expired sessions and the least recently used surplus."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM sessions WHERE updated_at < ?",
+                    (time.time() - self.ttl_seconds,),
+                )
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY updated_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id NOT IN "
+                "(SELECT session_id FROM sessions)"
+            )
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if session_id is None:
+                conn.execute("DELETE FROM messages")
+                conn.execute("DELETE FROM sessions")
+            else:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def build_history_store():
+    """Returns the history store selected by the HISTORY_BACKEND env var."""
+    if HISTORY_BACKEND == "sqlite":
+        return SQLiteHistoryStore()
+    if HISTORY_BACKEND == "memory":
+        return InMemoryHistoryStore()
+    raise ValueError(f"Unknown HISTORY_BACKEND: {HISTORY_BACKEND!r}")
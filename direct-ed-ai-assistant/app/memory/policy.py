@@ -0,0 +1,271 @@
+# app/memory/policy.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from app.ingestion.pipeline import token_counter
+from app.memory.history import HISTORY_MAX_SESSIONS
+from app.prompts.templates import summarize_history_prompt
+
+# A tutoring turn is about 330 tokens. Up to window + every turns are kept
+# verbatim (the window plus the turns waiting to be folded), so the cap holds
+# them and the summary: 5 * 330 + 300 tokens.
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "2"))
+HISTORY_SUMMARY_EVERY_TURNS = int(os.getenv("HISTORY_SUMMARY_EVERY_TURNS", "3"))
+HISTORY_TOKEN_CAP = int(os.getenv("HISTORY_TOKEN_CAP", "2000"))
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "2"))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def _marker(messages: List[BaseMessage], end: int) -> str:
+    """Digest of the message before `end` and the one before it, so repeated answers still differ."""
+    return hashlib.sha1(
+        get_buffer_string(messages[max(end - 2, 0) : end]).encode("utf-8")
+    ).hexdigest()
+
+
+class _Summary:
+    __slots__ = ("text", "last", "running")
+
+    def __init__(self):
+        self.text = ""
+        # Marker of the newest messages folded into `text`.
+        self.last: Optional[str] = None
+        self.running = False
+
+
+class HistoryPolicy:
+    """
+    Bounds the chat history the condense step sees, whatever the length of
+    the session. The last `window_turns` turns are kept verbatim; turns that
+    slide out of the window are folded into a per-session rolling summary by
+    a background worker, `summary_every_turns` at a time, so no request waits
+    on a summary call. Turns waiting to be folded stay verbatim until the
+    summary takes them in. The summary and the verbatim turns are trimmed to
+    `max_tokens`, oldest turns first; the newest message is cut short if it
+    is over the cap on its own.
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        window_turns: int = HISTORY_WINDOW_TURNS,
+        max_tokens: int = HISTORY_TOKEN_CAP,
+        summary_every_turns: int = HISTORY_SUMMARY_EVERY_TURNS,
+        summary_max_tokens: int = HISTORY_SUMMARY_MAX_TOKENS,
+        workers: int = HISTORY_SUMMARY_WORKERS,
+        max_sessions: int = HISTORY_MAX_SESSIONS,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.chain = summarize_history_prompt | llm | StrOutputParser() if llm is not None else None
+        self.window_turns = window_turns
+        self.max_tokens = max_tokens
+        self.summary_every_turns = max(summary_every_turns, 1)
+        self.summary_max_tokens = min(summary_max_tokens, max_tokens // 2)
+        self.max_sessions = max_sessions
+        self.count_tokens = count_tokens or token_counter()
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="history-summary")
+            if self.chain is not None
+            else None
+        )
+        self._futures = set()
+        self.stats = Counter()
+        self.summary_seconds = 0.0
+
+    # -- token budget ---------------------------------------------------------
+
+    def _tokens(self, message: BaseMessage) -> int:
+        return self.count_tokens(get_buffer_string([message]))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` (by a proportional cut) within `max_tokens`."""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.count_tokens(text)
+        while tokens > max_tokens:
+            text = text[: min(len(text) - 1, int(len(text) * max_tokens / tokens))]
+            tokens = self.count_tokens(text)
+        return text
+
+    def _shorten(self, message: BaseMessage, max_tokens: int) -> BaseMessage:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        overhead = self._tokens(message.model_copy(update={"content": ""}))
+        return message.model_copy(
+            update={"content": self._truncate(content, max_tokens - overhead)}
+        )
+
+    def _render(self, summary: str, window: List[BaseMessage]) -> Tuple[List[BaseMessage], int]:
+        """The summary and as many of the newest messages as fit, and their token count."""
+        budget = self.max_tokens
+        head = []
+        if summary:
+            text = self._truncate(SUMMARY_PREFIX + summary, self.summary_max_tokens)
+            head = [SystemMessage(content=text)]
+            budget -= self._tokens(head[0])
+        kept = []
+        for message in reversed(window):
+            tokens = self._tokens(message)
+            if tokens > budget:
+                if not kept:
+                    kept.append(self._shorten(message, budget))
+                    budget -= self._tokens(kept[0])
+                break
+            kept.append(message)
+            budget -= tokens
+        return head + kept[::-1], self.max_tokens - budget
+
+    # -- rolling summary ------------------------------------------------------
+
+    @staticmethod
+    def _unfolded(state: _Summary, older: List[BaseMessage]) -> List[BaseMessage]:
+        """The messages in `older` that are newer than the last one folded into the summary."""
+        if state.last is not None:
+            for end in range(len(older), 0, -1):
+                if _marker(older, end) == state.last:
+                    return list(older[end:])
+        # Nothing folded yet, or the store has already trimmed the folded messages.
+        return list(older)
+
+    def _summary_for(
+        self, session_id: Optional[str], history, older
+    ) -> Tuple[str, List[BaseMessage]]:
+        """The session's summary and the older messages not folded into it yet."""
+        if self.chain is None or not session_id:
+            return "", []
+        with self._lock:
+            if not history:
+                # A new or expired conversation; an old summary must not leak into it.
+                self._summaries.pop(session_id, None)
+                return "", []
+            state = self._summaries.pop(session_id, None) or _Summary()
+            self._summaries[session_id] = state
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+            text = state.text
+            pending = self._unfolded(state, older) if older else []
+            if state.running or len(pending) < 2 * self.summary_every_turns:
+                return text, pending
+            state.running = True
+            self.stats["summaries_scheduled"] += 1
+        future = self._executor.submit(self._fold, state, text, pending, _marker(older, len(older)))
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return text, pending
+
+    def _discard(self, future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def _fold(self, state: _Summary, text: str, messages: List[BaseMessage], last: str) -> None:
+        start = time.perf_counter()
+        try:
+            summary = self.chain.invoke(
+                {"summary": text or "(none)", "new_lines": get_buffer_string(messages)}
+            )
+        except Exception as e:
+            # The same turns are scheduled again on the session's next request.
+            print(f"History summary failed: {type(e).__name__}: {e}")
+            with self._lock:
+                state.running = False
+                self.stats["summary_failures"] += 1
+            return
+        summary = self._truncate(summary.strip(), self.summary_max_tokens)
+        with self._lock:
+            state.text = summary
+            state.last = last
+            state.running = False
+            self.stats["summaries"] += 1
+            self.stats["turns_folded"] += len(messages) // 2
+            self.summary_seconds += time.perf_counter() - start
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Waits for the summaries already scheduled; used by benchmarks and shutdown."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                futures = list(self._futures)
+            if not futures:
+                return
+            for future in futures:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                future.exception(timeout=remaining)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # -- request path ---------------------------------------------------------
+
+    def apply(self, x: dict, config: Optional[RunnableConfig] = None) -> dict:
+        history = x.get("chat_history") or []
+        session_id = ((config or {}).get("configurable") or {}).get("session_id")
+        split = max(len(history) - 2 * self.window_turns, 0)
+        older, window = history[:split], history[split:]
+        summary, pending = self._summary_for(session_id, history, older)
+        window = pending + window
+        bounded, tokens = self._render(summary, window)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["messages_in"] += len(history)
+            self.stats["messages_out"] += len(bounded)
+            self.stats["tokens_out"] += tokens
+            if older:
+                self.stats["windowed"] += 1
+            if len(bounded) < len(window) or (window and bounded[-1] is not window[-1]):
+                self.stats["capped"] += 1
+        return {**x, "chat_history": bounded}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            requests = self.stats["requests"]
+            summaries = self.stats["summaries"]
+            return {
+                "window_turns": self.window_turns,
+                "summary_every_turns": self.summary_every_turns,
+                "max_tokens": self.max_tokens,
+                "requests": requests,
+                "windowed": self.stats["windowed"],
+                "capped": self.stats["capped"],
+                "avg_history_tokens": (
+                    round(self.stats["tokens_out"] / requests, 1) if requests else 0.0
+                ),
+                "avg_messages_in": (
+                    round(self.stats["messages_in"] / requests, 1) if requests else 0.0
+                ),
+                "avg_messages_out": (
+                    round(self.stats["messages_out"] / requests, 1) if requests else 0.0
+                ),
+                "sessions": len(self._summaries),
+                "summaries": summaries,
+                "summary_failures": self.stats["summary_failures"],
+                "summaries_pending": len(self._futures),
+                "turns_folded": self.stats["turns_folded"],
+                "avg_summary_seconds": (
+                    round(self.summary_seconds / summaries, 3) if summaries else 0.0
+                ),
+            }
+
+    async def aapply(self, x: dict, config: Optional[RunnableConfig] = None) -> dict:
+        # Only local work: the summary call, when one is due, runs on the executor.
+        return self.apply(x, config)
+
+    def as_runnable(self):
+        return RunnableLambda(self.apply, afunc=self.aapply).with_config(
+            {"run_name": "HistoryPolicy"}
+        )
@@ -0,0 +1,169 @@
+# app/monitoring/callbacks.py
+
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.analytics.writer import AnalyticsWriter
+from app.monitoring.metrics import MetricsRegistry, registry as default_registry
+
+
+SLOW_TRACE_SECONDS = float(os.getenv("SLOW_TRACE_SECONDS", "0"))
+SLOW_TRACE_SAMPLE_RATE = float(os.getenv("SLOW_TRACE_SAMPLE_RATE", "1.0"))
+SLOW_TRACE_PATH = os.getenv("SLOW_TRACE_PATH", "app/slow_traces.jsonl")
+
+
+class StageMetricsHandler(BaseCallbackHandler):
+    """
+    Times the named stages of a chain run (retrievers, LLM calls, analyzer)
+    and the run as a whole from LangChain callbacks, and counts LLM tokens
+    per stage. Requests slower than `slow_seconds` are, with probability
+    `sample_rate`, written with their stage timeline to `slow_trace_path`.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        stages: Iterable[str],
+        registry: MetricsRegistry = default_registry,
+        slow_seconds: float = SLOW_TRACE_SECONDS,
+        sample_rate: float = SLOW_TRACE_SAMPLE_RATE,
+        slow_trace_path: str = SLOW_TRACE_PATH,
+    ):
+        self.stages = set(stages)
+        self.stage_latency = registry.histogram(
+            "assistant_stage_latency_seconds",
+            "Latency of each named chain stage.",
+            ("stage", "status"),
+        )
+        self.request_latency = registry.histogram(
+            "assistant_request_latency_seconds", "Latency of whole chain runs.", ("chain", "status")
+        )
+        self.tokens = registry.counter(
+            "assistant_llm_tokens", "LLM tokens used per stage.", ("stage", "kind")
+        )
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+        self.slow_traces = (
+            AnalyticsWriter(slow_trace_path, batch_size=10) if slow_seconds > 0 else None
+        )
+        self._runs: Dict[UUID, tuple] = {}
+        self._traces: Dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+
+    # -- run bookkeeping --------------------------------------------------------
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id else None
+            root = parent[2] if parent else run_id
+            self._runs[run_id] = (name, now, root)
+            if root == run_id:
+                self._traces[run_id] = {"name": name, "start": now, "spans": [], "runs": set()}
+            elif root in self._traces:
+                self._traces[root]["runs"].add(run_id)
+
+    def _end(self, run_id: UUID, status: str) -> Optional[str]:
+        now = time.perf_counter()
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return None
+            name, start, root = run
+            trace = self._traces.get(root)
+            if name in self.stages and trace is not None:
+                trace["spans"].append(
+                    {
+                        "stage": name,
+                        "offset_ms": round(1000 * (start - trace["start"]), 1),
+                        "duration_ms": round(1000 * (now - start), 1),
+                        "status": status,
+                    }
+                )
+            if root == run_id:
+                trace = self._traces.pop(root, None)
+                # Runs abandoned mid-stream never end; forget them with their request.
+                for child in trace["runs"] if trace else ():
+                    self._runs.pop(child, None)
+        if name in self.stages:
+            self.stage_latency.observe(now - start, stage=name, status=status)
+        if root == run_id:
+            self.request_latency.observe(now - start, chain=name, status=status)
+            self._maybe_dump(trace, now - start, status)
+        return name
+
+    def _maybe_dump(self, trace: Optional[dict], seconds: float, status: str) -> None:
+        if self.slow_traces is None or trace is None or seconds < self.slow_seconds:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        self.slow_traces.write(
+            {
+                "timestamp": datetime.utcnow().isoformat(),
+                "chain": trace["name"],
+                "duration_ms": round(1000 * seconds, 1),
+                "status": status,
+                "spans": sorted(trace["spans"], key=lambda s: s["offset_ms"]),
+            }
+        )
+
+    @staticmethod
+    def _name(serialized: Optional[dict], kwargs: dict) -> str:
+        return kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+
+    # -- callbacks --------------------------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        self._end(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs: Any):
+        self._end(run_id, "ok")
+
+    def on_retriever_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None, **kwargs: Any
+    ):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        name = self._end(run_id, "ok")
+        if name is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        if prompt is None:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if metadata:
+                        prompt = (prompt or 0) + metadata.get("input_tokens", 0)
+                        completion = (completion or 0) + metadata.get("output_tokens", 0)
+        if prompt is not None:
+            self.tokens.inc(prompt, stage=name, kind="prompt")
+        if completion is not None:
+            self.tokens.inc(completion, stage=name, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
@@ -0,0 +1,280 @@
+# app/monitoring/collectors.py
+
+
+def _family(name, kind, help, values: dict, label: str, suffix: str = ""):
+    return (name, kind, help, [(suffix, {label: key}, value) for key, value in values.items()])
+
+
+def routing_collector(model):
+    def collect():
+        stats = model.stats()
+        samples = []
+        for backend, snapshot in stats["latency"].items():
+            labels = {"backend": backend}
+            for bound, count in snapshot["buckets"]:
+                samples.append(("_bucket", {**labels, "le": str(bound)}, count))
+            samples.append(("_sum", labels, snapshot["sum"]))
+            samples.append(("_count", labels, snapshot["count"]))
+        return [
+            (
+                "assistant_llm_backend_latency_seconds",
+                "histogram",
+                "LLM latency per backend.",
+                samples,
+            ),
+            _family(
+                "assistant_llm_router_events",
+                "counter",
+                "LLM router calls, failures, fallbacks and hedges.",
+                stats["counters"],
+                "event",
+                "_total",
+            ),
+            (
+                "assistant_llm_breaker_open",
+                "gauge",
+                "1 while the fine-tuned model's breaker is open.",
+                [("", {}, int(stats["breaker"]["state"] == "open"))],
+            ),
+        ]
+
+    return collect
+
+
+def cache_collector(answer_cache, embeddings):
+    def collect():
+        metrics = answer_cache.metrics()
+        events = {
+            k: metrics.get(k, 0) for k in ("exact_hits", "semantic_hits", "misses", "invalidations")
+        }
+        embedding_stats = embeddings.stats()
+        return [
+            _family(
+                "assistant_answer_cache_events",
+                "counter",
+                "Answer cache lookups by outcome.",
+                events,
+                "event",
+                "_total",
+            ),
+            (
+                "assistant_answer_cache_latency_saved_seconds",
+                "counter",
+                "Generation time saved by answer cache hits.",
+                [("_total", {}, metrics.get("latency_saved_seconds", 0.0))],
+            ),
+            (
+                "assistant_answer_cache_entries",
+                "gauge",
+                "Answers currently cached.",
+                [("", {}, metrics["entries"])],
+            ),
+            _family(
+                "assistant_embedding_cache_events",
+                "counter",
+                "Embedding cache lookups by outcome.",
+                {"hit": embedding_stats["hits"], "miss": embedding_stats["misses"]},
+                "event",
+                "_total",
+            ),
+        ]
+
+    return collect
+
+
+def condense_collector(stage):
+    def collect():
+        routes = {k: v for k, v in stage.stats.items() if k != "requests"}
+        return [
+            _family(
+                "assistant_condense_routes",
+                "counter",
+                "Question condensing by route.",
+                routes,
+                "route",
+                "_total",
+            )
+        ]
+
+    return collect
+
+
+def history_collector(policy):
+    def collect():
+        metrics = policy.metrics()
+        return [
+            (
+                "assistant_history_tokens_avg",
+                "gauge",
+                "Average tokens of chat history passed to the condense step.",
+                [("", {}, metrics["avg_history_tokens"])],
+            ),
+            _family(
+                "assistant_history_summaries",
+                "counter",
+                "Rolling history summaries by outcome.",
+                {"ok": metrics["summaries"], "failed": metrics["summary_failures"]},
+                "outcome",
+                "_total",
+            ),
+            (
+                "assistant_history_summaries_pending",
+                "gauge",
+                "Rolling history summaries scheduled but not finished.",
+                [("", {}, metrics["summaries_pending"])],
+            ),
+        ]
+
+    return collect
+
+
+def retrieval_collector(retriever, packer):
+    def collect():
+        routes = {route: s["requests"] for route, s in retriever.route_stats().items()}
+        selection = retriever.selection_stats()
+        context = packer.stats()
+        return [
+            _family(
+                "assistant_retrieval_routes",
+                "counter",
+                "Retrievals by scope route.",
+                routes,
+                "route",
+                "_total",
+            ),
+            _family(
+                "assistant_retrieval_docs_avg",
+                "gauge",
+                "Average documents returned by adaptive retrieval, per chain.",
+                {profile: s["avg_docs"] for profile, s in selection.items()},
+                "profile",
+            ),
+            _family(
+                "assistant_context_tokens",
+                "counter",
+                "Context tokens before and after packing.",
+                {"retrieved": context["tokens_in"], "packed": context["tokens_out"]},
+                "kind",
+                "_total",
+            ),
+        ]
+
+    return collect
+
+
+def analytics_collector(writer):
+    def collect():
+        stats = writer.stats()
+        return [
+            _family(
+                "assistant_analytics_records",
+                "counter",
+                "Analytics records by outcome.",
+                {k: stats[k] for k in ("written", "dropped", "errors")},
+                "event",
+                "_total",
+            ),
+            (
+                "assistant_analytics_queue_depth",
+                "gauge",
+                "Analytics records waiting to be written.",
+                [("", {}, stats["queued"])],
+            ),
+        ]
+
+    return collect
+
+
+def scheduler_collector(scheduler):
+    def collect():
+        stats = scheduler.stats()
+        waiting, events, wait_samples = [], [], []
+        for queue, q in stats["queues"].items():
+            waiting.append(("", {"queue": queue}, q["waiting"]))
+            for event in ("admitted", "queued", "rejected", "timed_out"):
+                events.append(("_total", {"queue": queue, "event": event}, q[event]))
+            for bound, count in q["wait"]["buckets"]:
+                wait_samples.append(("_bucket", {"queue": queue, "le": str(bound)}, count))
+            wait_samples.append(("_sum", {"queue": queue}, q["wait"]["sum"]))
+            wait_samples.append(("_count", {"queue": queue}, q["wait"]["count"]))
+        return [
+            (
+                "assistant_llm_active_calls",
+                "gauge",
+                "LLM calls holding a scheduler slot.",
+                [("", {}, stats["active"])],
+            ),
+            ("assistant_llm_queue_waiting", "gauge", "LLM calls waiting per queue.", waiting),
+            (
+                "assistant_llm_queue_events",
+                "counter",
+                "LLM scheduler admissions and rejections per queue.",
+                events,
+            ),
+            (
+                "assistant_llm_queue_wait_seconds",
+                "histogram",
+                "Time LLM calls waited for a slot.",
+                wait_samples,
+            ),
+        ]
+
+    return collect
+
+
+def single_flight_collector(flights):
+    def collect():
+        metrics = flights.metrics()
+        return [
+            _family(
+                "assistant_coalesced_requests",
+                "counter",
+                "Content requests that ran the chain (leader) or shared an in-flight run (follower).",
+                {"leader": metrics["leaders"], "follower": metrics["followers"]},
+                "role",
+                "_total",
+            ),
+            (
+                "assistant_coalescing_ratio",
+                "gauge",
+                "Share of content requests served by an in-flight run.",
+                [("", {}, metrics["coalescing_ratio"])],
+            ),
+            (
+                "assistant_coalesced_in_flight",
+                "gauge",
+                "Content runs currently in flight.",
+                [("", {}, metrics["in_flight"])],
+            ),
+        ]
+
+    return collect
+
+
+def content_bank_collector(bank):
+    def collect():
+        metrics = bank.metrics()
+        return [
+            _family(
+                "assistant_content_bank_lookups",
+                "counter",
+                "Content bank lookups by outcome.",
+                {k: metrics[k] for k in ("hits", "no_module", "too_specific", "not_generated")},
+                "outcome",
+                "_total",
+            ),
+            (
+                "assistant_content_bank_latency_saved_seconds",
+                "counter",
+                "Generation time saved by content bank hits.",
+                [("_total", {}, metrics["latency_saved_seconds"])],
+            ),
+            (
+                "assistant_content_bank_entries",
+                "gauge",
+                "Pre-generated quizzes and flashcard sets in the bank.",
+                [("", {}, metrics["entries"])],
+            ),
+        ]
+
+    return collect
@@ -0,0 +1,138 @@
+# app/monitoring/metrics.py
+
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+STAGE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# A collected sample: (metric name suffix, labels, value).
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    def __init__(self, name: str, help: str, kind: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, "counter", labelnames)
+        self._values: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [
+                ("_total", dict(zip(self.labelnames, key)), value)
+                for key, value in self._values.items()
+            ]
+
+
+class Histogram(Metric):
+    def __init__(self, name, help, labelnames=(), buckets=STAGE_LATENCY_BUCKETS):
+        super().__init__(name, help, "histogram", labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * len(self.buckets) + [0.0])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        samples = []
+        for key, counts in values.items():
+            labels = dict(zip(self.labelnames, key))
+            samples.extend(histogram_samples(labels, self.buckets, counts[:-1], counts[-1]))
+        return samples
+
+
+def histogram_samples(labels: dict, buckets, counts, total: float) -> List[Sample]:
+    """Prometheus bucket/sum/count samples from per-bucket (non-cumulative) counts."""
+    samples, running = [], 0
+    for bound, count in zip(buckets, counts):
+        running += count
+        samples.append(("_bucket", {**labels, "le": _number(bound)}, running))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, running))
+    return samples
+
+
+class MetricsRegistry:
+    """
+    A minimal Prometheus text-format registry. Besides its own counters and
+    histograms it renders collectors: callables that read the stats the
+    caches, retriever and LLM router already keep.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=STAGE_LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector) -> None:
+        """`collector()` yields (name, kind, help, samples) for metrics it owns."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families = [(m.name, m.kind, m.help, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector {collector} failed: {e}")
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
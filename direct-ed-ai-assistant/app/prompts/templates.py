@@ -10,6 +10,18 @@ Follow Up Input: {question}
 Standalone question:"""
 condense_question_prompt = ChatPromptTemplate.from_template(CONDENSE_QUESTION_PROMPT_TEMPLATE)
 
+SUMMARIZE_HISTORY_PROMPT_TEMPLATE = """
+Progressively summarize the lines of a tutoring conversation, adding onto the previous summary and returning a new summary. Keep the topics, code, terms and questions the student asked about, in a few sentences.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+summarize_history_prompt = ChatPromptTemplate.from_template(SUMMARIZE_HISTORY_PROMPT_TEMPLATE)
+
 
 RAG_PROMPT_TEMPLATE = """
 You are a helpful AI assistant for the E-learning platform. Your goal is to provide a comprehensive and detailed answer based ONLY on the provided context unless no relevant information is available.
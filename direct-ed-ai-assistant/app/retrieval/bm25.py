@@ -0,0 +1,222 @@
+# app/retrieval/bm25.py
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.retrieval.numpy_index import filter_mask, metadata_codes, snapshot_dir, write_snapshot
+
+
+SNAPSHOT_FORMAT = 1
+LEXICAL_MAX_TERMS = int(os.getenv("LEXICAL_MAX_TERMS", "4"))
+LEXICAL_MIN_IDF = float(os.getenv("LEXICAL_MIN_IDF", "1.5"))
+
+# Identifiers keep their characters, so "useEffect", "c++" and "c#" stay one term.
+_TERM_RE = re.compile(r"[a-z0-9][a-z0-9+#_]*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has",
+    "have", "i", "if", "in", "into", "is", "it", "its", "me", "my", "not", "of",
+    "on", "or", "so", "than", "that", "the", "their", "then", "there", "these",
+    "this", "to", "was", "we", "were", "will", "with", "you", "your",
+}
+# Words that make a query a question to be understood rather than keywords to match.
+QUESTION_WORDS = {
+    "how", "why", "what", "when", "where", "which", "who", "explain", "describe",
+    "difference", "compare", "should", "could", "would", "can", "does", "do",
+}
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in _TERM_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the same chunks as the vector store, as an inverted index
+    in CSR form: for each term, the rows that contain it and their
+    length-normalised term weights, precomputed at build time so a query is a
+    few scatter-adds. Persisted beside the vector store by ingest_data.py.
+    """
+
+    def __init__(
+        self,
+        vocabulary: List[str],
+        idf: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ):
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self._codes = metadata_codes(metadatas)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_arrays(cls, ids, documents, metadatas, k1: float = 1.5, b: float = 0.75):
+        counts = [Counter(terms(text)) for text in documents]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() else 1.0
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for row, count in enumerate(counts):
+            for term, tf in count.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        rows, tfs = [], []
+        for i, term in enumerate(vocabulary):
+            entries = postings[term]
+            offsets[i + 1] = offsets[i] + len(entries)
+            df = len(entries)
+            idf[i] = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            rows.extend(r for r, _ in entries)
+            tfs.extend(tf for _, tf in entries)
+        rows = np.array(rows, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float32)
+        norms = k1 * (1 - b + b * lengths[rows] / average) if len(rows) else tfs
+        weights = (tfs * (k1 + 1) / (tfs + norms)).astype(np.float32)
+        metadatas = [dict(m or {}) for m in metadatas]
+        return cls(vocabulary, idf, offsets, rows, weights, list(ids), list(documents), metadatas)
+
+    @classmethod
+    def from_chroma(cls, vector_store):
+        data = vector_store.get(include=["documents", "metadatas"])
+        return cls.from_arrays(data["ids"], data["documents"], data["metadatas"])
+
+    # -- snapshots ------------------------------------------------------------
+
+    def _write(self, directory: str) -> None:
+        np.savez(
+            os.path.join(directory, "postings.npz"),
+            idf=self.idf,
+            offsets=self.offsets,
+            rows=self.rows,
+            weights=self.weights,
+        )
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": SNAPSHOT_FORMAT,
+                    "vocabulary": sorted(self.vocabulary, key=self.vocabulary.get),
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas,
+                },
+                f,
+            )
+
+    def save(self, path: str) -> None:
+        """Writes a new version of the snapshot at `path` (see write_snapshot)."""
+        write_snapshot(path, self._write)
+
+    @classmethod
+    def load(cls, path: str):
+        directory = snapshot_dir(path)
+        if directory is None:
+            raise FileNotFoundError(f"No BM25 index snapshot at {path}")
+        path = directory
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported BM25 index snapshot format in {path}")
+        with np.load(os.path.join(path, "postings.npz")) as arrays:
+            return cls(
+                meta["vocabulary"],
+                arrays["idf"],
+                arrays["offsets"],
+                arrays["rows"],
+                arrays["weights"],
+                meta["ids"],
+                meta["documents"],
+                meta["metadatas"],
+            )
+
+    # -- search ---------------------------------------------------------------
+
+    def _score(self, query_terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 score per row, and how many of the query terms each row contains."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        matched = np.zeros(len(self), dtype=np.int16)
+        for term in set(query_terms):
+            i = self.vocabulary.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            rows = self.rows[start:end]
+            scores[rows] += self.idf[i] * self.weights[start:end]
+            matched[rows] += 1
+        return scores, matched
+
+    def _top(self, scores: np.ndarray, k: int, filter: Optional[dict]) -> List[Tuple[int, float]]:
+        mask = filter_mask(self._codes, len(self), filter)
+        if mask is not None:
+            scores = np.where(mask, scores, 0)
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[int, float]]:
+        """Returns (row, BM25 score) pairs for the top `k` rows that match any query term."""
+        if not len(self):
+            return []
+        scores, _ = self._score(terms(query))
+        return self._top(scores, k, filter)
+
+    def keyword_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Results for a query that is confidently keyword-like, or None: a few
+        known terms, no question words, at least one discriminative term, and
+        the best match in scope containing all of them.
+        """
+        if not len(self):
+            return None
+        words = _TERM_RE.findall((query or "").lower())
+        query_terms = list(dict.fromkeys(terms(query)))
+        if QUESTION_WORDS & set(words) or not 0 < len(query_terms) <= LEXICAL_MAX_TERMS:
+            return None
+        known = [self.vocabulary.get(t) for t in query_terms]
+        if None in known or max(self.idf[i] for i in known) < LEXICAL_MIN_IDF:
+            return None
+        scores, matched = self._score(query_terms)
+        results = self._top(scores, k, filter)
+        if not results or matched[results[0][0]] < len(query_terms):
+            return None
+        return results
+
+    def document(self, row: int) -> Document:
+        return Document(
+            page_content=self.documents[row], metadata=self.metadatas[row], id=self.ids[row]
+        )
+
+
+def load_or_build(vector_store, path: str) -> BM25Index:
+    """Loads the snapshot at `path`, building it from Chroma first if it is missing."""
+    if snapshot_dir(path) is None:
+        print(f"No BM25 index snapshot at {path}; building it from the vector store.")
+        BM25Index.from_chroma(vector_store).save(path)
+    return BM25Index.load(path)
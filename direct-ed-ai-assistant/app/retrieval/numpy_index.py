@@ -0,0 +1,272 @@
+# app/retrieval/numpy_index.py
+
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+
+SNAPSHOT_FORMAT = 1
+FILTER_FIELDS = ("track", "module", "source_name")
+POINTER_FILE = "CURRENT"
+# Superseded versions are kept this long for readers that resolved them before a save.
+RETIRE_SECONDS = 60
+
+
+def metadata_codes(metadatas: List[Dict[str, Any]]) -> Dict[str, Tuple[np.ndarray, Dict[Any, int]]]:
+    """Categorical codes per filterable field, so filters are vectorised."""
+    codes = {}
+    for field in FILTER_FIELDS:
+        values = [m.get(field) for m in metadatas]
+        vocab = {v: i for i, v in enumerate(dict.fromkeys(values))}
+        codes[field] = (np.array([vocab[v] for v in values], dtype=np.int32), vocab)
+    return codes
+
+
+def filter_mask(codes, size: int, filter: Optional[dict]) -> Optional[np.ndarray]:
+    """Supports {field: value} and {field: {"$in": [...]}} on FILTER_FIELDS, ANDed."""
+    if not filter:
+        return None
+    clauses = filter["$and"] if "$and" in filter else [filter]
+    mask = np.ones(size, dtype=bool)
+    for clause in clauses:
+        for field, condition in clause.items():
+            if field not in codes:
+                raise ValueError(f"Cannot filter on {field!r}")
+            field_codes, vocab = codes[field]
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            wanted = [vocab[v] for v in values if v in vocab]
+            mask &= np.isin(field_codes, wanted)
+    return mask
+
+
+def write_snapshot(path: str, write: Callable[[str], None]) -> None:
+    """
+    Writes a new version of the snapshot at `path` into a directory of its
+    own with `write(directory)`, then points `path/CURRENT` at it. Only the
+    pointer is replaced, atomically, so `path` always holds a complete
+    snapshot. The previous version, and any written in the last
+    RETIRE_SECONDS, are kept for readers that resolved them just before the
+    switch; older ones are deleted.
+    """
+    os.makedirs(path, exist_ok=True)
+    version = f"{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+    tmp_path = os.path.join(path, f".{version}.tmp")
+    os.makedirs(tmp_path)
+    write(tmp_path)
+    os.replace(tmp_path, os.path.join(path, version))
+    pointer_tmp = os.path.join(path, f".{POINTER_FILE}.{version}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(path, POINTER_FILE))
+
+    current = snapshot_dir(path)
+    versions = sorted(
+        name
+        for name in os.listdir(path)
+        if not name.startswith(".") and os.path.isdir(os.path.join(path, name))
+    )
+    for name in versions[:-2]:
+        directory = os.path.join(path, name)
+        if directory != current and time.time() - os.path.getmtime(directory) > RETIRE_SECONDS:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def snapshot_dir(path: str) -> Optional[str]:
+    """The directory holding the current version of the snapshot at `path`, or None."""
+    try:
+        with open(os.path.join(path, POINTER_FILE), "r", encoding="utf-8") as f:
+            directory = os.path.join(path, f.read().strip())
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            return directory
+    except FileNotFoundError:
+        pass
+    # Snapshots written before they were versioned keep their files in `path` itself.
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return path
+    return None
+
+
+class NumpyIndex:
+    """
+    Exact nearest-neighbour search over a contiguous embedding matrix. The
+    curriculum is only a few thousand chunks, so one matrix-vector product is
+    both faster and more accurate than going through Chroma's HNSW index.
+
+    Rows are L2-normalised, so the inner product is the cosine similarity.
+    With `quantized=True` rows are stored as int8 with a per-row scale, which
+    cuts memory by 4x at a small cost in score precision.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        scales: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self._codes = metadata_codes(metadatas)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def quantized(self) -> bool:
+        return self.scales is not None
+
+    @classmethod
+    def from_arrays(cls, embeddings, ids, documents, metadatas, quantize: bool = False):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        scales = None
+        if quantize:
+            scales = (np.abs(vectors).max(axis=1) / 127).astype(np.float32)
+            scales[scales == 0] = 1
+            vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+        metadatas = [dict(m or {}) for m in metadatas]
+        return cls(np.ascontiguousarray(vectors), list(ids), list(documents), metadatas, scales)
+
+    @classmethod
+    def from_chroma(cls, vector_store, quantize: bool = False):
+        data = vector_store.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 1), dtype=np.float32)
+        return cls.from_arrays(
+            embeddings, data["ids"], data["documents"], data["metadatas"], quantize
+        )
+
+    # -- snapshots ------------------------------------------------------------
+
+    def _write(self, directory: str) -> None:
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        if self.scales is not None:
+            np.save(os.path.join(directory, "scales.npy"), self.scales)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": SNAPSHOT_FORMAT,
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas,
+                },
+                f,
+            )
+
+    def save(self, path: str) -> None:
+        """Writes a new version of the snapshot at `path` (see write_snapshot)."""
+        write_snapshot(path, self._write)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """Loads a snapshot; the matrix is memory-mapped so startup does not copy it."""
+        directory = snapshot_dir(path)
+        if directory is None:
+            raise FileNotFoundError(f"No numpy index snapshot at {path}")
+        path = directory
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported numpy index snapshot format in {path}")
+        mode = "r" if mmap else None
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        scales_path = os.path.join(path, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return cls(vectors, meta["ids"], meta["documents"], meta["metadatas"], scales)
+
+    # -- search ---------------------------------------------------------------
+
+    def _mask(self, filter: Optional[dict]) -> Optional[np.ndarray]:
+        return filter_mask(self._codes, len(self), filter)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the (normalised) query against every row."""
+        if self.quantized:
+            return (self.vectors @ query) * self.scales
+        return self.vectors @ query
+
+    def search(
+        self, query_vector, k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[int, float]]:
+        """Returns (row, cosine similarity) pairs for the top `k` rows."""
+        if not len(self):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.scores(query)
+        mask = self._mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def document(self, row: int) -> Document:
+        return Document(
+            page_content=self.documents[row], metadata=self.metadatas[row], id=self.ids[row]
+        )
+
+    def vectors_for(self, ids: List[Optional[str]]) -> np.ndarray:
+        """Stored (dequantised) rows for `ids`, zeros for ids not in the index."""
+        rows = [self._rows.get(i, -1) for i in ids]
+        width = self.vectors.shape[1] if self.vectors.ndim == 2 else 1
+        out = np.zeros((len(rows), width), dtype=np.float32)
+        found = [n for n, row in enumerate(rows) if row >= 0]
+        if found:
+            picked = np.asarray([rows[n] for n in found])
+            vectors = self.vectors[picked].astype(np.float32)
+            if self.quantized:
+                vectors *= self.scales[picked][:, None]
+            out[found] = vectors
+        return out
+
+    def similarity_search_with_score(self, query_vector, k: int = 4, filter: Optional[dict] = None):
+        return [(self.document(i), score) for i, score in self.search(query_vector, k, filter)]
+
+
+class NumpyRetriever(BaseRetriever):
+    """Drop-in replacement for Chroma's retriever that searches a NumpyIndex."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: Any
+    embeddings: Embeddings
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector = self.embeddings.embed_query(query)
+        k = self.search_kwargs.get("k", 4)
+        results = self.index.similarity_search_with_score(
+            vector, k=k, filter=self.search_kwargs.get("filter")
+        )
+        return [doc for doc, _ in results]
+
+
+def load_or_export(vector_store, path: str, quantize: bool = False) -> NumpyIndex:
+    """Loads the snapshot at `path`, exporting it from Chroma first if it is missing."""
+    if snapshot_dir(path) is None:
+        print(f"No numpy index snapshot at {path}; exporting from the vector store.")
+        NumpyIndex.from_chroma(vector_store, quantize=quantize).save(path)
+    return NumpyIndex.load(path)
@@ -0,0 +1,208 @@
+# app/retrieval/packing.py
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+
+from app.ingestion.pipeline import CHUNK_OVERLAP, token_counter
+
+
+CONTEXT_BUDGET_FINETUNED = int(os.getenv("CONTEXT_TOKEN_BUDGET_FINETUNED", "1500"))
+CONTEXT_BUDGET_OPENAI = int(os.getenv("CONTEXT_TOKEN_BUDGET_OPENAI", "3000"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+SEPARATOR = "\n---\n"
+# Overlaps shorter than this are treated as coincidence rather than a split boundary.
+_MIN_OVERLAP = 20
+_WORD_RE = re.compile(r"\w+")
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    longest = min(len(left), len(right), CHUNK_OVERLAP * 2)
+    for size in range(longest, _MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class _Passage:
+    def __init__(self, doc: Document, rank: int):
+        self.source = doc.metadata.get("source")
+        self.text = doc.page_content
+        self.rank = rank
+        # (rank, text) of the chunks stitched into this passage.
+        self.chunks = [(rank, doc.page_content)]
+
+    def absorb(
+        self, source: Optional[str], text: str, rank: int, chunks: Optional[list] = None
+    ) -> bool:
+        """Stitches `text` onto either end of this passage if they overlap."""
+        if self.source is None or source != self.source:
+            return False
+        if text in self.text:
+            merged = self.text
+        elif self.text in text:
+            merged = text
+        elif _overlap(self.text, text):
+            merged = self.text + text[_overlap(self.text, text) :]
+        elif _overlap(text, self.text):
+            merged = text + self.text[_overlap(text, self.text) :]
+        else:
+            return False
+        self.text = merged
+        self.rank = min(self.rank, rank)
+        self.chunks.extend(chunks or [(rank, text)])
+        return True
+
+
+class ContextPacker:
+    """
+    Replaces joining every retrieved chunk. Adjacent chunks of the same source
+    are stitched back together (dropping the splitter's overlap), passages
+    that are near-duplicates of a more relevant one are dropped, and the rest
+    are packed in relevance order until the token budget is spent. A
+    passage that does not fit is split back into its chunks and the most
+    relevant ones that fit are packed instead; if nothing has been packed
+    yet and no chunk fits, the most relevant chunk is cut to the budget, so
+    the context is never empty when there are documents.
+    """
+
+    def __init__(
+        self,
+        budget: Callable[[], int],
+        duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.budget = budget
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens = count_tokens or token_counter()
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.recent = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def _stitch(self, docs: List[Document]) -> List[_Passage]:
+        passages: List[_Passage] = []
+        for rank, doc in enumerate(docs):
+            if not any(p.absorb(doc.metadata.get("source"), doc.page_content, rank) for p in passages):
+                passages.append(_Passage(doc, rank))
+        # Absorbing a chunk can make two passages overlap; merge until stable.
+        merged = True
+        while merged:
+            merged = False
+            for i, passage in enumerate(passages):
+                for other in passages[i + 1 :]:
+                    if passage.absorb(other.source, other.text, other.rank, other.chunks):
+                        passages.remove(other)
+                        merged = True
+                        break
+                if merged:
+                    break
+        return sorted(passages, key=lambda p: p.rank)
+
+    def _is_duplicate(self, shingles: set, kept: List[set]) -> bool:
+        for other in kept:
+            smaller = min(len(shingles), len(other)) or 1
+            if len(shingles & other) / smaller >= self.duplicate_threshold:
+                return True
+        return False
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text`, cut at a word boundary, within `max_tokens`."""
+        tokens = self.count_tokens(text)
+        while text and tokens > max_tokens:
+            cut = min(len(text) - 1, int(len(text) * max_tokens / tokens))
+            text = text[:cut].rsplit(None, 1)[0] if " " in text[:cut] else text[:cut]
+            tokens = self.count_tokens(text)
+        return text
+
+    @staticmethod
+    def _restitch(source: Optional[str], chunks: List[tuple]) -> List[str]:
+        """(rank, text) chunks of one passage stitched where adjacent, most relevant first."""
+        parts: List[_Passage] = []
+        for rank, text in chunks:
+            if not any(p.absorb(source, text, rank) for p in parts):
+                parts.append(
+                    _Passage(Document(page_content=text, metadata={"source": source}), rank)
+                )
+        return [p.text for p in sorted(parts, key=lambda p: p.rank)]
+
+    def _fit(self, passage: _Passage, budget: int, first: bool) -> List[str]:
+        """
+        Texts to pack in place of an over-budget passage: its most relevant
+        chunks that fit in `budget`, stitched again where they are adjacent.
+        When none fits and nothing is packed yet (`first`), the most relevant
+        chunk cut to the budget.
+        """
+        lead = 0 if first else self.count_tokens(SEPARATOR)
+        chosen, texts = [], []
+        for chunk in sorted(passage.chunks):
+            trial = self._restitch(passage.source, chosen + [chunk])
+            if lead + self.count_tokens(SEPARATOR.join(trial)) <= budget:
+                chosen, texts = chosen + [chunk], trial
+        if texts or not first or budget <= 0:
+            return texts
+        text = self._truncate(min(passage.chunks)[1], budget)
+        return [text] if text else []
+
+    def pack(self, docs: List[Document]) -> str:
+        budget = self.budget()
+        original = self.count_tokens(SEPARATOR.join(d.page_content for d in docs))
+
+        kept_text, kept_shingles, used = [], [], 0
+        separator_tokens = self.count_tokens(SEPARATOR)
+        for passage in self._stitch(docs):
+            shingles = _shingles(passage.text)
+            if self._is_duplicate(shingles, kept_shingles):
+                continue
+            tokens = self.count_tokens(passage.text) + (separator_tokens if kept_text else 0)
+            if used + tokens <= budget:
+                texts = [passage.text]
+            else:
+                texts = self._fit(passage, budget - used, not kept_text)
+            for text in texts:
+                used += self.count_tokens(text) + (separator_tokens if kept_text else 0)
+                kept_text.append(text)
+                kept_shingles.append(_shingles(text))
+
+        context = SEPARATOR.join(kept_text)
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += original
+            self.tokens_out += used
+            self.recent.append(
+                {
+                    "chunks": len(docs),
+                    "passages": len(kept_text),
+                    "tokens_in": original,
+                    "tokens_out": used,
+                    "budget": budget,
+                }
+            )
+        return context
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": self.tokens_in - self.tokens_out,
+                "avg_tokens_saved": round((self.tokens_in - self.tokens_out) / self.requests, 1)
+                if self.requests
+                else 0.0,
+                "recent": list(self.recent)[-10:],
+            }
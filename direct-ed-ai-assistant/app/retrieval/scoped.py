@@ -0,0 +1,370 @@
+# app/retrieval/scoped.py
+
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from langchain_core.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from app.retrieval.selection import (
+    ADAPTIVE_RETRIEVAL_ENABLED,
+    K_RANGES,
+    RETRIEVAL_ELBOW_GAP,
+    RETRIEVAL_FETCH_FACTOR,
+    RETRIEVAL_MIN_SCORE,
+    RETRIEVAL_MMR_LAMBDA,
+    cutoff,
+    mmr,
+)
+
+
+SCOPED_RETRIEVAL_ENABLED = os.getenv("SCOPED_RETRIEVAL_ENABLED", "true").lower() == "true"
+SCOPED_K = int(os.getenv("SCOPED_RETRIEVAL_K", "10"))
+SCOPED_MIN_SCORE = float(os.getenv("SCOPED_RETRIEVAL_MIN_SCORE", "0.35"))
+ROUTE_MIN_CONFIDENCE = float(os.getenv("SCOPED_ROUTE_MIN_CONFIDENCE", "0.5"))
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9+#.]*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "course", "directed",
+    "do", "does", "for", "from", "how", "i", "in", "intro", "introduction", "is",
+    "it", "main", "me", "module", "of", "on", "or", "recap", "the", "this", "to",
+    "track", "unknown", "what", "when", "why", "with", "you", "your", "basics",
+    "book", "guide", "explain", "difference", "between", "about",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        w.strip(".")
+        for w in _WORD_RE.findall((text or "").lower())
+        if w.strip(".") not in STOPWORDS and len(w.strip(".")) > 1
+    ]
+
+
+class ScopeRouter:
+    """
+    Maps a subject or question to a track/module metadata filter with a
+    keyword classifier built from the ingested metadata: each module is
+    described by its track, module and source names, and terms are weighted by
+    how few modules they occur in. Returns no filter when nothing is
+    confidently matched.
+    """
+
+    def __init__(self, metadatas: List[Dict[str, Any]]):
+        self.modules: Dict[Tuple[str, str], set] = defaultdict(set)
+        for m in metadatas:
+            track, module = m.get("track"), m.get("module")
+            if not track or not module or module == "Unknown Module":
+                continue
+            self.modules[(track, module)].update(
+                tokenize(f"{track} {module} {m.get('source_name', '')}")
+            )
+        document_frequency = defaultdict(int)
+        for terms in self.modules.values():
+            for term in terms:
+                document_frequency[term] += 1
+        total = max(len(self.modules), 1)
+        self.idf = {t: math.log(1 + total / df) for t, df in document_frequency.items()}
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        return cls(vector_store.get(include=["metadatas"])["metadatas"])
+
+    def _scores(self, text: str) -> List[Tuple[float, Tuple[str, str]]]:
+        terms = set(tokenize(text))
+        if not terms:
+            return []
+        scores = []
+        for key, vocabulary in self.modules.items():
+            overlap = terms & vocabulary
+            if overlap:
+                scores.append((sum(self.idf[t] for t in overlap), key))
+        return sorted(scores, reverse=True)
+
+    def route(self, question: str, subject: Optional[str] = None) -> Tuple[str, Optional[dict]]:
+        """Returns (route label, metadata filter or None)."""
+        for text, source in ((subject, "subject"), (question, "question")):
+            scores = self._scores(text) if text else []
+            if not scores:
+                continue
+            best_score, (track, module) = scores[0]
+            # Share of the text's curriculum vocabulary the best module explains.
+            known = sum(self.idf.get(t, 0.0) for t in set(tokenize(text)))
+            confidence = best_score / known
+            if confidence < ROUTE_MIN_CONFIDENCE and source == "question":
+                continue
+            runner_up = [key for score, key in scores[1:] if score >= best_score * 0.8]
+            if not runner_up:
+                return f"{source}:module", {"module": module}
+            if all(key[0] == track for key in runner_up):
+                return f"{source}:track", {"track": track}
+        return "all", None
+
+
+class Candidates(NamedTuple):
+    """One search's results before a profile's selection; see ScopedRetriever.select."""
+
+    route: str
+    results: list
+    scores: List[float]
+    min_score: Optional[float]
+    k: int
+    top: Optional[float]
+    vectors: Any
+    seconds: float
+
+
+class ScopedRetriever(BaseRetriever):
+    """
+    Searches only the track/module partition a request is routed to, with a
+    smaller k, and widens to the whole collection when the partition's best
+    match is weak. Latency and score quality are recorded per route.
+
+    With a `lexical` BM25 index, dense and lexical results are merged by
+    reciprocal-rank fusion, and a query that is confidently keyword-like
+    ("useEffect cleanup", "git rebase") is answered from the lexical index
+    alone, without an embedding call.
+
+    A search for a `profile` in `k_ranges` ("tutoring", "quiz_generation",
+    "flashcard_creation") fetches more candidates and returns as many as are
+    relevant, within that profile's (min k, max k): the count stops at
+    `selection_min_score` or at the first sharp drop in score. The documents
+    are then chosen by MMR over their stored vectors, so near-duplicate
+    chunks do not crowd out the rest.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    search: Any
+    embeddings: Embeddings
+    router: Optional[ScopeRouter] = None
+    k: int = 15
+    scoped_k: int = SCOPED_K
+    min_score: float = SCOPED_MIN_SCORE
+    lexical: Any = None
+    lexical_fast_path: bool = LEXICAL_FAST_PATH
+    rrf_k: int = RRF_K
+    vectors: Any = None
+    adaptive: bool = ADAPTIVE_RETRIEVAL_ENABLED
+    k_ranges: Dict[str, Tuple[int, int]] = K_RANGES
+    selection_min_score: float = RETRIEVAL_MIN_SCORE
+    elbow_gap: float = RETRIEVAL_ELBOW_GAP
+    mmr_lambda: float = RETRIEVAL_MMR_LAMBDA
+    fetch_factor: int = RETRIEVAL_FETCH_FACTOR
+
+    _stats: Dict[str, Dict[str, float]] = PrivateAttr(default_factory=dict)
+    _selection: Dict[str, Dict[str, int]] = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    # (search, router, lexical, vectors), read once per search so a swap never mixes indexes.
+    _backends: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._backends = (self.search, self.router, self.lexical, self.vectors)
+
+    def swap(
+        self,
+        search,
+        router: Optional[ScopeRouter] = None,
+        lexical: Any = None,
+        vectors: Any = None,
+    ) -> None:
+        """Sends new searches to another index; searches already running finish on the old one."""
+        self._backends = (search, router, lexical, vectors)
+        self.search, self.router, self.lexical, self.vectors = search, router, lexical, vectors
+
+    def _record(self, route: str, seconds: float, results, top: Optional[float] = None) -> None:
+        if top is None:
+            top = results[0][1] if results else 0.0
+        with self._lock:
+            stats = self._stats.setdefault(
+                route, {"requests": 0, "latency_seconds": 0.0, "top_score_sum": 0.0, "docs": 0}
+            )
+            stats["requests"] += 1
+            stats["latency_seconds"] += seconds
+            stats["top_score_sum"] += top
+            stats["docs"] += len(results)
+
+    def route_stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    "requests": s["requests"],
+                    "avg_latency_ms": round(1000 * s["latency_seconds"] / s["requests"], 2),
+                    "avg_top_score": round(s["top_score_sum"] / s["requests"], 4),
+                    "avg_docs": round(s["docs"] / s["requests"], 2),
+                }
+                for route, s in self._stats.items()
+            }
+
+    def selection_stats(self) -> dict:
+        with self._lock:
+            return {
+                profile: {
+                    "requests": s["requests"],
+                    "avg_candidates": round(s["candidates"] / s["requests"], 2),
+                    "avg_docs": round(s["docs"] / s["requests"], 2),
+                    "diversified": s["diversified"],
+                }
+                for profile, s in self._selection.items()
+            }
+
+    def _select(self, profile: str, results, scores, min_score: Optional[float], vectors):
+        """
+        Keeps as many of `results` as `scores` call for (see `cutoff`),
+        picked by MMR from the first `fetch_factor` times that many.
+        """
+        if not results:
+            return results
+        min_k, max_k = self.k_ranges[profile]
+        n = cutoff(scores, min_k, max_k, min_score, self.elbow_gap) if scores else min_k
+        pool = results[: n * self.fetch_factor]
+        chosen = list(range(min(n, len(pool))))
+        if vectors is not None and len(pool) > n:
+            top = pool[0][1]
+            relevance = [score / top if top > 0 else 0.0 for _, score in pool]
+            chosen = mmr(relevance, vectors([doc.id for doc, _ in pool]), n, self.mmr_lambda)
+        with self._lock:
+            stats = self._selection.setdefault(
+                profile, {"requests": 0, "candidates": 0, "docs": 0, "diversified": 0}
+            )
+            stats["requests"] += 1
+            stats["candidates"] += len(results)
+            stats["docs"] += len(chosen)
+            stats["diversified"] += int(max(chosen, default=0) >= len(chosen))
+        return [pool[i] for i in chosen]
+
+    def _fuse(self, lexical_index, query: str, dense, k: int, filter: Optional[dict]):
+        """Reciprocal-rank fusion of dense results with BM25 results for the same scope."""
+        lexical = [
+            (lexical_index.document(row), score)
+            for row, score in lexical_index.search(query, k, filter)
+        ]
+        fused: Dict[str, list] = {}
+        for results in (dense, lexical):
+            for rank, (doc, _) in enumerate(results):
+                entry = fused.setdefault(doc.id or doc.page_content, [doc, 0.0])
+                entry[1] += 1 / (self.rrf_k + rank + 1)
+        ranked = sorted(fused.values(), key=lambda entry: -entry[1])[:k]
+        return [(doc, score) for doc, score in ranked]
+
+    def fetch_candidates(
+        self,
+        query: str,
+        subject: Optional[str] = None,
+        module: Optional[str] = None,
+        profiles: Optional[List[str]] = None,
+    ) -> Candidates:
+        """
+        Searches once, fetching enough candidates for `select` with any of
+        `profiles` (every profile in `k_ranges` when None), so the requests
+        of a batch can share one search whatever their chain.
+        """
+        start = time.perf_counter()
+        search, router, lexical, vectors = self._backends
+        profiles = list(self.k_ranges) if profiles is None else profiles
+        fetch = 0
+        if self.adaptive:
+            ranges = [self.k_ranges[p] for p in profiles if p in self.k_ranges]
+            fetch = max((max_k for _, max_k in ranges), default=0) * self.fetch_factor
+        if module:
+            route, filter = "pinned:module", {"module": module}
+        else:
+            route, filter = router.route(query, subject) if router else ("all", None)
+        k = self.scoped_k if filter is not None else self.k
+        if lexical is not None and self.lexical_fast_path:
+            hits = lexical.keyword_search(query, max(k, fetch), filter)
+            if hits:
+                results = [(lexical.document(row), score) for row, score in hits]
+                # BM25 scores have no fixed scale; only the elbow applies.
+                scores = [score / hits[0][1] for _, score in hits]
+                return Candidates(
+                    f"{route}:lexical",
+                    results,
+                    scores,
+                    None,
+                    k,
+                    None,
+                    vectors,
+                    time.perf_counter() - start,
+                )
+
+        vector = self.embeddings.embed_query(query)
+        results = None
+        if filter is not None:
+            results = search(vector, max(k, fetch), filter)
+            if not results or results[0][1] < self.min_score:
+                route, filter, k, results = f"{route}:widened", None, self.k, None
+        if results is None:
+            results = search(vector, max(k, fetch), None)
+        top = results[0][1] if results else 0.0
+        # How many to keep is decided on the cosine scores, before fusion.
+        scores = [score for _, score in results]
+        if lexical is not None:
+            results = self._fuse(lexical, query, results, max(k, fetch), filter)
+        return Candidates(
+            route,
+            results,
+            scores,
+            self.selection_min_score,
+            k,
+            top,
+            vectors,
+            time.perf_counter() - start,
+        )
+
+    def select(self, candidates: Candidates, profile: Optional[str] = None):
+        """The documents a search for `profile` returns from `candidates`."""
+        start = time.perf_counter()
+        if self.adaptive and profile in self.k_ranges:
+            results = self._select(
+                profile,
+                candidates.results,
+                candidates.scores,
+                candidates.min_score,
+                candidates.vectors,
+            )
+        else:
+            results = candidates.results[: candidates.k]
+        seconds = candidates.seconds + time.perf_counter() - start
+        self._record(candidates.route, seconds, results, candidates.top)
+        return results
+
+    def search_with_scores(
+        self,
+        query: str,
+        subject: Optional[str] = None,
+        module: Optional[str] = None,
+        profile: Optional[str] = None,
+    ):
+        """
+        `module` pins the search to that module instead of routing the query.
+        Scores are cosine similarities, BM25 scores on the lexical fast path,
+        and RRF scores when results are fused.
+        """
+        candidates = self.fetch_candidates(query, subject, module, [profile] if profile else [])
+        return self.select(candidates, profile)
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        subject: Optional[str] = None,
+        module: Optional[str] = None,
+        profile: Optional[str] = None,
+        candidates: Optional[Candidates] = None,
+    ) -> List[Document]:
+        """`candidates` from an earlier `fetch_candidates` are used instead of searching."""
+        if candidates is None:
+            return [doc for doc, _ in self.search_with_scores(query, subject, module, profile)]
+        return [doc for doc, _ in self.select(candidates, profile)]
@@ -0,0 +1,53 @@
+# app/retrieval/search.py
+
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+# A vector search backend: (query vector, k, metadata filter) -> [(doc, cosine similarity)]
+VectorSearch = Callable[[List[float], int, Optional[dict]], List[Tuple[Document, float]]]
+# Stored embeddings by document id: [ids] -> one row per id (zeros for unknown ids)
+VectorLookup = Callable[[List[Optional[str]]], np.ndarray]
+
+
+def chroma_vector_search(vector_store) -> VectorSearch:
+    """
+    Searches a Chroma store by vector. Chroma's default space is squared L2;
+    on unit-length embeddings that is 2 - 2cos, so it converts back to cosine
+    similarity and scores are comparable with the numpy backend.
+    """
+
+    def search(vector, k, filter=None):
+        results = vector_store.similarity_search_by_vector_with_relevance_scores(
+            vector, k=k, filter=filter
+        )
+        return [(doc, 1 - distance / 2) for doc, distance in results]
+
+    return search
+
+
+def numpy_vector_search(index) -> VectorSearch:
+    def search(vector, k, filter=None):
+        return index.similarity_search_with_score(vector, k=k, filter=filter)
+
+    return search
+
+
+def chroma_vector_lookup(vector_store) -> VectorLookup:
+    """Reads stored embeddings back from Chroma; no embedding calls."""
+
+    def lookup(ids):
+        known = [i for i in ids if i]
+        data = vector_store._collection.get(ids=known, include=["embeddings"]) if known else None
+        rows = dict(zip(data["ids"], data["embeddings"])) if data else {}
+        width = len(next(iter(rows.values()))) if rows else 1
+        missing = np.zeros(width, dtype=np.float32)
+        return np.array([rows.get(i, missing) if i else missing for i in ids], dtype=np.float32)
+
+    return lookup
+
+
+def numpy_vector_lookup(index) -> VectorLookup:
+    return index.vectors_for
@@ -0,0 +1,81 @@
+# app/retrieval/selection.py
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+ADAPTIVE_RETRIEVAL_ENABLED = os.getenv("ADAPTIVE_RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.3"))
+RETRIEVAL_ELBOW_GAP = float(os.getenv("RETRIEVAL_ELBOW_GAP", "0.15"))
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
+RETRIEVAL_FETCH_FACTOR = int(os.getenv("RETRIEVAL_FETCH_FACTOR", "2"))
+
+
+def _k_range(name: str, min_k: int, max_k: int) -> Tuple[int, int]:
+    return (
+        int(os.getenv(f"RETRIEVAL_{name}_MIN_K", str(min_k))),
+        int(os.getenv(f"RETRIEVAL_{name}_MAX_K", str(max_k))),
+    )
+
+
+# (min k, max k) per chain, keyed like the LLM scheduler's request types.
+K_RANGES = {
+    "tutoring": _k_range("TUTORING", 3, 10),
+    "quiz_generation": _k_range("QUIZ", 5, 15),
+    "flashcard_creation": _k_range("FLASHCARD", 4, 12),
+}
+
+
+def cutoff(
+    scores,
+    min_k: int,
+    max_k: int,
+    min_score: Optional[float] = None,
+    gap: float = RETRIEVAL_ELBOW_GAP,
+) -> int:
+    """
+    How many of `scores` (best first) to keep: those at or above `min_score`,
+    up to the first drop between neighbours of more than `gap` times the top
+    score, and never fewer than `min_k` or more than `max_k`.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    n = min(len(scores), max_k)
+    if min_score is not None:
+        n = min(n, int(np.count_nonzero(scores[:n] >= min_score)))
+    drop = gap * abs(float(scores[0])) if len(scores) else 0.0
+    for i in range(max(min_k, 1), n):
+        if scores[i - 1] - scores[i] > drop:
+            n = i
+            break
+    return min(max(n, min_k), len(scores))
+
+
+def mmr(relevance, vectors, n: int, lambda_mult: float = RETRIEVAL_MMR_LAMBDA) -> List[int]:
+    """
+    Greedy maximal marginal relevance: indices of `n` rows, each chosen for
+    its relevance less its highest cosine similarity to the rows already
+    chosen. `vectors` are the candidates' stored embeddings.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = min(n, len(relevance))
+    if n <= 0:
+        return []
+    unit = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    unit = unit / np.where(norms == 0, 1, norms)
+    similarity = unit @ unit.T
+    chosen = [int(np.argmax(relevance))]
+    closest = similarity[chosen[0]].copy()
+    available = np.ones(len(relevance), dtype=bool)
+    available[chosen[0]] = False
+    while len(chosen) < n:
+        marginal = np.where(
+            available, lambda_mult * relevance - (1 - lambda_mult) * closest, -np.inf
+        )
+        i = int(np.argmax(marginal))
+        chosen.append(i)
+        available[i] = False
+        closest = np.maximum(closest, similarity[i])
+    return chosen
@@ -0,0 +1,73 @@
+# app/retrieval/shared.py
+
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.cache.answers import normalize
+
+
+class SharedRetrieval:
+    """
+    Retrieval results shared by the requests of one batch: the first request
+    for a (question, subject, module) key searches, and the others, whether
+    running at the same time or later, reuse its candidates. Each request
+    still selects its own documents from them, so a quiz and a flashcard set
+    on the same topic share one search.
+    """
+
+    def __init__(self):
+        self._results: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"searches": 0, "shared": 0}
+
+    def run(self, key: tuple, search: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.stats["searches"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = search()
+        except BaseException as e:
+            # Let the next request with this key search again.
+            with self._lock:
+                del self._results[key]
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+
+_current: ContextVar[Optional[SharedRetrieval]] = ContextVar("shared_retrieval", default=None)
+
+
+@contextmanager
+def shared_retrieval() -> Iterator[SharedRetrieval]:
+    """Shares retrieval between the chain runs started inside the block (and their threads)."""
+    shared = SharedRetrieval()
+    token = _current.set(shared)
+    try:
+        yield shared
+    finally:
+        _current.reset(token)
+
+
+def shared_candidates(question: str, subject: Optional[str], module: Optional[str], fetch):
+    """
+    Inside a batch, fetch(), or the candidates of an earlier fetch for the
+    same key in this batch; None outside one, where each request searches
+    for itself.
+    """
+    shared = _current.get()
+    if shared is None:
+        return None
+    key = (normalize(question), (subject or "").strip().lower(), module)
+    return shared.run(key, fetch)
@@ -0,0 +1,365 @@
+# app/retrieval/snapshots.py
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import chromadb
+import numpy as np
+
+from app.retrieval.bm25 import BM25Index
+from app.retrieval.numpy_index import NumpyIndex
+from app.retrieval.search import (
+    chroma_vector_lookup,
+    chroma_vector_search,
+    numpy_vector_lookup,
+    numpy_vector_search,
+)
+
+
+INDEX_SNAPSHOT_DIR = os.getenv("INDEX_SNAPSHOT_DIR", "app/index_snapshots")
+INDEX_SNAPSHOT_KEEP = int(os.getenv("INDEX_SNAPSHOT_KEEP", "3"))
+INDEX_WATCH_SECONDS = float(os.getenv("INDEX_WATCH_SECONDS", "10"))
+INDEX_RETIRE_SECONDS = float(os.getenv("INDEX_RETIRE_SECONDS", "30"))
+# A worker notices a new CURRENT up to INDEX_WATCH_SECONDS late, then closes
+# the version it was serving INDEX_RETIRE_SECONDS after that.
+INDEX_PRUNE_GRACE_SECONDS = float(
+    os.getenv("INDEX_PRUNE_GRACE_SECONDS", str(INDEX_WATCH_SECONDS + INDEX_RETIRE_SECONDS))
+)
+
+SNAPSHOT_FORMAT = 1
+POINTER_FILE = "CURRENT"
+RETIRED_FILE = "RETIRED"
+
+
+# -- snapshot directories -----------------------------------------------------
+
+
+def snapshot_path(version: str, root: str = INDEX_SNAPSHOT_DIR) -> str:
+    return os.path.join(root, version)
+
+
+def is_complete(version: Optional[str], root: str = INDEX_SNAPSHOT_DIR) -> bool:
+    """A published snapshot: a plain directory name whose meta.json has been written."""
+    if not version or version.startswith(".") or os.path.basename(version) != version:
+        return False
+    return os.path.exists(os.path.join(root, version, "meta.json"))
+
+
+def load_meta(version: str, root: str = INDEX_SNAPSHOT_DIR) -> dict:
+    with open(os.path.join(root, version, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported index snapshot format in {snapshot_path(version, root)}")
+    return meta
+
+
+def list_versions(root: str = INDEX_SNAPSHOT_DIR) -> List[str]:
+    """Published snapshots, oldest first (names start with their UTC creation time)."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(v for v in os.listdir(root) if is_complete(v, root))
+
+
+def current_version(root: str = INDEX_SNAPSHOT_DIR) -> Optional[str]:
+    """The version CURRENT points at, or None before the first snapshot is published."""
+    try:
+        with open(os.path.join(root, POINTER_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(version: str, root: str = INDEX_SNAPSHOT_DIR) -> None:
+    """
+    Points CURRENT at `version`; the pointer is replaced atomically. The
+    version it pointed at before gets a RETIRED file, whose mtime is when it
+    stopped being current.
+    """
+    if not is_complete(version, root):
+        raise ValueError(f"No published index snapshot {version!r} in {root}")
+    previous = current_version(root)
+    tmp_path = os.path.join(root, f".{POINTER_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, POINTER_FILE))
+    if previous != version and is_complete(previous, root):
+        with open(os.path.join(root, previous, RETIRED_FILE), "w", encoding="utf-8") as f:
+            f.write(datetime.utcnow().isoformat())
+
+
+def retired_at(version: str, root: str = INDEX_SNAPSHOT_DIR) -> float:
+    """
+    When `version` stopped being current. Versions retired before RETIRED
+    files were written count from the last change of CURRENT.
+    """
+    for path in (os.path.join(root, version, RETIRED_FILE), os.path.join(root, POINTER_FILE)):
+        try:
+            return os.path.getmtime(path)
+        except FileNotFoundError:
+            continue
+    return 0.0
+
+
+def prune(
+    root: str = INDEX_SNAPSHOT_DIR,
+    keep: int = INDEX_SNAPSHOT_KEEP,
+    grace_seconds: float = INDEX_PRUNE_GRACE_SECONDS,
+) -> List[str]:
+    """
+    Deletes published snapshots beyond the newest `keep` and unfinished ones
+    older than the current snapshot. The current snapshot is never deleted,
+    nor one that stopped being current less than `grace_seconds` ago, since
+    a worker that has not seen the switch yet may still be serving it.
+    """
+    now = time.time()
+    current = current_version(root)
+    published = list_versions(root)
+    kept = set(published[-keep:]) if keep > 0 else set()
+    removed = []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        if name == current or name in kept or name.startswith(".") or not os.path.isdir(path):
+            continue
+        if name not in published and (current is None or name > current):
+            # Possibly still being written by another publish.
+            continue
+        if name in published and now - retired_at(name, root) < grace_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+def publish(
+    vector_store,
+    root: str = INDEX_SNAPSHOT_DIR,
+    quantize: bool = False,
+    keep: int = INDEX_SNAPSHOT_KEEP,
+) -> str:
+    """
+    Copies the working vector store into a new snapshot directory (a Chroma
+    collection, plus the numpy and BM25 indexes built from the same rows),
+    then points CURRENT at it. Servers never see a snapshot that is still
+    being written, and switch to the new one on their next check.
+    """
+    version = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    path = snapshot_path(version, root)
+    os.makedirs(path)
+    data = vector_store.get(include=["embeddings", "documents", "metadatas"])
+    ids, documents, metadatas = data["ids"], data["documents"], data["metadatas"]
+    embeddings = data["embeddings"]
+    if embeddings is None or len(embeddings) == 0:
+        embeddings = np.zeros((0, 1), dtype=np.float32)
+
+    source = vector_store._collection
+    client = chromadb.PersistentClient(path=os.path.join(path, "chroma"))
+    try:
+        collection = client.get_or_create_collection(source.name, metadata=source.metadata)
+        step = client.get_max_batch_size()
+        for start in range(0, len(ids), step):
+            end = start + step
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+            )
+    finally:
+        client.close()
+    NumpyIndex.from_arrays(embeddings, ids, documents, metadatas, quantize).save(
+        os.path.join(path, "numpy_index")
+    )
+    BM25Index.from_arrays(ids, documents, metadatas).save(os.path.join(path, "bm25_index"))
+    # Written last: a snapshot without meta.json is unfinished and never served.
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format": SNAPSHOT_FORMAT,
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "chunks": len(ids),
+                "collection": source.name,
+            },
+            f,
+        )
+    set_current(version, root)
+    prune(root, keep)
+    return version
+
+
+# -- serving ------------------------------------------------------------------
+
+
+class IndexVersion:
+    """One loaded index: its Chroma store, optional numpy and BM25 indexes, and scope router."""
+
+    def __init__(
+        self,
+        version: Optional[str],
+        vector_store,
+        numpy_index=None,
+        lexical_index=None,
+        scope_router=None,
+    ):
+        self.version = version
+        self.vector_store = vector_store
+        self.numpy_index = numpy_index
+        self.lexical_index = lexical_index
+        self.scope_router = scope_router
+        self.search = (
+            numpy_vector_search(numpy_index)
+            if numpy_index is not None
+            else chroma_vector_search(vector_store)
+        )
+        # Stored embeddings by id, for diversity selection without embedding calls.
+        self.vectors = (
+            numpy_vector_lookup(numpy_index)
+            if numpy_index is not None
+            else chroma_vector_lookup(vector_store)
+        )
+        self.loaded_at = time.time()
+
+    def warm(self) -> None:
+        """One search, so Chroma loads its HNSW index (or the matrix is paged in) before traffic."""
+        if self.numpy_index is not None:
+            if len(self.numpy_index):
+                self.numpy_index.search(np.ones(self.numpy_index.vectors.shape[1]), 1)
+            return
+        stored = self.vector_store._collection.get(limit=1, include=["embeddings"])["embeddings"]
+        if stored is not None and len(stored):
+            self.search(list(stored[0]), 1)
+
+    def close(self) -> None:
+        client = getattr(self.vector_store, "_client", None)
+        if client is not None and hasattr(client, "close"):
+            client.close()
+
+
+class IndexManager:
+    """
+    Switches the index the server searches to a newly published snapshot
+    without a restart. The new version is loaded and warmed up on the
+    caller's thread (the file watcher, or a worker thread for the admin
+    endpoint) while requests keep searching the current one, then swapped in
+    and passed to the `on_swap` hooks. Searches that already started finish
+    on the old version, which is closed `retire_seconds` later.
+    """
+
+    def __init__(
+        self,
+        open_index: Callable[[Optional[str]], IndexVersion],
+        root: str = INDEX_SNAPSHOT_DIR,
+        watch_seconds: float = INDEX_WATCH_SECONDS,
+        retire_seconds: float = INDEX_RETIRE_SECONDS,
+    ):
+        self.open_index = open_index
+        self.root = root
+        self.watch_seconds = watch_seconds
+        self.retire_seconds = retire_seconds
+        self.on_swap: List[Callable[[IndexVersion], None]] = []
+        self.current = open_index(current_version(root))
+        self.swaps = 0
+        self.failures = 0
+        self.last_swap: Optional[dict] = None
+        self.last_error: Optional[str] = None
+        self._failed_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def reload(self, version: Optional[str] = None) -> dict:
+        """
+        Switches to `version`, pointing CURRENT at it so other workers follow,
+        or to the version CURRENT already names. Raises if it cannot be
+        loaded, in which case the current version keeps serving.
+        """
+        with self._lock:
+            pointer = current_version(self.root)
+            if version is not None and version != pointer:
+                set_current(version, self.root)
+            target = current_version(self.root)
+            old = self.current
+            if target == old.version:
+                return {"status": "unchanged", "version": target}
+            start = time.perf_counter()
+            try:
+                new = self.open_index(target)
+                new.warm()
+            except Exception as e:
+                if target != pointer and pointer is not None:
+                    # Leave CURRENT where it was, so other workers do not try it too.
+                    set_current(pointer, self.root)
+                self.failures += 1
+                self._failed_version = target
+                self.last_error = f"{target}: {type(e).__name__}: {e}"
+                print(f"Index reload failed ({self.last_error}); still serving {old.version}.")
+                raise
+            seconds = round(time.perf_counter() - start, 3)
+            self.current = new
+            for hook in self.on_swap:
+                hook(new)
+            self.swaps += 1
+            self._failed_version = None
+            self.last_swap = {
+                "from": old.version,
+                "to": new.version,
+                "load_seconds": seconds,
+                "at": datetime.utcnow().isoformat(),
+            }
+        print(f"Switched the index from {old.version} to {new.version} (loaded in {seconds}s).")
+        self._retire(old)
+        return {
+            "status": "swapped",
+            "previous": old.version,
+            "version": new.version,
+            "load_seconds": seconds,
+        }
+
+    def _retire(self, old: IndexVersion) -> None:
+        timer = threading.Timer(self.retire_seconds, old.close)
+        timer.daemon = True
+        timer.start()
+
+    # -- file watch -----------------------------------------------------------
+
+    def check(self) -> Optional[dict]:
+        """Reloads if CURRENT names a version other than the one being served."""
+        target = current_version(self.root)
+        if target is None or target in (self.current.version, self._failed_version):
+            return None
+        try:
+            return self.reload()
+        except Exception:
+            return None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_seconds):
+            self.check()
+
+    def start_watching(self) -> None:
+        if self.watch_seconds <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            "version": self.current.version,
+            "loaded_at": datetime.utcfromtimestamp(self.current.loaded_at).isoformat(),
+            "pointer": current_version(self.root),
+            "available": list_versions(self.root),
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "last_swap": self.last_swap,
+            "last_error": self.last_error,
+            "watch_seconds": self.watch_seconds,
+        }
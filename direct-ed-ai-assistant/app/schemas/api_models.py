@@ -35,4 +35,18 @@ class Source(BaseModel):
 
 class ChatOutput(BaseModel):
     answer: str = Field(..., description="The AI-generated answer or content.")
-    sources: Optional[List[Source]] = Field(None, description="A list of source documents used for the answer.")
\ No newline at end of file
+    sources: Optional[List[Source]] = Field(None, description="A list of source documents used for the answer.")
+
+
+class BatchContentInput(BaseModel):
+    items: List[ChatInput] = Field(
+        ...,
+        min_length=1,
+        description="The quiz and flashcard requests to generate, e.g. for every lesson of a module.",
+    )
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="How many items to generate at once; capped by the server.",
+        examples=[4],
+    )
@@ -1,6 +1,10 @@
-import os
+import asyncio
 import json
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 from langserve import add_routes
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,18 +14,50 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-from app.chains.router import (
+from app.chains.assistant import (
+    WARMUP_MODE,
+    aload_router,
     chat_chain_with_history,
     content_generation_chain,
+    is_ready,
+    loaded_router,
+    startup,
+    warm_up,
 )
-from app.schemas.api_models import ChatInput
+from app.analytics.store import get_analytics_store, to_epoch
+from app.chains.batch import BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, run_batch
+from app.analytics.trace import RequestTraceMiddleware
+from app.llms.scheduler import AdmissionRejected, llm_scheduler
+from app.monitoring.metrics import registry
+from app.schemas.api_models import BatchContentInput, ChatInput
 
 load_dotenv()
-LOG_FILE = "app/analytics_log.jsonl"
 
 limiter = Limiter(key_func=get_remote_address)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The chains and their clients are built by warm_up(), not at import, so
+    the process starts serving `/` immediately; `/ready` reports when the
+    assistant can answer.
+    """
+    if WARMUP_MODE == "blocking":
+        await asyncio.to_thread(warm_up)
+    elif WARMUP_MODE == "background":
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
+    router = loaded_router()
+    if router is not None:
+        await router.custom_llm.aclose()
+        router.history_policy.close()
+        router.index_manager.stop()
+        router.analytics_writer.close()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="DirectEd AI Assistant Server",
     version="1.0",
     description="A multi-functional API server for the DirectEd AI assistant.",
@@ -29,6 +65,17 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+app.add_exception_handler(AdmissionRejected, admission_rejected_handler)
+
 API_KEY = os.getenv("BACKEND_SECRET_KEY")
 API_KEY_NAME = "X-API-Key"
 api_key_header_scheme = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -54,14 +101,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTraceMiddleware)
 
 api_dependencies = [Depends(get_api_key)]
 
+
+async def admit_request(config, request: Request):
+    """
+    Turns a request away with 429 before its chain starts (and, on the stream
+    endpoints, before the response begins) when its LLM queue is already full.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return config
+    payload = body.get("input") if isinstance(body, dict) else None
+    if isinstance(payload, dict):
+        llm_scheduler.check(payload.get("request_type"))
+    return config
+
+
 add_routes(
     app,
     chat_chain_with_history,
     path="/api/assistant/chat",
     dependencies=api_dependencies,
+    per_req_config_modifier=admit_request,
 )
 
 add_routes(
@@ -69,22 +134,179 @@ add_routes(
     content_generation_chain,
     path="/api/assistant/content/generate",
     dependencies=api_dependencies,
+    per_req_config_modifier=admit_request,
 )
 
 
+@app.post("/api/assistant/content/batch", dependencies=api_dependencies)
+@limiter.limit("10/minute")
+async def generate_content_batch(request: Request, batch: BatchContentInput, format: str = "ndjson"):
+    """
+    Generates every item of a batch, `max_concurrency` at a time, streaming
+    one result per item as it completes (NDJSON, or SSE with `format=sse`)
+    and a summary at the end. Items are run through the same chain as
+    /api/assistant/content/generate; a failed item is reported in its result
+    with a status_code and does not fail the batch.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch holds at most {BATCH_MAX_ITEMS} items.",
+        )
+    concurrency = min(batch.max_concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    results = run_batch(
+        content_generation_chain, [item.model_dump() for item in batch.items], concurrency
+    )
+
+    async def ndjson():
+        async for result in results:
+            yield json.dumps(result) + "\n"
+
+    async def sse():
+        async for result in results:
+            event = "end" if "summary" in result else "item"
+            yield f"event: {event}\ndata: {json.dumps(result)}\n\n"
+
+    if format == "sse":
+        return StreamingResponse(sse(), media_type="text/event-stream")
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+def analytics_filters(start, end, request_type, session_id, cursor=None):
+    try:
+        to_epoch(start), to_epoch(end), int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start and end must be ISO-8601 timestamps and cursor a value from next_cursor.",
+        )
+    return {"start": start, "end": end, "request_type": request_type, "session_id": session_id}
+
+
 @app.get("/api/assistant/analytics", dependencies=api_dependencies)
 @limiter.limit("10/minute")
-async def get_analytics(request: Request):
-    """Retrieves usage analytics from the log file."""
-    if not os.path.exists(LOG_FILE):
-        return {"status": "ok", "data": [], "message": "No analytics logged yet."}
+def get_analytics(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    request_type: Optional[str] = None,
+    session_id: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    format: str = "json",
+):
+    """
+    Retrieves usage analytics, oldest first, filtered by time range,
+    request_type and session_id. Pages hold at most `limit` records; pass the
+    returned next_cursor to get the next page. `format=jsonl` streams every
+    matching record instead.
+    """
+    filters = analytics_filters(start, end, request_type, session_id, cursor)
+    if format == "jsonl":
+        return StreamingResponse(
+            get_analytics_store().export(**filters), media_type="application/x-ndjson"
+        )
+    page = get_analytics_store().query(limit=limit, cursor=cursor, **filters)
+    if not page["data"] and not cursor:
+        return {"status": "ok", **page, "message": "No analytics logged yet."}
+    return {"status": "ok", **page}
+
+
+@app.get("/api/assistant/analytics/summary", dependencies=api_dependencies)
+@limiter.limit("10/minute")
+def get_analytics_summary(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    request_type: Optional[str] = None,
+    session_id: Optional[str] = None,
+    top: int = 10,
+):
+    """Requests per hour, top questions, average sources used and LLM fallback rate."""
+    filters = analytics_filters(start, end, request_type, session_id)
+    return {"status": "ok", "data": get_analytics_store().summary(top=top, **filters)}
+
+
+@app.get("/api/assistant/llm/status", dependencies=api_dependencies)
+@limiter.limit("30/minute")
+async def get_llm_status(request: Request):
+    """Circuit breaker state, per-backend latency histograms and scheduler queues."""
+    router = await aload_router()
+    return {
+        "status": "ok",
+        "data": {**router.finetuned_llm.stats(), "scheduler": llm_scheduler.stats()},
+    }
 
-    analytics_data = []
-    with open(LOG_FILE, "r") as f:
-        for line in f:
-            analytics_data.append(json.loads(line))
 
-    return {"status": "ok", "data": analytics_data}
+@app.get("/api/assistant/cache/status", dependencies=api_dependencies)
+@limiter.limit("30/minute")
+async def get_cache_status(request: Request):
+    """Hit rates and latency saved by the answer cache and content bank, and request coalescing."""
+    router = await aload_router()
+    return {
+        "status": "ok",
+        "data": {
+            **router.answer_cache.metrics(),
+            "coalescing": router.content_flights.metrics(),
+            "content_bank": router.content_bank.metrics(),
+        },
+    }
+
+
+@app.get("/api/assistant/retrieval/status", dependencies=api_dependencies)
+@limiter.limit("30/minute")
+async def get_retrieval_status(request: Request):
+    """Per-route retrieval latency and scores, adaptive k per chain, and context packing savings."""
+    router = await aload_router()
+    return {
+        "status": "ok",
+        "data": {
+            "routes": router.retriever.route_stats(),
+            "selection": router.retriever.selection_stats(),
+            "context": router.context_packer.stats(),
+        },
+    }
+
+
+@app.get("/api/assistant/index/status", dependencies=api_dependencies)
+@limiter.limit("30/minute")
+async def get_index_status(request: Request):
+    """The index snapshot being served, the published ones and the last swap."""
+    router = await aload_router()
+    return {"status": "ok", "data": router.index_manager.status()}
+
+
+@app.post("/api/assistant/index/reload", dependencies=api_dependencies)
+@limiter.limit("10/minute")
+async def reload_index(request: Request, version: Optional[str] = None):
+    """
+    Switches to the snapshot `version` (for example to roll back), or to the
+    latest one published by ingest_data.py. The new index is loaded and
+    warmed up before it takes traffic; requests keep being served meanwhile.
+    """
+    router = await aload_router()
+    from app.retrieval.snapshots import is_complete
+
+    if version is not None and not is_complete(version):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No published index snapshot {version!r}.",
+        )
+    try:
+        result = await asyncio.to_thread(router.index_manager.reload, version)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not load the index: {type(e).__name__}: {e}",
+        )
+    return {"status": "ok", "data": result}
+
+
+@app.get("/metrics", dependencies=api_dependencies)
+@limiter.limit("60/minute")
+async def get_metrics(request: Request):
+    """Per-stage latency, token, cache and fallback metrics in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -92,3 +314,10 @@ async def get_analytics(request: Request):
 async def read_root(request: Request):
     """Health check endpoint."""
     return {"status": "DirectEd AI Assistant is running"}
+
+
+@app.get("/ready")
+async def readiness(request: Request):
+    """Readiness probe: 200 once the chains are built and warmed up, 503 until then."""
+    body = {"status": "ready" if is_ready() else "starting", "warmup_mode": WARMUP_MODE, **startup}
+    return JSONResponse(body, status_code=200 if is_ready() else 503)
@@ -0,0 +1,94 @@
+"""
+Throughput and latency of CustomChatModel against the local stub server.
+
+    python -m benchmarks.custom_llm_throughput --requests 200 --concurrency 32
+
+Starts benchmarks.stub_hf_server in-process unless --url is given, then
+measures ainvoke latency and astream time-to-first-token.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import uvicorn
+from langchain_core.messages import HumanMessage
+
+from app.llms.custom import CustomChatModel
+from benchmarks._stats import summarize
+
+PROMPT = "Context:\n...\n\nQuestion:\nWhat is MERN?\n\nHelpful Answer:"
+
+
+def start_stub_server(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(
+        "benchmarks.stub_hf_server:app", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(model: CustomChatModel, total: int, concurrency: int, stream: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens, failures = [], [], 0
+    messages = [HumanMessage(content=PROMPT)]
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if stream:
+                    first = None
+                    async for _ in model.astream(messages):
+                        if first is None:
+                            first = time.perf_counter() - start
+                    first_tokens.append(first)
+                else:
+                    await model.ainvoke(messages)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await model.aclose()
+    result = {
+        "mode": "astream" if stream else "ainvoke",
+        "requests_per_s": round(total / elapsed, 1),
+        "failures": failures,
+        "latency": summarize(latencies),
+    }
+    if stream:
+        result["time_to_first_token"] = summarize(first_tokens)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running server (default: start the stub)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    base_url = args.url
+    if not base_url:
+        start_stub_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    for stream in (False, True):
+        model = CustomChatModel(
+            api_url=f"{base_url}/generate", stream_url=f"{base_url}/generate_stream"
+        )
+        print(json.dumps(asyncio.run(run(model, args.requests, args.concurrency, stream)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
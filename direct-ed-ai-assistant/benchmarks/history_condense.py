@@ -0,0 +1,148 @@
+"""
+Condense-question prompt size and latency as a tutoring session grows, with
+the whole stored history against the windowed and summarized history.
+
+    python -m benchmarks.history_condense --turns 200
+    python -m benchmarks.history_condense --ms-per-1k-tokens 50
+
+Every turn asks a follow-up ("And how does that work with X?") so the
+condense LLM call is never bypassed, and stores a tutoring-length answer.
+The LLMs are stand-ins whose latency is `--base-ms` plus `--ms-per-1k-tokens`
+for each thousand prompt tokens, the part of a real call that grows with
+the prompt. Prompt tokens are counted on the real condense prompt. Modes:
+
+    full_unbounded   the session's entire history (no store trimming)
+    full_store_cap   the history the default store keeps (HISTORY_MAX_MESSAGES)
+    policy           HistoryPolicy: window, rolling summary and token cap
+
+For `policy`, the background summaries are allowed to finish between turns,
+as they would while the student reads the answer; their own latency is
+reported separately because no request waits on it.
+"""
+
+import argparse
+import json
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.chains.condense import CondenseQuestionStage
+from app.ingestion.pipeline import token_counter
+from app.memory.history import HISTORY_MAX_MESSAGES, InMemoryHistoryStore
+from app.memory.policy import (
+    HISTORY_SUMMARY_EVERY_TURNS,
+    HISTORY_TOKEN_CAP,
+    HISTORY_WINDOW_TURNS,
+    HistoryPolicy,
+)
+from benchmarks.stubs import CURRICULUM
+
+MODES = ("full_unbounded", "full_store_cap", "policy")
+count_tokens = token_counter()
+
+
+def stub_llm(base_ms: float, ms_per_1k: float, reply: str, calls: list):
+    """An LLM whose latency grows with the prompt; records each call's prompt tokens."""
+
+    def call(prompt_value):
+        tokens = count_tokens(prompt_value.to_string())
+        calls.append(tokens)
+        time.sleep((base_ms + ms_per_1k * tokens / 1000) / 1000)
+        return AIMessage(content=reply)
+
+    return RunnableLambda(call)
+
+
+def conversation(turns: int, answer_words: int):
+    """(question, answer) per turn, cycling through the synthetic curriculum's terms."""
+    words = [w for _, _, _, vocabulary in CURRICULUM for w in vocabulary.split()]
+    for turn in range(turns):
+        term = words[turn % len(words)]
+        question = f"And how does that work with {term}?"
+        body = " ".join(words[(turn + i) % len(words)] for i in range(answer_words))
+        yield question, f"Turn {turn}: about {term}, {body}."
+
+
+def run(mode: str, args) -> dict:
+    condense_calls, summary_calls = [], []
+    stage = CondenseQuestionStage(
+        stub_llm(args.base_ms, args.ms_per_1k_tokens, "Standalone question?", condense_calls)
+    )
+    policy = None
+    if mode == "policy":
+        summary = "The student has been working through " + "earlier topics, " * 40
+        policy = HistoryPolicy(
+            stub_llm(args.base_ms, args.ms_per_1k_tokens, summary, summary_calls),
+            window_turns=args.window_turns,
+            max_tokens=args.token_cap,
+            summary_every_turns=args.summary_every_turns,
+        )
+    max_messages = 10**9 if mode == "full_unbounded" else HISTORY_MAX_MESSAGES
+    store = InMemoryHistoryStore(max_messages=max_messages, max_bytes=10**12)
+    config = {"configurable": {"session_id": "bench-session"}}
+
+    rows = {}
+    for turn, (question, answer) in enumerate(conversation(args.turns, args.answer_words), 1):
+        history = store.get("bench-session")
+        x = {"input": question, "chat_history": history.messages}
+        start = time.perf_counter()
+        if policy:
+            x = policy.apply(x, config)
+        stage.run(x, config)
+        seconds = time.perf_counter() - start
+        if turn in args.report_turns:
+            rows[turn] = {
+                "latency_ms": round(seconds * 1000, 1),
+                "prompt_tokens": condense_calls[-1] if condense_calls else 0,
+                "history_messages": len(x["chat_history"]),
+            }
+        history.add_messages([HumanMessage(content=question), AIMessage(content=answer)])
+        if policy:
+            policy.drain()
+    result = {"turns": rows}
+    if policy:
+        result["summary_calls"] = len(summary_calls)
+        result["summary_prompt_tokens_max"] = max(summary_calls, default=0)
+        result["policy"] = policy.metrics()
+        policy.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--answer-words", type=int, default=150)
+    parser.add_argument("--base-ms", type=float, default=100)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20)
+    parser.add_argument("--window-turns", type=int, default=HISTORY_WINDOW_TURNS)
+    parser.add_argument("--summary-every-turns", type=int, default=HISTORY_SUMMARY_EVERY_TURNS)
+    parser.add_argument("--token-cap", type=int, default=HISTORY_TOKEN_CAP)
+    parser.add_argument(
+        "--report-turns",
+        type=lambda s: {int(t) for t in s.split(",")},
+        default={5, 25, 50, 100, 200},
+    )
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args) for mode in MODES}
+    print(f"{'mode':<16} {'turn':>5} {'messages':>9} {'prompt_tokens':>14} {'latency_ms':>11}")
+    for mode, result in results.items():
+        for turn, row in sorted(result["turns"].items()):
+            print(
+                f"{mode:<16} {turn:>5} {row['history_messages']:>9} "
+                f"{row['prompt_tokens']:>14} {row['latency_ms']:>11}"
+            )
+    print(
+        json.dumps(
+            {
+                "settings": {k: v for k, v in vars(args).items() if k != "report_turns"},
+                "policy": {k: v for k, v in results["policy"].items() if k != "turns"},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
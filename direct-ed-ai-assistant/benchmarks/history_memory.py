@@ -0,0 +1,70 @@
+"""
+Drives the session-history stores with synthetic sessions and reports memory
+at regular checkpoints. With eviction in place, the numbers should level off
+once the session cap is reached instead of growing with the session count.
+
+    python -m benchmarks.history_memory --sessions 100000 --backend memory
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.memory.history import InMemoryHistoryStore, SQLiteHistoryStore
+
+
+def current_rss_mb() -> float:
+    """Current resident set size, read from /proc where it is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-sessions", type=int, default=10_000)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        tmp_dir = tempfile.mkdtemp()
+        store = SQLiteHistoryStore(
+            path=os.path.join(tmp_dir, "history.sqlite3"),
+            max_sessions=args.max_sessions,
+        )
+    else:
+        store = InMemoryHistoryStore(max_sessions=args.max_sessions)
+
+    tracemalloc.start()
+    checkpoint = max(args.sessions // 10, 1)
+    start = time.perf_counter()
+    print(f"{'sessions':>10} {'stored':>8} {'py_heap_mb':>11} {'rss_mb':>8}")
+    for i in range(1, args.sessions + 1):
+        history = store.get(f"session-{i}")
+        for turn in range(args.turns):
+            history.add_messages(
+                [
+                    HumanMessage(content=f"Question {turn} about React hooks #{i}"),
+                    AIMessage(content="A synthetic answer. " * 20),
+                ]
+            )
+        if i % checkpoint == 0:
+            heap_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+            print(f"{i:>10} {len(store):>8} {heap_mb:>11.1f} {current_rss_mb():>8.1f}")
+    elapsed = time.perf_counter() - start
+    print(f"\n{args.sessions / elapsed:,.0f} sessions/s ({args.backend} backend)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Search latency while the served index is switched to a new snapshot, with
+the background hot-swap against loading the new index on the request path.
+
+    python -m benchmarks.index_swap --chunks 5000 --swaps 5
+    python -m benchmarks.index_swap --clients 8 --interval 4
+
+Publishes the synthetic curriculum from benchmarks.stubs twice into a
+scratch snapshot directory, then has `--clients` threads search
+continuously while CURRENT is flipped between the two versions every
+`--interval` seconds. Modes:
+
+    hot_swap           IndexManager loads and warms the new version on
+                       another thread, then swaps it in
+    reload_on_request  the first search after the flip closes the old index
+                       and opens the new one itself, the others wait for it
+
+Latencies are split into steady state and the `--window` seconds after each
+flip. Errors count searches that raised.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from langchain_chroma import Chroma
+
+from app.retrieval.bm25 import BM25Index
+from app.retrieval.scoped import ScopedRetriever, ScopeRouter
+from app.retrieval.snapshots import (
+    IndexManager,
+    IndexVersion,
+    current_version,
+    load_meta,
+    publish,
+    set_current,
+    snapshot_path,
+)
+from benchmarks._stats import summarize
+from benchmarks.stubs import CURRICULUM, StubEmbeddings, synthetic_chunks
+
+MODES = ("hot_swap", "reload_on_request")
+
+
+def opener(root: str, embeddings):
+    def open_index(version):
+        path = snapshot_path(version, root)
+        store = Chroma(
+            collection_name=load_meta(version, root)["collection"],
+            persist_directory=os.path.join(path, "chroma"),
+            embedding_function=embeddings,
+        )
+        return IndexVersion(
+            version,
+            store,
+            lexical_index=BM25Index.load(os.path.join(path, "bm25_index")),
+            scope_router=ScopeRouter.from_vector_store(store),
+        )
+
+    return open_index
+
+
+class ReloadOnRequest:
+    """Checks CURRENT on every search and, when it moved, reopens the index inline."""
+
+    def __init__(self, open_index, root: str, retriever: ScopedRetriever, index: IndexVersion):
+        self.open_index = open_index
+        self.root = root
+        self.retriever = retriever
+        self.index = index
+        self._lock = threading.Lock()
+
+    def search(self, query: str):
+        if current_version(self.root) != self.index.version:
+            with self._lock:
+                target = current_version(self.root)
+                if target != self.index.version:
+                    # Like a restart: the old index is released before the new one loads.
+                    self.index.close()
+                    self.index = self.open_index(target)
+                    self.retriever.swap(
+                        self.index.search,
+                        self.index.scope_router,
+                        self.index.lexical_index,
+                        self.index.vectors,
+                    )
+        return self.retriever.search_with_scores(query)
+
+
+def run(mode: str, root: str, versions, args) -> dict:
+    embeddings = StubEmbeddings(latency_ms=args.embed_latency_ms)
+    open_index = opener(root, embeddings)
+    set_current(versions[0], root)
+    manager = IndexManager(open_index, root, watch_seconds=0, retire_seconds=args.interval / 2)
+    manager.current.warm()
+    retriever = ScopedRetriever(
+        search=manager.current.search,
+        embeddings=embeddings,
+        router=manager.current.scope_router,
+        lexical=manager.current.lexical_index,
+        lexical_fast_path=False,
+    )
+    manager.on_swap.append(
+        lambda index: retriever.swap(
+            index.search, index.scope_router, index.lexical_index, index.vectors
+        )
+    )
+    if mode == "reload_on_request":
+        search = ReloadOnRequest(open_index, root, retriever, manager.current).search
+    else:
+        search = retriever.search_with_scores
+
+    words = [w for _, _, _, vocabulary in CURRICULUM for w in vocabulary.split()]
+    samples, errors, stop = [], [0], threading.Event()
+    lock = threading.Lock()
+
+    def client(seed: int):
+        i = seed
+        while not stop.is_set():
+            query = f"How do {words[i % len(words)]} and {words[(i * 7) % len(words)]} relate?"
+            i += 1
+            start = time.perf_counter()
+            try:
+                search(query)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                samples.append((start, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    flips = []
+    time.sleep(args.interval)
+    for n in range(args.swaps):
+        set_current(versions[(n + 1) % 2], root)
+        flips.append(time.perf_counter())
+        if mode == "hot_swap":
+            threading.Thread(target=manager.check).start()
+        time.sleep(args.interval)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    during = [s for t, s in samples if any(0 <= t - f < args.window for f in flips)]
+    steady = [s for t, s in samples if not any(0 <= t - f < args.window for f in flips)]
+    return {
+        "searches": len(samples),
+        "errors": errors[0],
+        "steady": summarize(steady),
+        "after_swap": {**summarize(during), "max_ms": round(max(during, default=0) * 1000, 1)},
+        "swaps": manager.swaps if mode == "hot_swap" else args.swaps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--swaps", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=3.0, help="Seconds between flips.")
+    parser.add_argument(
+        "--window", type=float, default=1.0, help="Seconds after a flip counted as 'after_swap'."
+    )
+    parser.add_argument("--embed-latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="index-swap-")
+    try:
+        root = os.path.join(scratch, "snapshots")
+        work = Chroma(
+            persist_directory=os.path.join(scratch, "work"), embedding_function=StubEmbeddings()
+        )
+        texts, metadatas = synthetic_chunks(args.chunks, args.seed)
+        for start in range(0, len(texts), 1000):
+            work.add_texts(texts[start : start + 1000], metadatas[start : start + 1000])
+        start = time.perf_counter()
+        versions = [publish(work, root), publish(work, root)]
+        publish_seconds = (time.perf_counter() - start) / 2
+
+        results = {mode: run(mode, root, versions, args) for mode in MODES}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{'mode':<18} {'window':<11} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'errors':>7}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<18} {'steady':<11} {r['steady']['p50_ms']:>8} {r['steady']['p99_ms']:>8} "
+            f"{'':>8} {r['errors']:>7}"
+        )
+        print(
+            f"{mode:<18} {'after_swap':<11} {r['after_swap']['p50_ms']:>8} "
+            f"{r['after_swap']['p99_ms']:>8} {r['after_swap']['max_ms']:>8}"
+        )
+    print(
+        json.dumps(
+            {
+                "chunks": args.chunks,
+                "publish_seconds": round(publish_seconds, 2),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
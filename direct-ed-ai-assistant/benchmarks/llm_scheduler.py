@@ -0,0 +1,90 @@
+"""
+How the LLM scheduler keeps live tutoring responsive during a burst of bulk
+quiz generation.
+
+    python -m benchmarks.llm_scheduler --burst 60 --tutoring 20 --concurrency 4
+
+A burst of quiz calls arrives at once, then tutoring calls arrive at a
+steady rate, all against a stub LLM with fixed latency. The same workload is
+run with one shared FIFO queue and with the weighted per-request_type
+queues, and the latency of each kind of call is reported for both.
+"""
+
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage
+
+from app.llms.scheduler import (
+    DEFAULT_CLASSES,
+    AdmissionRejected,
+    LLMScheduler,
+    QueueClass,
+    ScheduledRunnable,
+)
+from benchmarks._stats import summarize
+from benchmarks.stubs import StubChatModel
+
+
+async def run(scheduler: LLMScheduler, args) -> dict:
+    llm = StubChatModel(latency_ms=args.latency_ms)
+    latencies = {"tutoring": [], "quiz_generation": []}
+    rejected = {"tutoring": 0, "quiz_generation": 0}
+
+    async def call(request_type: str):
+        runnable = ScheduledRunnable(bound=llm, scheduler=scheduler, request_type=request_type)
+        start = time.perf_counter()
+        try:
+            await runnable.ainvoke([HumanMessage(content=f"A {request_type} prompt")])
+            latencies[request_type].append(time.perf_counter() - start)
+        except AdmissionRejected:
+            rejected[request_type] += 1
+
+    async def tutoring():
+        calls = []
+        for _ in range(args.tutoring):
+            calls.append(asyncio.create_task(call("tutoring")))
+            await asyncio.sleep(args.interval)
+        await asyncio.gather(*calls)
+
+    burst = [call("quiz_generation") for _ in range(args.burst)]
+    await asyncio.gather(tutoring(), *burst)
+    return {
+        kind: {**summarize(samples), "rejected": rejected[kind]}
+        for kind, samples in latencies.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=60, help="Quiz calls arriving at once.")
+    parser.add_argument("--tutoring", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between tutoring calls.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    generous = QueueClass(weight=1, queue_limit=10_000, queue_timeout=600)
+    fifo = LLMScheduler(args.concurrency, classes={"shared": generous})
+    weighted = LLMScheduler(
+        args.concurrency,
+        classes={
+            name: config._replace(queue_limit=10_000, queue_timeout=600)
+            for name, config in DEFAULT_CLASSES.items()
+        },
+    )
+
+    print(
+        f"{'scheduler':<10} {'call':<16} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'rejected':>9}"
+    )
+    for name, scheduler in (("fifo", fifo), ("weighted", weighted)):
+        for kind, summary in asyncio.run(run(scheduler, args)).items():
+            print(
+                f"{name:<10} {kind:<16} {summary['p50_ms']:>8} {summary['p95_ms']:>8} "
+                f"{summary['p99_ms']:>8} {summary['rejected']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Offline load test of the chat, content-generation and analytics routes.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16
+    python -m benchmarks.load_test --compare            # against the stored baseline
+    python -m benchmarks.load_test --save-baseline      # after an intended change
+
+Starts benchmarks.stub_app (the real server on stub LLM and embedding
+backends) in a subprocess, drives each route in turn at the given
+concurrency and reports throughput, p50/p95/p99 latency, errors and the
+server's memory. With --compare, exits non-zero when a route's p95 or
+throughput is more than --tolerance worse than the baseline, or it has more
+errors, so regressions in the chain wiring show up.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks._stats import summarize
+from benchmarks.stubs import CURRICULUM
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baselines", "load_test.json")
+ROUTES = ("chat", "content", "analytics")
+
+
+def process_memory_mb(pid: int) -> dict:
+    """Current and peak resident set size of a process, read from /proc."""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    memory[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+def question(rng: random.Random):
+    _, _, source_name, vocabulary = rng.choice(CURRICULUM)
+    first, second = rng.sample(vocabulary.split(), 2)
+    return f"How do {first} and {second} work together?", source_name
+
+
+def build_request(route: str, i: int, rng: random.Random, args) -> tuple:
+    """(method, path, body or params) for the i-th request to a route."""
+    if args.distinct:
+        rng = random.Random(args.seed * 100_003 + i % args.distinct)
+    text, subject = question(rng)
+    suffix = "stream" if args.stream else "invoke"
+    if route == "chat":
+        return (
+            "POST",
+            f"/api/assistant/chat/{suffix}",
+            {
+                "input": {
+                    "input": text,
+                    "user_type": "student",
+                    "request_type": "tutoring",
+                    "subject": subject,
+                    "difficulty_level": "beginner",
+                },
+                "config": {"configurable": {"session_id": f"bench-{i % args.sessions}"}},
+            },
+        )
+    if route == "content":
+        return (
+            "POST",
+            f"/api/assistant/content/generate/{suffix}",
+            {
+                "input": {
+                    "input": text,
+                    "user_type": "student",
+                    "request_type": "quiz_generation" if i % 2 else "flashcard_creation",
+                    "subject": subject,
+                }
+            },
+        )
+    if i % 2:
+        return "GET", "/api/assistant/analytics/summary", {}
+    return "GET", "/api/assistant/analytics", {"limit": 100}
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, payload) -> str:
+    """Sends one request; returns "ok" or a short error label."""
+    if method == "GET":
+        response = await client.get(path, params=payload)
+        return "ok" if response.status_code == 200 else f"http_{response.status_code}"
+    async with client.stream("POST", path, json=payload) as response:
+        body = (await response.aread()).decode("utf-8", "replace")
+    if response.status_code != 200:
+        return f"http_{response.status_code}"
+    # LangServe reports chain errors inside a streamed response as an error event.
+    return "chain_error" if "event: error" in body else "ok"
+
+
+async def run_route(route: str, client: httpx.AsyncClient, args, pid) -> dict:
+    rng = random.Random(f"{args.seed}-{route}")
+    for i in range(args.warmup):
+        await send(client, *build_request(route, -1 - i, rng, args))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, errors = [], {}
+    rss_peak = 0.0
+
+    async def one(i: int):
+        async with semaphore:
+            request = build_request(route, i, rng, args)
+            start = time.perf_counter()
+            try:
+                outcome = await send(client, *request)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            if outcome == "ok":
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    async def sample_memory():
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, process_memory_mb(pid).get("VmRSS", 0.0))
+            await asyncio.sleep(0.1)
+
+    rss_start = process_memory_mb(pid).get("VmRSS") if pid else None
+    sampler = asyncio.create_task(sample_memory()) if pid else None
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.cancel()
+
+    result = {
+        "requests": args.requests,
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+    if pid:
+        result["memory_mb"] = {
+            "rss_start": round(rss_start, 1),
+            "rss_end": round(process_memory_mb(pid).get("VmRSS", 0.0), 1),
+            "rss_peak": round(rss_peak, 1),
+        }
+    return result
+
+
+def start_server(args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "STUB_WORKDIR": tempfile.mkdtemp(prefix="directed-bench-"),
+        "BACKEND_SECRET_KEY": args.api_key,
+        "STUB_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "STUB_LLM_FAILURE_RATE": str(args.llm_failure_rate),
+        "STUB_FALLBACK_LATENCY_MS": str(args.fallback_latency_ms),
+        "STUB_FALLBACK_FAILURE_RATE": str(args.fallback_failure_rate),
+        "STUB_JITTER_MS": str(args.jitter_ms),
+        "STUB_TOKEN_DELAY_MS": str(args.token_delay_ms),
+        "STUB_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "STUB_EMBED_FAILURE_RATE": str(args.embed_failure_rate),
+        "STUB_CHUNKS": str(args.chunks),
+        "STUB_SEED": str(args.seed),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.stub_app:app",
+            "--port",
+            str(args.port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("The stub server exited during startup.")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("The server did not become ready in time.")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for route, current in results["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base:
+            continue
+        if current["latency"]["p95_ms"] > base["latency"]["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{route}: p95 {current['latency']['p95_ms']} ms vs {base['latency']['p95_ms']} ms"
+            )
+        if current["requests_per_s"] < base["requests_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{route}: {current['requests_per_s']} req/s vs {base['requests_per_s']} req/s"
+            )
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{route}: {current['errors']} errors vs {base['errors']}")
+    return regressions
+
+
+async def run(args) -> dict:
+    server = None if args.url else start_server(args)
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-API-Key": args.api_key},
+            timeout=args.timeout,
+            limits=limits,
+        ) as client:
+            await wait_until_ready(client, server)
+            pid = server.pid if server else None
+            results = {"config": config_of(args), "routes": {}}
+            for route in args.routes:
+                results["routes"][route] = await run_route(route, client, args, pid)
+            if pid:
+                results["server_peak_rss_mb"] = round(process_memory_mb(pid).get("VmHWM", 0.0), 1)
+            return results
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def config_of(args) -> dict:
+    keys = [
+        "requests",
+        "concurrency",
+        "stream",
+        "sessions",
+        "distinct",
+        "chunks",
+        "seed",
+        "llm_latency_ms",
+        "llm_failure_rate",
+        "fallback_latency_ms",
+        "fallback_failure_rate",
+        "jitter_ms",
+        "token_delay_ms",
+        "embed_latency_ms",
+        "embed_failure_rate",
+    ]
+    return {key: getattr(args, key) for key in keys}
+
+
+def print_table(results: dict) -> None:
+    print(
+        f"{'route':<10} {'req/s':>7} {'errors':>7} {'p50_ms':>8} {'p95_ms':>8} "
+        f"{'p99_ms':>8} {'rss_peak_mb':>12}"
+    )
+    for route, r in results["routes"].items():
+        peak = r.get("memory_mb", {}).get("rss_peak", "-")
+        latency = r["latency"]
+        print(
+            f"{route:<10} {r['requests_per_s']:>7} {r['errors']:>7} {latency['p50_ms']:>8} "
+            f"{latency['p95_ms']:>8} {latency['p99_ms']:>8} {peak:>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", type=lambda s: s.split(","), default=list(ROUTES))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="Use the /stream endpoints.")
+    parser.add_argument("--sessions", type=int, default=20, help="Chat sessions to spread turns over.")
+    parser.add_argument("--distinct", type=int, default=0, help="Distinct questions (0: all unique).")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--url", help="Drive an already running server instead of the stub app.")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--api-key", default="bench")
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--fallback-latency-ms", type=float, default=500)
+    parser.add_argument("--fallback-failure-rate", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--token-delay-ms", type=float, default=5)
+    parser.add_argument("--embed-latency-ms", type=float, default=20)
+    parser.add_argument("--embed-failure-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: the baseline was recorded with different settings.")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
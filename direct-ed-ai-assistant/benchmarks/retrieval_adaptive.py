@@ -0,0 +1,179 @@
+"""
+Documents, context tokens, precision and redundancy of adaptive retrieval
+(score cutoff plus MMR) against the fixed k=15.
+
+    python -m benchmarks.retrieval_adaptive --chunks 3000 --queries 300
+    python -m benchmarks.retrieval_adaptive --duplicates 0.5 --min-score 0.4
+
+Builds the synthetic curriculum from benchmarks.stubs and adds near-copies
+of a share of the chunks (`--duplicates`), the way the same explanation
+appears in a module's notes and its recap. Half the queries are broad: they
+name two terms of one module, and a chunk is relevant when it belongs to
+that module. The other half are narrow: they ask about an identifier
+("usestate12") that only three chunks (and their copies) mention.
+
+    precision   share of returned chunks that are relevant
+    found       narrow queries: share of the three chunks returned, a copy
+                counting as its original
+    redundant   share of returned chunks that are near-duplicates (cosine
+                above 0.95) of one returned before them
+
+Modes:
+
+    fixed_k15            the previous behaviour: always the top 15
+    tutoring, quiz_generation, flashcard_creation
+                         adaptive retrieval with that chain's k range
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.ingestion.pipeline import token_counter
+from app.retrieval.numpy_index import NumpyIndex
+from app.retrieval.scoped import ScopedRetriever
+from app.retrieval.search import numpy_vector_lookup, numpy_vector_search
+from app.retrieval.selection import K_RANGES
+from benchmarks._stats import summarize
+from benchmarks.stubs import CURRICULUM, StubEmbeddings, synthetic_chunks
+
+MODES = ("fixed_k15",) + tuple(K_RANGES)
+
+
+def build_corpus(chunks: int, duplicates: float, identifiers: int, seed: int):
+    """
+    Synthetic chunks with each of `identifiers` rare terms planted in three
+    of them, plus near-copies (a few words changed) of a share of the chunks.
+    Returns the texts, metadatas, the original row of every row, and the
+    original rows mentioning each identifier.
+    """
+    rng = random.Random(seed)
+    texts, metadatas = synthetic_chunks(chunks, seed)
+    holders = {}
+    for i in range(identifiers):
+        rows = rng.sample(range(chunks), 3)
+        vocabulary = CURRICULUM[rows[0] % len(CURRICULUM)][3]
+        name = f"{rng.choice(vocabulary.split())}{i}"
+        for row in rows:
+            texts[row] = f"{texts[row]} {name} {name} {name}"
+        holders[name] = set(rows)
+    origin = list(range(chunks))
+    for row in rng.sample(range(chunks), int(chunks * duplicates)):
+        words = texts[row].split()
+        for _ in range(3):
+            words[rng.randrange(1, len(words))] = rng.choice(words)
+        texts.append(" ".join(words))
+        metadatas.append(dict(metadatas[row]))
+        origin.append(row)
+    return texts, metadatas, origin, holders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of chunks copied.")
+    parser.add_argument("--identifiers", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--min-score", type=float, default=None, help="RETRIEVAL_MIN_SCORE.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, metadatas, origin, holders = build_corpus(
+        args.chunks, args.duplicates, args.identifiers, args.seed
+    )
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+    index = NumpyIndex.from_arrays(StubEmbeddings().embed_documents(texts), ids, texts, metadatas)
+    count_tokens = token_counter()
+
+    # (kind, query, module for broad queries, original rows for narrow ones)
+    rng = random.Random(args.seed + 1)
+    names = sorted(holders)
+    queries = []
+    for i in range(args.queries):
+        if i % 2:
+            name = rng.choice(names)
+            queries.append(("narrow", f"What does {name} do?", None, holders[name]))
+        else:
+            _, module, _, vocabulary = rng.choice(CURRICULUM)
+            first, second = rng.sample(vocabulary.split(), 2)
+            queries.append(("broad", f"How do {first} and {second} work together?", module, None))
+
+    results = {}
+    for mode in MODES:
+        retriever = ScopedRetriever(
+            search=numpy_vector_search(index),
+            embeddings=StubEmbeddings(),
+            vectors=numpy_vector_lookup(index),
+            adaptive=mode != "fixed_k15",
+            k=15,
+        )
+        if args.min_score is not None:
+            retriever.selection_min_score = args.min_score
+        rows = {"broad": [], "narrow": []}
+        for kind, text, module, relevant in queries:
+            start = time.perf_counter()
+            found = retriever.search_with_scores(text, profile=mode)
+            seconds = time.perf_counter() - start
+            originals = [origin[row_of[doc.id]] for doc, _ in found]
+            if relevant is None:
+                hits = [doc.metadata["module"] == module for doc, _ in found]
+                covered = None
+            else:
+                hits = [row in relevant for row in originals]
+                covered = len(relevant & set(originals)) / len(relevant)
+            vectors = index.vectors_for([doc.id for doc, _ in found])
+            similarity = vectors @ vectors.T
+            redundant = [bool(i) and similarity[i, :i].max() > 0.95 for i in range(len(found))]
+            rows[kind].append(
+                {
+                    "docs": len(found),
+                    "tokens": sum(count_tokens(doc.page_content) for doc, _ in found),
+                    "precision": np.mean(hits),
+                    "found": covered,
+                    "redundant": np.mean(redundant),
+                    "seconds": seconds,
+                }
+            )
+        results[mode] = {}
+        for kind, samples in rows.items():
+            mean = lambda key: round(float(np.mean([s[key] for s in samples])), 4)
+            results[mode][kind] = {
+                "avg_docs": round(mean("docs"), 2),
+                "avg_context_tokens": round(mean("tokens"), 1),
+                "precision": mean("precision"),
+                "found": mean("found") if kind == "narrow" else None,
+                "redundant": mean("redundant"),
+                "latency": summarize([s["seconds"] for s in samples]),
+            }
+
+    print(
+        f"{'mode':<20} {'kind':<7} {'docs':>6} {'tokens':>8} {'precision':>10} {'found':>7} "
+        f"{'redundant':>10} {'p50_ms':>7}"
+    )
+    for mode, by_kind in results.items():
+        for kind, r in by_kind.items():
+            found = "-" if r["found"] is None else r["found"]
+            print(
+                f"{mode:<20} {kind:<7} {r['avg_docs']:>6} {r['avg_context_tokens']:>8} "
+                f"{r['precision']:>10} {found:>7} {r['redundant']:>10} "
+                f"{r['latency']['p50_ms']:>7}"
+            )
+    print(
+        json.dumps(
+            {
+                "chunks": len(texts),
+                "queries": len(queries),
+                "k_ranges": {mode: K_RANGES[mode] for mode in MODES if mode in K_RANGES},
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Latency and recall of hybrid (BM25 + dense) retrieval against dense-only.
+
+    python -m benchmarks.retrieval_hybrid --chunks 3000 --queries 300
+    python -m benchmarks.retrieval_hybrid --embed-latency-ms 150
+
+Builds the synthetic curriculum from benchmarks.stubs and gives every chunk
+a few API-style identifiers ("usestate_17") that occur in a handful of
+chunks, the way "useEffect cleanup" or "git rebase" do in the real notes.
+Half the queries are keyword-like ("usestate_17 render"), half are
+questions around the same identifier. A chunk is relevant when it contains
+the query's identifier; recall@k is the share of relevant chunks returned
+(up to k). Embedding calls go through StubEmbeddings with the given
+latency, so the time saved by the lexical fast path shows up in the
+numbers.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.retrieval.bm25 import BM25Index
+from app.retrieval.numpy_index import NumpyIndex
+from app.retrieval.scoped import ScopedRetriever
+from app.retrieval.search import numpy_vector_search
+from benchmarks._stats import summarize
+from benchmarks.stubs import CURRICULUM, StubEmbeddings, synthetic_chunks
+
+MODES = ("dense", "hybrid", "hybrid_fast_path")
+
+
+def build_corpus(chunks: int, identifiers: int, per_chunk: int, seed: int):
+    """Synthetic chunks plus, per module, `identifiers` rare terms spread over its chunks."""
+    rng = random.Random(seed)
+    texts, metadatas = synthetic_chunks(chunks, seed)
+    names = {}
+    for m, (_, module, _, vocabulary) in enumerate(CURRICULUM):
+        words = vocabulary.split()
+        names[module] = [f"{rng.choice(words)}_{i}" for i in range(identifiers)]
+    holders = {}
+    for row, metadata in enumerate(metadatas):
+        chosen = rng.sample(names[metadata["module"]], per_chunk)
+        texts[row] = f"{texts[row]} {' '.join(chosen)}"
+        for name in chosen:
+            holders.setdefault(name, set()).add(row)
+    return texts, metadatas, holders
+
+
+def queries_for(holders: dict, count: int, seed: int):
+    rng = random.Random(seed + 1)
+    names = sorted(holders)
+    queries = []
+    for i in range(count):
+        name = rng.choice(names)
+        stem = name.rsplit("_", 1)[0]
+        if i % 2:
+            text = f"{name} {stem}"
+        else:
+            text = f"How does {name} change the way {stem} behaves?"
+        queries.append((text, name))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--identifiers", type=int, default=150, help="Rare identifiers per module.")
+    parser.add_argument("--per-chunk", type=int, default=2, help="Identifiers mentioned per chunk.")
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, metadatas, holders = build_corpus(args.chunks, args.identifiers, args.per_chunk, args.seed)
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+
+    start = time.perf_counter()
+    vectors = StubEmbeddings().embed_documents(texts)
+    dense_index = NumpyIndex.from_arrays(vectors, ids, texts, metadatas)
+    embed_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    lexical_index = BM25Index.from_arrays(ids, texts, metadatas)
+    bm25_seconds = time.perf_counter() - start
+
+    queries = queries_for(holders, args.queries, args.seed)
+    results = {}
+    for mode in MODES:
+        embeddings = StubEmbeddings(latency_ms=args.embed_latency_ms, seed=args.seed)
+        retriever = ScopedRetriever(
+            search=numpy_vector_search(dense_index),
+            embeddings=embeddings,
+            lexical=lexical_index if mode != "dense" else None,
+            lexical_fast_path=mode == "hybrid_fast_path",
+            k=args.k,
+        )
+        latencies = {"keyword": [], "question": []}
+        recall = {"keyword": [], "question": []}
+        for text, name in queries:
+            kind = "question" if text.startswith("How") else "keyword"
+            start = time.perf_counter()
+            found = retriever.search_with_scores(text)
+            latencies[kind].append(time.perf_counter() - start)
+            relevant = holders[name]
+            returned = {row_of[doc.id] for doc, _ in found if doc.id in row_of}
+            recall[kind].append(len(relevant & returned) / min(len(relevant), args.k))
+        results[mode] = {
+            kind: {
+                "recall_at_k": round(float(np.mean(recall[kind])), 4),
+                "latency": summarize(latencies[kind]),
+            }
+            for kind in latencies
+        }
+        results[mode]["embedding_calls"] = embeddings.calls
+        results[mode]["routes"] = retriever.route_stats()
+
+    print(
+        f"{'mode':<18} {'kind':<9} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8}"
+    )
+    for mode, r in results.items():
+        for kind in ("keyword", "question"):
+            print(
+                f"{mode:<18} {kind:<9} {r[kind]['recall_at_k']:>9} "
+                f"{r[kind]['latency']['p50_ms']:>8} {r[kind]['latency']['p95_ms']:>8}"
+            )
+    print(
+        json.dumps(
+            {
+                "chunks": len(texts),
+                "queries": len(queries),
+                "k": args.k,
+                "build_seconds": {
+                    "embeddings": round(embed_seconds, 2),
+                    "bm25": round(bm25_seconds, 2),
+                },
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
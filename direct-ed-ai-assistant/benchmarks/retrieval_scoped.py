@@ -0,0 +1,142 @@
+"""
+Latency and hit quality of track/module-scoped retrieval against searching
+the whole collection.
+
+    python -m benchmarks.retrieval_scoped --chunks 5000 --queries 200
+
+Builds a synthetic collection where each module's chunks cluster around its
+own centroid, then asks questions drawn from one module (with that module as
+the subject) plus a share of off-curriculum questions that should widen.
+"Precision" is the fraction of returned chunks that belong to the question's
+module; "recall" is the overlap with an exact in-module top-k.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from app.retrieval.numpy_index import NumpyIndex
+from app.retrieval.scoped import ScopedRetriever, ScopeRouter
+from app.retrieval.search import chroma_vector_search, numpy_vector_search
+from benchmarks._stats import summarize
+
+MODULES = [
+    ("Generative AI", "Module 1: Python for AI", "Python Basics"),
+    ("Generative AI", "Module 2: Prompt Engineering", "Prompt Engineering Guide"),
+    ("Generative AI", "Module 3: RAG", "Retrieval Augmented Generation"),
+    ("Generative AI", "Module 4: LLMOps", "LLMOps Fundamentals"),
+    ("Full Stack", "Module 1: HTML & CSS", "Flexbox and Grid"),
+    ("Full Stack", "Module 2: DOM, MERN & React", "React Hooks"),
+    ("Full Stack", "Module 3: Node & Express", "Express Routing"),
+    ("Full Stack", "Module 4: TypeScript", "TypeScript Handbook"),
+]
+
+
+class QueryVectors(Embeddings):
+    """Returns the pre-computed vector for each benchmark question."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def embed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--off-topic", type=float, default=0.1)
+    parser.add_argument("--spread", type=float, default=3.0, help="Within-module noise; higher overlaps modules more.")
+    parser.add_argument("--min-score", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centroids = rng.standard_normal((len(MODULES), args.dim))
+    labels = rng.integers(0, len(MODULES), args.chunks)
+    vectors = centroids[labels] + rng.standard_normal((args.chunks, args.dim)) * args.spread
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadatas = [
+        {"track": MODULES[m][0], "module": MODULES[m][1], "source_name": MODULES[m][2]}
+        for m in labels
+    ]
+    ids = [f"chunk-{i}" for i in range(args.chunks)]
+
+    store = Chroma(
+        collection_name="bench",
+        persist_directory=tempfile.mkdtemp(),
+        embedding_function=DeterministicFakeEmbedding(size=args.dim),
+    )
+    for start in range(0, args.chunks, 1000):
+        end = min(start + 1000, args.chunks)
+        store._collection.add(
+            ids=ids[start:end],
+            embeddings=vectors[start:end].tolist(),
+            documents=ids[start:end],
+            metadatas=metadatas[start:end],
+        )
+    index = NumpyIndex.from_arrays(vectors, ids, ids, metadatas)
+    router = ScopeRouter(metadatas)
+
+    embeddings = QueryVectors()
+    questions = []
+    for q in range(args.queries):
+        if rng.random() < args.off_topic:
+            module, subject = None, None
+            vector = rng.standard_normal(args.dim)
+        else:
+            module = int(rng.integers(0, len(MODULES)))
+            subject = MODULES[module][2]
+            vector = centroids[module] + rng.standard_normal(args.dim) * args.spread
+        text = f"question {q}"
+        embeddings.vectors[text] = (vector / np.linalg.norm(vector)).tolist()
+        questions.append((text, subject, module))
+
+    results = {}
+    for backend, search in (
+        ("chroma", chroma_vector_search(store)),
+        ("numpy", numpy_vector_search(index)),
+    ):
+        for mode in ("global", "scoped"):
+            retriever = ScopedRetriever(
+                search=search,
+                embeddings=embeddings,
+                router=router if mode == "scoped" else None,
+                k=15,
+                min_score=args.min_score,
+            )
+            latencies, precision, recall, docs = [], [], [], []
+            for text, subject, module in questions:
+                start = time.perf_counter()
+                found = retriever.search_with_scores(text, subject)
+                latencies.append(time.perf_counter() - start)
+                docs.append(len(found))
+                if module is None:
+                    continue
+                wanted = MODULES[module][1]
+                precision.append(np.mean([d.metadata["module"] == wanted for d, _ in found]))
+                truth = {index.ids[i] for i, _ in index.search(embeddings.vectors[text], len(found), {"module": wanted})}
+                recall.append(len(truth & {d.page_content for d, _ in found}) / max(len(truth), 1))
+            results[f"{backend}_{mode}"] = {
+                "precision": round(float(np.mean(precision)), 4),
+                "in_module_recall": round(float(np.mean(recall)), 4),
+                "avg_docs": round(float(np.mean(docs)), 2),
+                "latency": summarize(latencies),
+                "routes": retriever.route_stats(),
+            }
+
+    print(json.dumps({"chunks": args.chunks, "queries": args.queries, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
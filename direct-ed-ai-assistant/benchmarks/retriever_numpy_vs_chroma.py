@@ -0,0 +1,115 @@
+"""
+Recall and latency of the NumpyIndex backend against Chroma's HNSW search.
+
+    python -m benchmarks.retriever_numpy_vs_chroma --chunks 5000 --queries 200
+
+By default a synthetic collection of random unit vectors is built in a
+temporary Chroma store. Pass --persist-dir app/vector_store to measure the
+real index instead; queries are then perturbed copies of stored vectors, so
+no embedding calls are made either way. Recall is measured against an exact
+float64 brute-force search.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.retrieval.numpy_index import NumpyIndex
+from benchmarks._stats import summarize
+
+TRACKS = ["Generative AI", "Full Stack"]
+
+
+def build_synthetic_store(chunks: int, dim: int, seed: int) -> Chroma:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((chunks, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store = Chroma(
+        collection_name="bench",
+        persist_directory=tempfile.mkdtemp(),
+        embedding_function=DeterministicFakeEmbedding(size=dim),
+    )
+    collection = store._collection
+    for start in range(0, chunks, 1000):
+        end = min(start + 1000, chunks)
+        collection.add(
+            ids=[f"chunk-{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=[f"chunk {i}" for i in range(start, end)],
+            metadatas=[{"track": TRACKS[i % 2], "module": f"Module {i % 4}"} for i in range(start, end)],
+        )
+    return store
+
+
+def recall(found, truth) -> float:
+    return len(set(found) & set(truth)) / max(len(truth), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--persist-dir")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.persist_dir:
+        store = Chroma(persist_directory=args.persist_dir, embedding_function=DeterministicFakeEmbedding(size=args.dim))
+    else:
+        store = build_synthetic_store(args.chunks, args.dim, args.seed)
+
+    start = time.perf_counter()
+    exact = NumpyIndex.from_chroma(store)
+    export_seconds = time.perf_counter() - start
+    quantized = NumpyIndex.from_chroma(store, quantize=True)
+
+    snapshot_dir = tempfile.mkdtemp()
+    exact.save(snapshot_dir + "/index")
+    start = time.perf_counter()
+    loaded = NumpyIndex.load(snapshot_dir + "/index")
+    load_seconds = time.perf_counter() - start
+
+    truth_matrix = np.asarray(exact.vectors, dtype=np.float64)
+    rng = np.random.default_rng(args.seed + 1)
+    rows = rng.integers(0, len(exact), args.queries)
+    queries = truth_matrix[rows] + rng.standard_normal((args.queries, truth_matrix.shape[1])) * 0.02
+
+    results = {}
+    for name in ("chroma", "numpy", "numpy_int8", "numpy_mmap", "numpy_filtered"):
+        latencies, recalls = [], []
+        for query in queries:
+            where = {"track": TRACKS[0]} if name == "numpy_filtered" else None
+            scores = truth_matrix @ (query / np.linalg.norm(query))
+            if where:
+                allowed = np.array([m.get("track") == TRACKS[0] for m in exact.metadatas])
+                scores = np.where(allowed, scores, -np.inf)
+            truth = [exact.ids[i] for i in np.argsort(-scores)[: args.k]]
+            start = time.perf_counter()
+            if name == "chroma":
+                docs = store.similarity_search_by_vector(query.tolist(), k=args.k)
+                found = [d.id for d in docs]
+            else:
+                index = {"numpy": exact, "numpy_int8": quantized, "numpy_mmap": loaded, "numpy_filtered": exact}[name]
+                found = [index.ids[i] for i, _ in index.search(query, args.k, where)]
+            latencies.append(time.perf_counter() - start)
+            recalls.append(recall(found, truth))
+        results[name] = {"recall@k": round(float(np.mean(recalls)), 4), "latency": summarize(latencies)}
+
+    print(json.dumps({
+        "chunks": len(exact),
+        "k": args.k,
+        "export_seconds": round(export_seconds, 3),
+        "snapshot_load_seconds": round(load_seconds, 4),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Import and startup time of the server, checked against a time budget.
+
+    python -m benchmarks.startup_time --runs 3
+    python -m benchmarks.startup_time --import-budget 4 --ready-budget 15
+
+Each run starts a fresh interpreter in a scratch directory (an empty vector
+store, no network calls) and measures:
+
+    import    time to `import app.server`
+    live      process start until `/` answers
+    ready     process start until `/ready` answers 200 (chains built, warmed up)
+
+Exits non-zero when the median import or ready time is over its budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = 5.0
+READY_BUDGET_SECONDS = 15.0
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import app.server; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def scratch_env() -> dict:
+    return {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "startup-benchmark"),
+    }
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=tempfile.mkdtemp(prefix="directed-startup-"),
+        env=scratch_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_startup(port: int, timeout: float) -> dict:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port)],
+        cwd=tempfile.mkdtemp(prefix="directed-startup-"),
+        env=scratch_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    times = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while "ready" not in times and time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError("The server exited during startup.")
+                for name, path in (("live", "/"), ("ready", "/ready")):
+                    if name in times:
+                        continue
+                    try:
+                        if client.get(path).status_code == 200:
+                            times[name] = time.perf_counter() - start
+                    except httpx.HTTPError:
+                        break
+                time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--ready-budget", type=float, default=READY_BUDGET_SECONDS)
+    args = parser.parse_args()
+
+    results = {"import": [], "live": [], "ready": []}
+    for _ in range(args.runs):
+        results["import"].append(measure_import())
+        for name, seconds in measure_startup(args.port, args.timeout).items():
+            results[name].append(seconds)
+
+    print(f"{'phase':<8} {'median_s':>9} {'min_s':>7} {'max_s':>7}")
+    medians = {}
+    for name, samples in results.items():
+        if not samples:
+            print(f"{name:<8} {'timeout':>9}")
+            continue
+        medians[name] = statistics.median(samples)
+        print(f"{name:<8} {medians[name]:>9.2f} {min(samples):>7.2f} {max(samples):>7.2f}")
+
+    failures = []
+    for name, budget in (("import", args.import_budget), ("ready", args.ready_budget)):
+        if medians.get(name, float("inf")) > budget:
+            failures.append(f"{name} {medians.get(name, float('inf')):.2f} s > {budget} s")
+    for line in failures:
+        print(f"OVER BUDGET {line}")
+    if failures:
+        sys.exit(1)
+    print("Within the startup budget.")
+
+
+if __name__ == "__main__":
+    main()
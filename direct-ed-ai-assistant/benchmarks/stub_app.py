@@ -0,0 +1,96 @@
+"""
+The real `app.server:app`, wired to the stub backends in benchmarks.stubs and
+a synthetic curriculum, so it can be load-tested offline:
+
+    uvicorn benchmarks.stub_app:app --port 8200
+
+It runs in a scratch directory (STUB_WORKDIR, or a fresh temp dir) so the
+vector store, caches and analytics it creates never touch the repo's own.
+
+Environment:
+    STUB_LLM_LATENCY_MS         fine-tuned model latency (default 300)
+    STUB_LLM_FAILURE_RATE       fraction of fine-tuned model calls that fail
+    STUB_FALLBACK_LATENCY_MS    GPT-3.5 fallback latency (default 500)
+    STUB_FALLBACK_FAILURE_RATE  fraction of fallback calls that fail
+    STUB_JITTER_MS              extra seeded latency, up to this much per call
+    STUB_TOKEN_DELAY_MS         delay between streamed tokens
+    STUB_EMBED_LATENCY_MS       embedding latency (default 20)
+    STUB_EMBED_FAILURE_RATE     fraction of embedding calls that fail
+    STUB_CHUNKS                 synthetic chunks in the vector store
+    STUB_SEED                   seed for latency jitter, failures and the corpus
+    STUB_RATE_LIMITS            "true" to keep the per-IP rate limits
+"""
+
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stubs import (  # noqa: E402
+    StubChatModel,
+    StubEmbeddings,
+    install_stubs,
+    synthetic_chunks,
+)
+
+LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "300"))
+LLM_FAILURE_RATE = float(os.getenv("STUB_LLM_FAILURE_RATE", "0"))
+FALLBACK_LATENCY_MS = float(os.getenv("STUB_FALLBACK_LATENCY_MS", "500"))
+FALLBACK_FAILURE_RATE = float(os.getenv("STUB_FALLBACK_FAILURE_RATE", "0"))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", "50"))
+TOKEN_DELAY_MS = float(os.getenv("STUB_TOKEN_DELAY_MS", "5"))
+EMBED_LATENCY_MS = float(os.getenv("STUB_EMBED_LATENCY_MS", "20"))
+EMBED_FAILURE_RATE = float(os.getenv("STUB_EMBED_FAILURE_RATE", "0"))
+CHUNKS = int(os.getenv("STUB_CHUNKS", "400"))
+SEED = int(os.getenv("STUB_SEED", "0"))
+RATE_LIMITS = os.getenv("STUB_RATE_LIMITS", "false").lower() == "true"
+
+
+def seed_vector_store(embeddings: StubEmbeddings, count: int, seed: int) -> None:
+    from langchain_chroma import Chroma
+
+    store = Chroma(persist_directory="app/vector_store", embedding_function=embeddings)
+    if store._collection.count():
+        return
+    texts, metadatas = synthetic_chunks(count, seed)
+    for start in range(0, count, 500):
+        store.add_texts(texts[start : start + 500], metadatas[start : start + 500])
+
+
+os.chdir(os.getenv("STUB_WORKDIR") or tempfile.mkdtemp(prefix="directed-bench-"))
+os.makedirs("app", exist_ok=True)
+os.environ.setdefault("BACKEND_SECRET_KEY", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+embeddings = StubEmbeddings(
+    latency_ms=EMBED_LATENCY_MS,
+    failure_rate=EMBED_FAILURE_RATE,
+    seed=SEED,
+)
+seed_vector_store(StubEmbeddings(), CHUNKS, SEED)
+install_stubs(
+    embeddings,
+    openai_llm=StubChatModel(
+        backend="openai",
+        latency_ms=FALLBACK_LATENCY_MS,
+        jitter_ms=JITTER_MS,
+        token_delay_ms=TOKEN_DELAY_MS,
+        failure_rate=FALLBACK_FAILURE_RATE,
+        seed=SEED + 1,
+    ),
+    custom_llm=StubChatModel(
+        backend="custom",
+        latency_ms=LLM_LATENCY_MS,
+        jitter_ms=JITTER_MS,
+        token_delay_ms=TOKEN_DELAY_MS,
+        failure_rate=LLM_FAILURE_RATE,
+        seed=SEED + 2,
+    ),
+)
+
+from app.server import app, limiter  # noqa: E402
+
+limiter.enabled = RATE_LIMITS
@@ -0,0 +1,58 @@
+"""
+Local stand-in for the fine-tuned model's Hugging Face Space. It echoes the
+prompt followed by a canned answer, like the real endpoint, so the marker
+stripping in CustomChatModel is exercised.
+
+    STUB_LATENCY_MS=300 uvicorn benchmarks.stub_hf_server:app --port 8100
+
+Environment:
+    STUB_LATENCY_MS      delay before the response (or first token)
+    STUB_TOKEN_DELAY_MS  delay between streamed tokens
+    STUB_FAILURE_RATE    fraction of requests answered with HTTP 503
+"""
+
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+TOKEN_DELAY_MS = float(os.getenv("STUB_TOKEN_DELAY_MS", "5"))
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+
+ANSWER = (
+    "MERN stands for MongoDB, Express.js, React and Node.js. Together they let "
+    "you build a full web application in JavaScript, from the database to the UI."
+)
+
+app = FastAPI(title="Stub fine-tuned model")
+
+
+def _maybe_fail():
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        raise HTTPException(status_code=503, detail="Injected failure")
+
+
+@app.post("/generate")
+async def generate(request: Request):
+    body = await request.json()
+    _maybe_fail()
+    await asyncio.sleep(LATENCY_MS / 1000)
+    return {"response": f"{body.get('prompt', '')}\n{ANSWER}"}
+
+
+@app.post("/generate_stream")
+async def generate_stream(request: Request):
+    body = await request.json()
+    _maybe_fail()
+
+    async def tokens():
+        await asyncio.sleep(LATENCY_MS / 1000)
+        yield f"{body.get('prompt', '')}\n"
+        for word in ANSWER.split(" "):
+            await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+            yield word + " "
+
+    return StreamingResponse(tokens(), media_type="text/plain")
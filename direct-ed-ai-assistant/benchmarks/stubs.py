@@ -0,0 +1,302 @@
+"""
+Deterministic local stand-ins for the backends the server talks to, so the
+full app can be benchmarked without OpenAI or the Hugging Face Space:
+
+    StubEmbeddings  for OpenAIEmbeddings (hashed bag-of-words vectors)
+    StubChatModel   for ChatOpenAI and CustomChatModel (canned answers)
+
+Both take a fixed latency plus seeded jitter and a failure rate, so runs are
+repeatable. `install_stubs()` swaps them in for the real classes; it must be
+called before `app.chains.router` is imported.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+TUTORING_ANSWER = (
+    "MERN stands for MongoDB, Express.js, React and Node.js. Together they let "
+    "you build a full web application in JavaScript, from the database to the UI."
+)
+QUIZ_ANSWER = (
+    "1. Which hook runs side effects after render?\n"
+    "A) useState B) useEffect C) useMemo D) useRef\n"
+    "Correct Answer: B\nExplanation: useEffect runs after the component renders."
+)
+FLASHCARD_ANSWER = (
+    "Front: What does useState return?\n"
+    "Back: The current state value and a function to update it."
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+# (track, module, source_name, vocabulary) for the synthetic curriculum.
+CURRICULUM = [
+    (
+        "Full Stack",
+        "Module 2: DOM, MERN & React",
+        "React Hooks",
+        "react hooks usestate useeffect component render props state jsx virtual dom",
+    ),
+    (
+        "Full Stack",
+        "Module 3: Node & Express",
+        "Express Routing",
+        "express node middleware routing request response server api endpoint mongodb",
+    ),
+    (
+        "Full Stack",
+        "Module 4: TypeScript",
+        "TypeScript Handbook",
+        "typescript types interfaces generics compiler annotations union narrowing",
+    ),
+    (
+        "Generative AI",
+        "Module 2: Prompt Engineering",
+        "Prompt Engineering Guide",
+        "prompt engineering few shot chain thought instructions temperature tokens",
+    ),
+    (
+        "Generative AI",
+        "Module 3: RAG",
+        "Retrieval Augmented Generation",
+        "retrieval augmented generation embeddings vector store chunking context rag",
+    ),
+    (
+        "Generative AI",
+        "Module 4: LLMOps",
+        "LLMOps Fundamentals",
+        "llmops monitoring deployment evaluation latency observability pipelines mlops",
+    ),
+]
+
+
+def synthetic_chunks(count: int, seed: int):
+    """Chunks that mix one module's vocabulary with filler, with curriculum metadata."""
+    rng = random.Random(seed)
+    filler = "the a of and to in is for on with this that by as it an be are".split()
+    texts, metadatas = [], []
+    for i in range(count):
+        track, module, source_name, vocabulary = CURRICULUM[i % len(CURRICULUM)]
+        words = vocabulary.split()
+        body = " ".join(rng.choice(words + filler) for _ in range(120))
+        texts.append(f"{source_name}. {body}")
+        metadatas.append(
+            {
+                "track": track,
+                "module": module,
+                "source_name": source_name,
+                "source_url": f"https://example.com/{i % len(CURRICULUM)}/{i}",
+            }
+        )
+    return texts, metadatas
+
+
+class InjectedFailure(RuntimeError):
+    pass
+
+
+class _Behaviour:
+    """Seeded latency and failure decisions, shared by a stub's threads."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, failure_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self) -> float:
+        """The delay for the next call in seconds; raises for injected failures."""
+        with self._lock:
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        if fail:
+            raise InjectedFailure("Injected failure")
+        return delay / 1000
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Hashes each word into one of `size` dimensions and normalizes, so texts
+    sharing words are close in cosine space and retrieval behaves sensibly.
+    """
+
+    def __init__(
+        self,
+        size: int = 1536,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.size = size
+        self.model = "stub-embedding"
+        self.calls = 0
+        self._behaviour = _Behaviour(latency_ms, jitter_ms, failure_rate, seed)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            vector[zlib.crc32(word.encode()) % self.size] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self._behaviour.next())
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self._behaviour.next())
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Answers with a canned tutoring answer, quiz or flashcard set depending on
+    the prompt, after `latency_ms` (plus up to `jitter_ms`), streaming the
+    words `token_delay_ms` apart. Reports token usage like the OpenAI client.
+    """
+
+    backend: str = "stub"
+    latency_ms: float = 200.0
+    jitter_ms: float = 0.0
+    token_delay_ms: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 0
+
+    _behaviour: Optional[_Behaviour] = PrivateAttr(default=None)
+
+    @property
+    def behaviour(self) -> _Behaviour:
+        if self._behaviour is None:
+            self._behaviour = _Behaviour(
+                self.latency_ms, self.jitter_ms, self.failure_rate, self.seed
+            )
+        return self._behaviour
+
+    @property
+    def _llm_type(self) -> str:
+        return f"stub_{self.backend}"
+
+    def open(self) -> None:
+        """Matches CustomChatModel, whose pooled clients the server opens on warm-up."""
+
+    async def aclose(self) -> None:
+        """Matches CustomChatModel, whose pooled clients the server closes on shutdown."""
+
+    @staticmethod
+    def _answer(messages: List[BaseMessage]) -> str:
+        prompt = str(messages[-1].content) if messages else ""
+        if "Quiz" in prompt or "quiz" in prompt:
+            return QUIZ_ANSWER
+        if "Flashcard" in prompt or "flashcard" in prompt:
+            return FLASHCARD_ANSWER
+        return TUTORING_ANSWER
+
+    @staticmethod
+    def _message(text: str, messages: List[BaseMessage]) -> AIMessage:
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(text.split())
+        return AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.behaviour.next())
+        message = self._message(self._answer(messages), messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.behaviour.next())
+        message = self._message(self._answer(messages), messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.behaviour.next())
+        for word in self._answer(messages).split(" "):
+            time.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.behaviour.next())
+        for word in self._answer(messages).split(" "):
+            await asyncio.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def install_stubs(
+    embeddings: StubEmbeddings, openai_llm: StubChatModel, custom_llm: StubChatModel
+) -> None:
+    """
+    Makes `OpenAIEmbeddings(...)`, `ChatOpenAI(...)` and `CustomChatModel(...)`
+    return the given stubs. Only affects modules imported afterwards.
+    """
+    import langchain_openai
+
+    import app.llms.custom
+
+    langchain_openai.OpenAIEmbeddings = lambda *args, **kwargs: embeddings
+    langchain_openai.ChatOpenAI = lambda *args, **kwargs: openai_llm
+    app.llms.custom.CustomChatModel = lambda *args, **kwargs: custom_llm
@@ -1,123 +1,45 @@
+import argparse
+import json
 import os
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.cache.embeddings import CachedEmbeddings
+from app.ingestion.dedup import DedupIndex, merge_source_names, minhash, path_of, scope_of
+from app.ingestion.manifest import IngestManifest, chunk_ids_for, hash_file, hash_metadata
+from app.ingestion.sources import SOURCES_CONFIG
+from app.retrieval.snapshots import INDEX_SNAPSHOT_DIR, current_version, publish
+from app.ingestion.pipeline import (
+    StageStats,
+    batched,
+    embed_with_retry,
+    load_chunks,
+    token_counter,
+)
 
 load_dotenv()
 print("✅ Environment variables loaded.")
 
-SOURCES_CONFIG = [
-    {
-        "track": "Generative AI", "module": "Module 1: Python Recap, APIs, & AI Backend",
-        "path": "app/data/gen_ai_track/module_1_python_apis_backend",
-        "sources": [
-            {"type": "local", "file_name": "1_python_recap.txt", "source_name": "DirectEd: Python Recap"},
-            {"type": "local", "file_name": "2_intro_to_gen_ai.txt", "source_name": "DirectEd: Intro to Gen AI"},
-            {"type": "local", "file_name": "3_intro_to_llms.txt", "source_name": "DirectEd: Intro to LLMs"},
-            {"type": "local", "file_name": "4_intro_to_prompt_eng.txt", "source_name": "DirectEd: Intro to Prompt Engineering"},
-            {"type": "local", "file_name": "5_ai_python_for_beginners.txt", "source_name": "DirectEd: AI Python For Beginners"},
-            {"type": "local", "file_name": "6_what_is_an_api.txt", "source_name": "DirectEd: What is an API?"},
-            {"type": "local", "file_name": "7_fastapi_basics.txt", "source_name": "DirectEd: FastAPI Basics"},
-            {"type": "local", "file_name": "8_using_postman.txt", "source_name": "DirectEd: Using Postman"},
-            {"type": "local", "file_name": "9_ai_backend_gemini_fastapi.txt", "source_name": "DirectEd: AI Backend with Gemini & FastAPI"},
-            {"type": "local", "file_name": "10_git_collaboration.txt", "source_name": "DirectEd: Git Collaboration"},
-            {"type": "pdf", "url": "https://file.notion.so/f/f/a953852c-d342-4227-95cb-26bc2e5e8e56/ff802771-623f-46e5-aa07-8d139f313f99/git-cheat-sheet-education_2.pdf?table=block&id=21b52c03-8379-8152-a17e-c2e364df7648&spaceId=a953852c-d342-4227-95cb-26bc2e5e8e56&expirationTimestamp=1756029600000&signature=BV6jUbqJwiUCwz7s65M403hcl33Yd0xFoetAzBIbuHw&downloadName=git-cheat-sheet-education_2.pdf", "file_name": "10a_git_cheatsheet.pdf", "source_name": "Git Cheat Sheet", "source_url": "https://file.notion.so/f/f/a953852c-d342-4227-95cb-26bc2e5e8e56/ff802771-623f-46e5-aa07-8d139f313f99/git-cheat-sheet-education_2.pdf"},
-        ]
-    },
-    {
-        "track": "Generative AI", "module": "Module 2: Generative AI Deep Dive",
-        "path": "app/data/gen_ai_track/module_2_gen_ai_deep_dive",
-        "sources": [
-            {"type": "local", "file_name": "1_gen_ai_recap.txt", "source_name": "DirectEd: Gen AI Recap"},
-            {"type": "pdf", "url": "https://file.notion.so/f/f/a953852c-d342-4227-95cb-26bc2e5e8e56/1df2f27c-6ef4-4c7d-b5d7-e329459951d4/big-book-generative-ai-databricks.pdf?table=block&id=22152c03-8379-818f-a565-c0c193c42dff&spaceId=a953852c-d342-4227-95cb-26bc2e5e8e56&expirationTimestamp=1756029600000&signature=K9IYpHkQvRuJX4Wb5LN7S7ywCcychZBfTjoUEqkmxBw&downloadName=big-book-generative-ai-databricks.pdf", "file_name": "1a_databricks_gen_ai_book.pdf", "source_name": "Databricks: Big Book of Gen AI", "source_url": "https://file.notion.so/f/f/a953852c-d342-4227-95cb-26bc2e5e8e56/1df2f27c-6ef4-4c7d-b5d7-e329459951d4/big-book-generative-ai-databricks.pdf"},
-            {"type": "local", "file_name": "2_gen_ai_main_course.txt", "source_name": "DirectEd: Gen AI Main Course"},
-        ]
-    },
-    {
-        "track": "Generative AI", "module": "Module 3: Gen AI Essentials",
-        "path": "app/data/gen_ai_track/module_3_gen_ai_essentials",
-        "sources": [
-            {"type": "local", "file_name": "1_gen_ai_essentials_main_course.txt", "source_name": "DirectEd: Gen AI Essentials Main Course"},
-            {"type": "local", "file_name": "2_project_management.txt", "source_name": "DirectEd: Project Management"},
-            {"type": "local", "file_name": "3_multi_agent_systems_crewai.txt", "source_name": "DirectEd: Multi-Agent Systems with CrewAI"},
-        ]
-    },
-    {
-        "track": "Generative AI", "module": "Module 4: LLMOps & Production-Grade Gen-AI Systems",
-        "path": "app/data/gen_ai_track/module_4_llmops",
-        "sources": [
-            {"type": "local", "file_name": "1_llmops_fundamentals.txt", "source_name": "DirectEd: LLMOps Fundamentals"},
-            {"type": "scrape", "url": "https://signoz.io/guides/llmops/", "file_name": "1a_signoz_llmops.txt", "selector": "article.prose", "source_name": "Signoz: LLMOps Guide", "source_url": "https://signoz.io/guides/llmops/"},
-            {"type": "local", "file_name": "2_data_management_vector_db.txt", "source_name": "DirectEd: Data Management & Vector Databases"},
-            {"type": "local", "file_name": "3_model_finetuning.txt", "source_name": "DirectEd: Model Fine-tuning & Development"},
-        ]
-    },
-    {
-        "track": "Full Stack", "module": "Module 1: Frontend Basics",
-        "path": "app/data/full_stack_track/module_1_frontend_basics",
-        "sources": [
-            {"type": "local", "file_name": "1_internet_recap.txt", "source_name": "DirectEd: The Internet (Recap)"},
-            {"type": "local", "file_name": "2_what_is_full_stack.txt", "source_name": "DirectEd: What is Full Stack?"},
-            {"type": "local", "file_name": "3_html5.txt", "source_name": "DirectEd: HTML5"},
-            {"type": "local", "file_name": "4_css3.txt", "source_name": "DirectEd: CSS3"},
-            {"type": "local", "file_name": "5_tailwind.txt", "source_name": "DirectEd: Tailwind"},
-            {"type": "local", "file_name": "6_intro_to_js.txt", "source_name": "DirectEd: Introduction to JavaScript"},
-        ]
-    },
-    {
-        "track": "Full Stack", "module": "Module 2: DOM, MERN, & React",
-        "path": "app/data/full_stack_track/module_2_dom_mern_react",
-        "sources": [
-            {"type": "local", "file_name": "1_js_dom.txt", "source_name": "DirectEd: JavaScript DOM"},
-            {"type": "pdf", "url": "https://drive.google.com/uc?export=download&id=1duftOF4EoT8g-u4M73V-JbxWYTddZGCY", "file_name": "1a_js_book.pdf", "source_name": "JavaScript Book", "source_url": "https://drive.google.com/file/d/1duftOF4EoT8g-u4M73V-JbxWYTddZGCY/view"},
-            {"type": "pdf", "url": "https://drive.google.com/uc?export=download&id=1y3Hgtio5T3qnJDzp9TiN-sxjUIRL2KB-", "file_name": "1b_js_cheatsheet.pdf", "source_name": "JavaScript Cheat Sheet", "source_url": "https://drive.google.com/file/d/1y3Hgtio5T3qnJDzp9TiN-sxjUIRL2KB-/view"},
-            {"type": "local", "file_name": "2_mern_dynamic_apps.txt", "source_name": "DirectEd: MERN & Dynamic Web Apps"},
-            {"type": "scrape", "url": "https://www.mongodb.com/mern-stack", "file_name": "2a_mongodb_mern.txt", "selector": "main", "source_name": "MongoDB: MERN Stack", "source_url": "https://www.mongodb.com/mern-stack"},
-            {"type": "local", "file_name": "3_intro_to_react.txt", "source_name": "DirectEd: Intro to React"},
-            {"type": "pdf", "url": "https://drive.google.com/uc?export=download&id=1xlUs6mWfgJ-whUqYOVJv3M2de8oZMimu", "file_name": "3a_react_book.pdf", "source_name": "React Book", "source_url": "https://drive.google.com/file/d/1xlUs6mWfgJ-whUqYOVJv3M2de8oZMimu/view"},
-            {"type": "pdf", "url": "https://drive.google.com/uc?export=download&id=1fb1uR5hAHWs5liRDNdsxP0pZXDiQJ1GE", "file_name": "3b_react_cheatsheet.pdf", "source_name": "React Cheat Sheet", "source_url": "https://drive.google.com/file/d/1fb1uR5hAHWs5liRDNdsxP0pZXDiQJ1GE/view"},
-            {"type": "local", "file_name": "4_beginner_react.txt", "source_name": "DirectEd: Beginner React"},
-            {"type": "local", "file_name": "5_intermediate_react.txt", "source_name": "DirectEd: Intermediate React"},
-            {"type": "local", "file_name": "6_advanced_react.txt", "source_name": "DirectEd: Advanced React"},
-        ]
-    },
-    {
-        "track": "Full Stack", "module": "Module 3: Backend programming",
-        "path": "app/data/full_stack_track/module_3_backend_programming",
-        "sources": [
-            {"type": "local", "file_name": "1_nodejs.txt", "source_name": "DirectEd: Server-Side Programming with Node.js"},
-            {"type": "local", "file_name": "2_mysql.txt", "source_name": "DirectEd: Relational Databases with MySQL"},
-            {"type": "local", "file_name": "3_mongodb.txt", "source_name": "DirectEd: Non-Relational Databases with MongoDB"},
-            {"type": "local", "file_name": "4_express.txt", "source_name": "DirectEd: Express Framework"},
-            {"type": "local", "file_name": "5_project_management.txt", "source_name": "DirectEd: Project Management"},
-        ]
-    },
-    {
-        "track": "Full Stack", "module": "Module 4: MERN + Typescript",
-        "path": "app/data/full_stack_track/module_4_mern_typescript",
-        "sources": [
-            {"type": "local", "file_name": "1_intro_to_typescript.txt", "source_name": "DirectEd: Introduction To Typescript"},
-            {"type": "local", "file_name": "2_beginner_ts_exercises.txt", "source_name": "DirectEd: Beginner Exercises on Typescript"},
-            {"type": "local", "file_name": "3_react_with_ts_exercises.txt", "source_name": "DirectEd: Exercises on React with Typescript"},
-            {"type": "local", "file_name": "4_solving_ts_errors.txt", "source_name": "DirectEd: Solving TypeScript Errors"},
-            {"type": "local", "file_name": "5_building_mern_with_ts.txt", "source_name": "DirectEd: Building a MERN App with TypeScript"},
-            {"type": "scrape", "url": "https://dev.to/raju_dandigam/smarter-javascript-in-2025-10-typescript-features-you-cant-ignore-5cf1?utm_source=chatgpt.com", "file_name": "6_typescript_features.txt", "selector": "article", "source_name": "Dev.to: TypeScript Features", "source_url": "https://dev.to/raju_dandigam/smarter-javascript-in-2025-10-typescript-features-you-cant-ignore-5cf1"},
-        ]
-    },
-]
-
 VECTOR_STORE_PATH = "app/vector_store"
+MANIFEST_PATH = os.path.join(VECTOR_STORE_PATH, "ingest_manifest.json")
+
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 2)))
+DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "2"))
+NUMPY_INDEX_QUANTIZE = os.getenv("NUMPY_INDEX_QUANTIZE", "false").lower() == "true"
+DEDUP_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, "dedup_index.npz")
+DEDUP_REPORT_PATH = os.path.join(VECTOR_STORE_PATH, "dedup_report.json")
 
 print("Loading Google Generative AI embedding model 'models/embedding-001'...")
-embedding_function = OpenAIEmbeddings(
+embedding_function = CachedEmbeddings(OpenAIEmbeddings(
     model="text-embedding-3-small"
-)
+))
 vector_store = Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=embedding_function)
 print("Setup complete. Database and OpenAI model are ready.")
 
@@ -157,55 +79,164 @@ def download_and_save_pdf(url: str, file_path: str):
     except Exception as e:
         print(f"PDF download failed for {url}: {e}. Skipping.")
 
-def process_document(path: str, metadata: dict):
-    """Loads, splits, and embeds a single document into the vector store."""
-    print(f"\n Processing file: {os.path.basename(path)}")
-    try:
-        if path.endswith(".pdf"):
-            loader = PyPDFLoader(path)
-        elif path.endswith(".txt"):
-            loader = TextLoader(path, encoding="utf-8")
+def existing_chunk_ids(path: str, manifest: IngestManifest):
+    """Chunk ids currently stored for `path`, from the manifest or the store itself."""
+    ids = manifest.chunk_ids(path)
+    if ids is not None:
+        return ids
+    # Files ingested before the manifest existed used positional ids.
+    return vector_store.get(where={"source": path}, include=[])["ids"]
+
+
+def plan_document(
+    path: str,
+    chunks,
+    file_hash: str,
+    metadata_hash: str,
+    manifest: IngestManifest,
+    dedup: DedupIndex = None,
+):
+    """
+    Works out which chunks of a parsed document need embedding and which ids
+    are orphaned. With a dedup index, new chunks that near-duplicate a stored
+    chunk of the same track and module are recorded as aliases of it instead
+    of being embedded.
+    """
+    new_chunks = chunk_ids_for(path, [c.page_content for c in chunks], metadata_hash)
+    old_ids = set(existing_chunk_ids(path, manifest))
+    to_add, aliases = [], {}
+    for chunk_id, chunk in zip(new_chunks, chunks):
+        if chunk_id in old_ids:
+            continue
+        if dedup is not None:
+            signature, scope = minhash(chunk.page_content), scope_of(chunk.metadata)
+            canonical = dedup.find(signature, scope)
+            if canonical is not None:
+                aliases[chunk_id] = (canonical, chunk.metadata.get("source_name"))
+                continue
+            dedup.add(chunk_id, signature, scope)
+        to_add.append((chunk_id, chunk))
+    return {
+        "path": path,
+        "file_hash": file_hash,
+        "metadata_hash": metadata_hash,
+        "chunks": {i: d for i, d in new_chunks.items() if i not in aliases},
+        "aliases": aliases,
+        "to_add": to_add,
+        "to_delete": sorted(old_ids - set(new_chunks)),
+    }
+
+
+def merge_duplicate_sources(plans, dry_run: bool = False):
+    """
+    Adds the source names of aliased chunks to their canonical chunk, either
+    before it is embedded or, for chunks already stored, as a metadata-only
+    update. Aliases always share the canonical chunk's track and module, so
+    its scope filters still match them. Returns the dedup report.
+    """
+    clusters = {}
+    for plan in plans:
+        for alias, (canonical, source_name) in plan["aliases"].items():
+            cluster = clusters.setdefault(canonical, {"canonical": canonical, "duplicates": []})
+            cluster["duplicates"].append({"id": alias, "source_name": source_name})
+
+    pending = {chunk_id: chunk for plan in plans for chunk_id, chunk in plan["to_add"]}
+    stored = [c for c in clusters if c not in pending]
+    current = {}
+    if stored:
+        data = vector_store.get(ids=stored, include=["metadatas"])
+        current = dict(zip(data["ids"], data["metadatas"]))
+    updates = {}
+    for canonical, cluster in clusters.items():
+        metadata = pending[canonical].metadata if canonical in pending else current.get(canonical)
+        if metadata is None:
+            continue
+        merged = merge_source_names(
+            metadata.get("source_name"), *(d["source_name"] for d in cluster["duplicates"])
+        )
+        cluster["source_name"] = merged
+        if merged == metadata.get("source_name"):
+            continue
+        if canonical in pending:
+            metadata["source_name"] = merged
         else:
-            return 
+            updates[canonical] = {**metadata, "source_name": merged}
+    if updates and not dry_run:
+        vector_store._collection.update(ids=list(updates), metadatas=list(updates.values()))
 
-        docs = loader.load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.split_documents(docs)
-        if not chunks:
-            print("No text chunks found—skipping")
-            return
+    return {
+        "duplicates": sum(len(c["duplicates"]) for c in clusters.values()),
+        "canonical_chunks": len(clusters),
+        "stored_chunks_updated": len(updates),
+        "clusters": sorted(clusters.values(), key=lambda c: -len(c["duplicates"])),
+    }
 
-        for c in chunks:
-            c.metadata.update(metadata)
 
-        ids = [f"{path}__{i}" for i in range(len(chunks))]
-        vector_store.add_documents(documents=chunks, ids=ids)
-        print(f"Processed {len(chunks)} chunks and updated vector store.")
-    except Exception as e:
-        print(f"Failed to process {os.path.basename(path)}: {e}")
+def load_dedup_index() -> DedupIndex:
+    """
+    The persisted dedup index, or one built from the store the first time
+    dedup runs or when the persisted one predates scopes.
+    """
+    if os.path.exists(DEDUP_INDEX_PATH):
+        index = DedupIndex.load(DEDUP_INDEX_PATH)
+        if not index.unscoped():
+            return index
+    index = DedupIndex()
+    data = vector_store.get(include=["documents", "metadatas"])
+    for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+        index.add(chunk_id, minhash(text), scope_of(metadata or {}))
+    return index
 
-def main():
-    """Iterate through the config, acquire data, and process all files, including untracked ones."""
-    
-    print("\n---  Acquiring Configured Data ---")
+
+def remove_missing_files(
+    seen_paths: set, manifest: IngestManifest, dedup: DedupIndex = None, dry_run: bool = False
+):
+    """Deletes the chunks of files that are in the manifest but no longer on disk."""
+    deleted, removed = 0, []
+    for path in [p for p in manifest.files if p not in seen_paths and not os.path.exists(p)]:
+        ids = manifest.chunk_ids(path)
+        deleted += len(ids)
+        removed.append(path)
+        print(f"{'[dry-run] would remove' if dry_run else 'Removing'} {len(ids)} chunks of deleted file {path}")
+        if dedup is not None:
+            dedup.remove(ids)
+        if not dry_run:
+            if ids:
+                vector_store.delete(ids=ids)
+            manifest.remove(path)
+            manifest.save()
+    return deleted, removed
+
+
+def acquire_sources(download_workers: int, dry_run: bool = False):
+    """Downloads and scrapes missing configured sources on a thread pool."""
     managed_files = set()
+    jobs = []
     for config in SOURCES_CONFIG:
         module_path = config["path"]
         for source in config["sources"]:
             file_path = os.path.join(module_path, source["file_name"])
             managed_files.add(os.path.abspath(file_path))
-            if not os.path.exists(file_path):
-                if source["type"] == "scrape":
-                    scrape_and_save(source["url"], file_path, source["selector"])
-                elif source["type"] == "pdf":
-                    download_and_save_pdf(source["url"], file_path)
-
-    print("\n--- Processing and Embedding All Documents ---")
-    
-    print("\n--- Processing Configured Files ---")
+            if os.path.exists(file_path):
+                continue
+            if dry_run:
+                print(f"[dry-run] would acquire {file_path}")
+            elif source["type"] == "scrape":
+                jobs.append((scrape_and_save, source["url"], file_path, source["selector"]))
+            elif source["type"] == "pdf":
+                jobs.append((download_and_save_pdf, source["url"], file_path))
+
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        for future in as_completed([pool.submit(*job) for job in jobs]):
+            future.result()
+    return managed_files, len(jobs)
+
+
+def collect_documents(managed_files: set):
+    """Every (path, metadata) pair to ingest: configured sources first, then untracked files."""
+    documents = []
     for config in SOURCES_CONFIG:
         module_path = config["path"]
-        print(f"\n--- Module: {config['module']} ---")
         if not os.path.exists(module_path):
             print(f"Directory not found: {module_path}. Skipping.")
             continue
@@ -218,10 +249,8 @@ def main():
                     "track": config["track"],
                     "module": config["module"],
                 }
-                process_document(path, metadata)
-                time.sleep(1)
+                documents.append((path, metadata))
 
-    print("\n--- Processing Un-configured Files ---")
     for root, dirs, files in os.walk("app/data"):
         for fname in files:
             path = os.path.join(root, fname)
@@ -240,10 +269,210 @@ def main():
                         else "Unknown Module"
                     ),
                 }
-                process_document(path, metadata)
-                time.sleep(1)
+                documents.append((path, metadata))
+    return [(p, m) for p, m in documents if p.endswith((".pdf", ".txt"))]
+
+
+def main(
+    dry_run: bool = False,
+    parse_workers: int = PARSE_WORKERS,
+    download_workers: int = DOWNLOAD_WORKERS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    dedup: bool = True,
+):
+    """Acquire data, then parse, diff and embed all files in a staged, parallel pipeline."""
+    manifest = IngestManifest(MANIFEST_PATH)
+    dedup_index = load_dedup_index() if dedup else None
+    count_tokens = token_counter()
+    acquire = StageStats("acquire")
+    parse = StageStats("parse")
+    dedupe = StageStats("dedup")
+    embed = StageStats("embed")
+    store = StageStats("store")
+    totals = {"added": 0, "deleted": 0, "skipped": 0, "duplicates": 0, "merged": 0}
+
+    print("\n---  Acquiring Configured Data ---")
+    with acquire:
+        managed_files, acquire.files = acquire_sources(download_workers, dry_run)
+
+    documents = collect_documents(managed_files)
+    deleted, removed_paths = remove_missing_files(
+        {p for p, _ in documents}, manifest, dedup_index, dry_run
+    )
+    totals["deleted"] += deleted
+
+    print("\n--- Parsing and Splitting Changed Documents ---")
+    pending, unchanged = [], []
+    for path, metadata in documents:
+        file_hash, metadata_hash = hash_file(path), hash_metadata(metadata)
+        if manifest.is_unchanged(path, file_hash, metadata_hash):
+            unchanged.append((path, metadata, file_hash, metadata_hash))
+        else:
+            pending.append((path, metadata, file_hash, metadata_hash))
+    # Unchanged files whose duplicates point into a changed file are re-planned,
+    # since their canonical chunk may be gone. Without dedup, every aliased
+    # chunk has to be stored again.
+    changed = {p for p, *_ in pending} | set(removed_paths)
+    for entry in unchanged:
+        canonicals = manifest.aliases(entry[0]).values()
+        if canonicals and (dedup_index is None or any(path_of(c) in changed for c in canonicals)):
+            pending.append(entry)
+        else:
+            totals["skipped"] += 1
+    order = {path: i for i, (path, _) in enumerate(documents)}
+    pending.sort(key=lambda entry: order[entry[0]])
+
+    parsed = {}
+    with parse, ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        futures = {pool.submit(load_chunks, p, m): (p, fh, mh) for p, m, fh, mh in pending}
+        for future in as_completed(futures):
+            path, file_hash, metadata_hash = futures[future]
+            try:
+                chunks = future.result() or []
+            except Exception as e:
+                print(f"Failed to process {os.path.basename(path)}: {e}")
+                continue
+            if not chunks:
+                print(f"No text chunks found in {os.path.basename(path)}—skipping")
+            parse.files += 1
+            parse.chunks += len(chunks)
+            parsed[path] = (chunks, file_hash, metadata_hash)
+
+    # Plans are made in document order so the configured sources, which come
+    # first, are the ones kept when their chunks are duplicated elsewhere.
+    plans = []
+    with dedupe:
+        if dedup_index is not None:
+            for path, (chunks, _, metadata_hash) in parsed.items():
+                new_ids = chunk_ids_for(path, [c.page_content for c in chunks], metadata_hash)
+                dedup_index.remove(set(existing_chunk_ids(path, manifest)) - set(new_ids))
+        for path, _, _, _ in pending:
+            if path not in parsed:
+                continue
+            chunks, file_hash, metadata_hash = parsed[path]
+            plan = plan_document(path, chunks, file_hash, metadata_hash, manifest, dedup_index)
+            dedupe.chunks += len(chunks)
+            totals["added"] += len(plan["to_add"])
+            totals["deleted"] += len(plan["to_delete"])
+            totals["duplicates"] += len(plan["aliases"])
+            print(
+                f"{'[dry-run] ' if dry_run else ''}{os.path.basename(path)}: "
+                f"{len(plan['to_add'])} to add, {len(plan['to_delete'])} to delete, "
+                f"{len(plan['aliases'])} duplicates of {len(chunks)} chunks."
+            )
+            plans.append(plan)
+        report = merge_duplicate_sources(plans, dry_run)
+        totals["merged"] = report["stored_chunks_updated"]
+
+    if dedup_index is not None:
+        print(
+            f"\n{'[dry-run] ' if dry_run else ''}Dedup: {report['duplicates']} near-duplicate "
+            f"chunks collapsed into {report['canonical_chunks']} canonical chunks."
+        )
+        for cluster in report["clusters"][:5]:
+            print(f"  {len(cluster['duplicates'])} duplicates of {cluster['canonical']}")
+        if not dry_run:
+            with open(DEDUP_REPORT_PATH, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if dry_run:
+        print(
+            f"\n[dry-run] Planned: {totals['added']} chunks to add, "
+            f"{totals['deleted']} to delete, {totals['duplicates']} duplicates skipped, "
+            f"{totals['skipped']} unchanged files."
+        )
+        return
+
+    print("\n--- Embedding and Storing Changed Chunks ---")
+    remaining = {}
+    for plan in plans:
+        if plan["to_delete"]:
+            with store:
+                vector_store.delete(ids=plan["to_delete"])
+        remaining[plan["path"]] = len(plan["to_add"])
+    by_path = {plan["path"]: plan for plan in plans}
+
+    def finish(path):
+        plan = by_path[path]
+        manifest.update(
+            path,
+            plan["file_hash"],
+            plan["metadata_hash"],
+            plan["chunks"],
+            {alias: canonical for alias, (canonical, _) in plan["aliases"].items()},
+        )
+        manifest.save()
+
+    for path, count in remaining.items():
+        if count == 0:
+            finish(path)
+
+    work = [(chunk_id, chunk) for plan in plans for chunk_id, chunk in plan["to_add"]]
+    with ThreadPoolExecutor(max_workers=embed_concurrency) as pool:
+        batches = list(batched(work, batch_size))
+        with embed:
+            futures = {
+                pool.submit(embed_with_retry, embedding_function, [c.page_content for _, c in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # Files with a failed batch stay out of the manifest and are retried next run.
+                    print(f"Giving up on a batch of {len(batch)} chunks: {e}")
+                    if dedup_index is not None:
+                        dedup_index.remove(i for i, _ in batch)
+                    continue
+                embed.chunks += len(batch)
+                embed.tokens += sum(count_tokens(c.page_content) for _, c in batch)
+                # The vectors are in the embedding cache now, so this only writes to Chroma.
+                with store:
+                    vector_store.add_documents(
+                        documents=[c for _, c in batch], ids=[i for i, _ in batch]
+                    )
+                store.chunks += len(batch)
+                for _, chunk in batch:
+                    path = chunk.metadata["source"]
+                    remaining[path] -= 1
+                    if remaining[path] == 0:
+                        finish(path)
+
+    if dedup_index is not None:
+        dedup_index.save(DEDUP_INDEX_PATH)
+
+    # Servers search a published snapshot of this working store rather than the
+    # store itself, and switch to a new snapshot without restarting.
+    if totals["added"] or totals["deleted"] or totals["merged"] or current_version() is None:
+        with store:
+            version = publish(vector_store, quantize=NUMPY_INDEX_QUANTIZE)
+        print(f"Published index snapshot {version} to {INDEX_SNAPSHOT_DIR}; servers will switch to it.")
 
+    print("\n--- Stage Throughput ---")
+    for stage in (acquire, parse, dedupe, embed, store):
+        print(stage.report())
+    print(
+        f"\nAdded {totals['added']} chunks, deleted {totals['deleted']}, "
+        f"skipped {totals['duplicates']} duplicates and {totals['skipped']} unchanged files."
+    )
     print("\n Ingestion complete — knowledge base updated.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Incrementally ingest the curriculum into the vector store.")
+    parser.add_argument("--dry-run", action="store_true", help="Report planned adds and deletes without changing anything.")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Processes used to parse and split documents.")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS, help="Threads used to download and scrape sources.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding request.")
+    parser.add_argument("--embed-concurrency", type=int, default=EMBED_CONCURRENCY, help="Embedding requests in flight at once.")
+    parser.add_argument("--no-dedup", action="store_true", help="Store near-duplicate chunks instead of collapsing them.")
+    args = parser.parse_args()
+    main(
+        dry_run=args.dry_run,
+        parse_workers=args.parse_workers,
+        download_workers=args.download_workers,
+        batch_size=args.batch_size,
+        embed_concurrency=args.embed_concurrency,
+        dedup=not args.no_dedup,
+    )
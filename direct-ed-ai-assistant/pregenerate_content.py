@@ -0,0 +1,121 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from app.cache.content_bank import DEFAULT_DIFFICULTY, DIFFICULTY_LEVELS, ContentBank
+from app.ingestion.sources import SOURCES_CONFIG
+
+load_dotenv()
+
+REQUEST_TYPES = tuple(DEFAULT_DIFFICULTY)
+CONTENT_WORKERS = 4
+
+
+def topic_of(module: str) -> str:
+    """The module's topic without its "Module N:" prefix."""
+    return module.split(":", 1)[-1].strip()
+
+
+def plan(sources_config, request_types, difficulties, variants, done: set, modules=None):
+    """Every (request_type, track, module, difficulty, variant, source names) not yet in the bank."""
+    jobs = []
+    for config in sources_config:
+        if modules and not any(m.lower() in config["module"].lower() for m in modules):
+            continue
+        names = [s["source_name"] for s in config["sources"]]
+        for request_type in request_types:
+            for difficulty in difficulties:
+                for variant in range(variants):
+                    key = (request_type, config["track"], config["module"], difficulty, variant)
+                    if key not in done:
+                        jobs.append(key + (names,))
+    return jobs
+
+
+def generate(chain, job) -> tuple:
+    """Runs the live content chain pinned to one module; returns (output, seconds)."""
+    request_type, track, module, difficulty, variant, names = job
+    start = time.perf_counter()
+    output = chain.invoke(
+        {
+            "input": f"{topic_of(module)}: {', '.join(names)}",
+            "request_type": request_type,
+            "subject": topic_of(module),
+            "difficulty_level": difficulty,
+            "module": module,
+        }
+    )
+    return output, time.perf_counter() - start
+
+
+def main(
+    workers: int = CONTENT_WORKERS,
+    variants: int = 1,
+    request_types=REQUEST_TYPES,
+    difficulties=DIFFICULTY_LEVELS,
+    modules=None,
+    force: bool = False,
+    dry_run: bool = False,
+):
+    """Generates quizzes and flashcards for every configured module, skipping what is banked."""
+    bank = ContentBank()
+    done = set() if force else bank.keys()
+    jobs = plan(SOURCES_CONFIG, request_types, difficulties, variants, done, modules)
+    print(f"{len(jobs)} items to generate, {len(done)} already in the bank.")
+    if dry_run:
+        for request_type, track, module, difficulty, variant, _ in jobs:
+            print(f"[dry-run] would generate {request_type} / {module} / {difficulty} #{variant}")
+        return
+
+    import app.chains.router as router
+
+    chain = router.ContentGenerationChain()
+    generated, failed, seconds = 0, 0, 0.0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(generate, chain, job): job for job in jobs}
+        for future in as_completed(futures):
+            request_type, track, module, difficulty, variant, _ = futures[future]
+            label = f"{request_type} / {module} / {difficulty} #{variant}"
+            try:
+                output, took = future.result()
+            except Exception as e:
+                # Not stored, so the next run picks it up again.
+                failed += 1
+                print(f"Failed {label}: {e}")
+                continue
+            if not output.get("answer"):
+                failed += 1
+                print(f"Empty answer for {label}. Skipping.")
+                continue
+            bank.put(request_type, track, module, difficulty, variant, output, took)
+            generated += 1
+            seconds += took
+            print(f"[{generated + failed}/{len(jobs)}] {label} in {took:.1f}s")
+
+    print(
+        f"\nGenerated {generated} items in {seconds:.1f}s of generation time, {failed} failed. "
+        f"The bank now holds {bank.metrics()['entries']} items."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate quizzes and flashcards for every curriculum module.")
+    parser.add_argument("--workers", type=int, default=CONTENT_WORKERS, help="Items generated at once.")
+    parser.add_argument("--variants", type=int, default=1, help="Different versions to keep per module and difficulty.")
+    parser.add_argument("--request-types", type=lambda s: s.split(","), default=list(REQUEST_TYPES))
+    parser.add_argument("--difficulties", type=lambda s: s.split(","), default=list(DIFFICULTY_LEVELS))
+    parser.add_argument("--modules", type=lambda s: s.split(","), help="Only modules whose name contains one of these.")
+    parser.add_argument("--force", action="store_true", help="Regenerate items that are already in the bank.")
+    parser.add_argument("--dry-run", action="store_true", help="List the items that would be generated.")
+    args = parser.parse_args()
+    main(
+        workers=args.workers,
+        variants=args.variants,
+        request_types=args.request_types,
+        difficulties=args.difficulties,
+        modules=args.modules,
+        force=args.force,
+        dry_run=args.dry_run,
+    )
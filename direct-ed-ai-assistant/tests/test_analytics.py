@@ -0,0 +1,149 @@
+import json
+import os
+
+from app.analytics.store import AnalyticsStore
+from app.analytics.writer import AnalyticsWriter
+
+
+def record(n, timestamp="2024-05-01T10:15:00", request_type="tutoring", session_id="s1", **extra):
+    return {
+        "n": n,
+        "timestamp": timestamp,
+        "request_type": request_type,
+        "session_id": session_id,
+        **extra,
+    }
+
+
+def store_with(tmp_path, records):
+    store = AnalyticsStore(str(tmp_path / "analytics.sqlite3"))
+    store.insert_many(records)
+    return store
+
+
+def test_paging_with_equal_timestamps_returns_every_record_once(tmp_path):
+    store = store_with(tmp_path, [record(n) for n in range(5)])
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(limit=2, cursor=cursor)
+        seen += [r["n"] for r in page["data"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def test_query_filters_by_type_session_and_time_range(tmp_path):
+    store = store_with(
+        tmp_path,
+        [
+            record(0, timestamp="2024-05-01T09:00:00"),
+            record(1, timestamp="2024-05-01T10:00:00", request_type="quiz_generation"),
+            record(2, timestamp="2024-05-01T11:00:00", session_id="s2"),
+            record(3, timestamp="2024-05-01T12:00:00Z"),
+        ],
+    )
+
+    def numbers(**filters):
+        return [r["n"] for r in store.query(**filters)["data"]]
+
+    assert numbers(request_type="quiz_generation") == [1]
+    assert numbers(session_id="s2") == [2]
+    assert numbers(start="2024-05-01T10:00:00", end="2024-05-01T12:00:00") == [1, 2]
+    assert numbers(request_type="tutoring", session_id="s1") == [0, 3]
+
+
+def test_export_streams_every_matching_record_as_jsonl(tmp_path):
+    store = store_with(tmp_path, [record(n) for n in range(5)] + [record(5, session_id="s2")])
+
+    lines = "".join(store.export(batch_size=2, session_id="s1")).splitlines()
+
+    assert [json.loads(line)["n"] for line in lines] == [0, 1, 2, 3, 4]
+
+
+def test_summary_over_a_known_fixture(tmp_path):
+    store = store_with(
+        tmp_path,
+        [
+            record(
+                0,
+                timestamp="2024-05-01T10:05:00",
+                user_input="What is RAG? ",
+                sources_used=2,
+                llm_backend="primary",
+            ),
+            record(
+                1,
+                timestamp="2024-05-01T10:45:00",
+                user_input="what is rag?",
+                sources_used=4,
+                llm_backend="fallback",
+            ),
+            record(
+                2,
+                timestamp="2024-05-01T11:10:00",
+                request_type="quiz_generation",
+                user_input="Embeddings",
+                sources_used=3,
+                llm_backend="primary",
+            ),
+            record(3, timestamp="2024-05-01T11:20:00", request_type=None),
+        ],
+    )
+
+    summary = store.summary(top=1)
+
+    assert summary["requests"] == 4
+    assert summary["requests_by_type"] == {"tutoring": 2, "quiz_generation": 1, "unknown": 1}
+    assert summary["requests_per_hour"] == [
+        {"hour": "2024-05-01T10:00:00+00:00", "requests": 2},
+        {"hour": "2024-05-01T11:00:00+00:00", "requests": 2},
+    ]
+    assert summary["top_questions"] == [{"question": "what is rag?", "count": 2}]
+    assert summary["avg_sources_used"] == 3.0
+    assert summary["fallback_rate"] == round(1 / 3, 4)
+    assert store.summary(request_type="quiz_generation")["requests"] == 1
+
+
+class RecordingStore:
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, records):
+        self.batches.append([r["n"] for r in records])
+
+
+def read_numbers(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["n"] for line in f]
+
+
+def test_writer_flushes_full_batches_and_the_remainder_on_close(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    store = RecordingStore()
+    writer = AnalyticsWriter(path, batch_size=3, flush_seconds=60, store=store)
+
+    for n in range(7):
+        assert writer.write({"n": n})
+    writer.close()
+
+    assert store.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert read_numbers(path) == list(range(7))
+    assert writer.stats()["written"] == 7
+    assert writer.stats()["flushes"] == 3
+
+
+def test_writer_rotates_and_keeps_at_most_the_configured_backups(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    writer = AnalyticsWriter(path, batch_size=1, flush_seconds=60, max_bytes=1, backups=2)
+
+    for n in range(4):
+        writer.write({"n": n})
+    writer.close()
+
+    assert read_numbers(path) == [3]
+    assert read_numbers(f"{path}.1") == [2]
+    assert read_numbers(f"{path}.2") == [1]
+    assert not os.path.exists(f"{path}.3")
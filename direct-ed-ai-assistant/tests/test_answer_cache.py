@@ -0,0 +1,100 @@
+from langchain_core.runnables import RunnableLambda
+
+from app.cache import answers
+from app.cache.answers import SemanticAnswerCache, with_answer_cache
+
+
+SCOPE = ("tutoring", "student", None, None)
+
+
+class FixedEmbeddings:
+    """Maps each known question to a fixed vector."""
+
+    vectors = {
+        "what is rag": [1.0, 0.0, 0.0],
+        "explain rag to me": [0.96, 0.28, 0.0],
+        "what are embeddings": [0.6, 0.8, 0.0],
+    }
+
+    def embed_query(self, question):
+        return self.vectors[answers.normalize(question)]
+
+
+def cache(**kwargs):
+    return SemanticAnswerCache(embeddings=FixedEmbeddings(), index_path=None, **kwargs)
+
+
+def ask(cache, question, scope=SCOPE):
+    return cache.lookup(question, scope)[0]
+
+
+def test_similar_question_hits_only_above_the_threshold():
+    c = cache(similarity_threshold=0.95)
+    _, vector = c.lookup("What is RAG?", SCOPE)
+    c.store("What is RAG?", SCOPE, {"answer": "retrieval"}, 1.0, vector)
+
+    assert ask(c, "what is rag") == {"answer": "retrieval"}
+    assert ask(c, "Explain RAG to me") == {"answer": "retrieval"}
+    assert ask(c, "What are embeddings?") is None
+    assert ask(c, "Explain RAG to me", scope=("quiz_generation", "student", None, None)) is None
+    assert c.stats["exact_hits"] == 1
+    assert c.stats["semantic_hits"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answers.time, "time", lambda: now[0])
+    c = cache(ttl_seconds=60)
+    _, vector = c.lookup("What is RAG?", SCOPE)
+    c.store("What is RAG?", SCOPE, {"answer": "retrieval"}, 1.0, vector)
+
+    now[0] += 59
+    assert ask(c, "What is RAG?") == {"answer": "retrieval"}
+    now[0] += 2
+    assert ask(c, "Explain RAG to me") is None
+    assert ask(c, "What is RAG?") is None
+    assert c.metrics()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    c = SemanticAnswerCache(max_entries=2, index_path=None)
+    c.store("one", SCOPE, {"answer": "1"}, 0.0)
+    c.store("two", SCOPE, {"answer": "2"}, 0.0)
+    assert ask(c, "one") == {"answer": "1"}
+
+    c.store("three", SCOPE, {"answer": "3"}, 0.0)
+
+    assert ask(c, "two") is None
+    assert ask(c, "one") == {"answer": "1"}
+    assert ask(c, "three") == {"answer": "3"}
+
+
+def test_store_racing_an_index_swap_is_dropped():
+    c = SemanticAnswerCache(index_path=None)
+    generation = c.generation
+    c.invalidate()
+
+    c.store("What is RAG?", SCOPE, {"answer": "stale"}, 1.0, generation=generation)
+
+    assert ask(c, "What is RAG?") is None
+    c.store("What is RAG?", SCOPE, {"answer": "fresh"}, 1.0, generation=c.generation)
+    assert ask(c, "What is RAG?") == {"answer": "fresh"}
+
+
+def test_wrapped_chain_does_not_cache_an_answer_computed_across_a_swap():
+    c = SemanticAnswerCache(index_path=None)
+    calls = []
+
+    def generate(x):
+        calls.append(x["input"])
+        if len(calls) == 1:
+            c.invalidate()
+        return {"answer": f"answer {len(calls)}"}
+
+    chain = with_answer_cache(RunnableLambda(generate), c, lambda x: x["input"])
+    request = {"input": "What is RAG?", "request_type": "tutoring", "user_type": "student"}
+
+    assert chain.invoke(request) == {"answer": "answer 1"}
+    assert chain.invoke(request) == {"answer": "answer 2"}
+    assert chain.invoke(request) == {"answer": "answer 2"}
+    assert len(calls) == 2
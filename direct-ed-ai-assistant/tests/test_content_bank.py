@@ -0,0 +1,51 @@
+import pytest
+
+from app.cache.content_bank import ContentBank
+from app.ingestion.sources import SOURCES_CONFIG
+from app.retrieval.scoped import ScopeRouter
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = ContentBank(str(tmp_path / "content_bank.sqlite3"))
+    for config in SOURCES_CONFIG:
+        value = {"answer": config["module"], "sources": []}
+        bank.put(
+            "quiz_generation", config["track"], config["module"], "intermediate", 0, value, 1.0
+        )
+    return bank
+
+
+@pytest.fixture
+def router():
+    return ScopeRouter(
+        [
+            {"track": c["track"], "module": c["module"], "source_name": s["source_name"]}
+            for c in SOURCES_CONFIG
+            for s in c["sources"]
+        ]
+    )
+
+
+def banked(bank, router, question):
+    found = bank.match({"request_type": "quiz_generation", "input": question}, router)
+    return found and found["answer"]
+
+
+def test_module_named_in_the_question_is_served_from_the_bank(bank, router):
+    assert banked(bank, router, "quiz me on React") == "Module 2: DOM, MERN, & React"
+    assert banked(bank, router, "LLMOps quiz") == (
+        "Module 4: LLMOps & Production-Grade Gen-AI Systems"
+    )
+
+
+@pytest.mark.parametrize(
+    "question", ["Git", "FastAPI", "What is an API?", "Prompt engineering quiz"]
+)
+def test_single_lesson_is_not_served_the_module_quiz(bank, router, question):
+    assert banked(bank, router, question) is None
+
+
+def test_name_shared_by_two_modules_is_generated_live(bank, router):
+    assert banked(bank, router, "quiz on MERN") is None
+    assert bank.stats["no_module"] == 1
@@ -0,0 +1,96 @@
+from app.ingestion.dedup import DedupIndex, minhash, scope_of
+from app.ingestion.manifest import IngestManifest, chunk_ids_for, hash_file, hash_metadata
+
+LESSON = (
+    "Retrieval augmented generation pairs a language model with a search index. "
+    "Before answering, the assistant embeds the question, looks up the closest "
+    "chunks of course material, and passes them to the model as context. This "
+    "keeps answers grounded in the curriculum and lets the model cite its sources. "
+    "Chunk size matters: chunks that are too small lose context, while chunks that "
+    "are too large dilute the relevant passage with unrelated text. Most tracks use "
+    "chunks of around a thousand characters with some overlap between neighbours, "
+    "so a sentence split across a boundary still appears whole in one of them. "
+    "Embeddings are computed once at ingestion time and stored with the chunk text, "
+    "its source name, and the track and module it belongs to, so retrieval can be "
+    "filtered to the lesson a student is working on."
+)
+MLOPS = {"track": "AI Engineering", "module": "MLOps", "source_name": "Curriculum"}
+LLMOPS = {"track": "AI Engineering", "module": "LLMOps", "source_name": "Curriculum"}
+
+
+def indexed(*chunks):
+    index = DedupIndex()
+    for chunk_id, text, metadata in chunks:
+        index.add(chunk_id, minhash(text), scope_of(metadata))
+    return index
+
+
+def test_near_duplicate_in_the_same_module_matches_its_canonical_chunk():
+    index = indexed(("lesson.txt__a", LESSON, MLOPS))
+    reworded = LESSON.replace("thousand characters", "thousand chars").replace("Most", "Many")
+
+    assert index.find(minhash(reworded), scope_of(MLOPS)) == "lesson.txt__a"
+    assert index.find(minhash(reworded), scope_of(LLMOPS)) is None
+    assert index.find(minhash("A different lesson about Docker images."), scope_of(MLOPS)) is None
+
+
+def test_removed_chunks_no_longer_match_and_scopes_survive_a_reload(tmp_path):
+    index = indexed(("lesson.txt__a", LESSON, MLOPS), ("other.txt__b", LESSON, LLMOPS))
+    path = str(tmp_path / "dedup_index.npz")
+    index.remove(["lesson.txt__a"])
+    index.save(path)
+
+    loaded = DedupIndex.load(path)
+
+    assert len(loaded) == 1
+    assert not loaded.unscoped()
+    assert loaded.find(minhash(LESSON), scope_of(MLOPS)) is None
+    assert loaded.find(minhash(LESSON), scope_of(LLMOPS)) == "other.txt__b"
+
+
+def test_unchanged_file_is_skipped_on_reingest(tmp_path):
+    source = tmp_path / "lesson.txt"
+    source.write_text(LESSON, encoding="utf-8")
+    path, metadata_hash = str(source), hash_metadata(MLOPS)
+    manifest = IngestManifest(str(tmp_path / "ingest_manifest.json"))
+    manifest.update(
+        path, hash_file(path), metadata_hash, chunk_ids_for(path, [LESSON], metadata_hash)
+    )
+    manifest.save()
+
+    reloaded = IngestManifest(manifest.path)
+
+    assert reloaded.is_unchanged(path, hash_file(path), metadata_hash)
+    assert not reloaded.is_unchanged(path, hash_file(path), hash_metadata(LLMOPS))
+    source.write_text(LESSON + " Updated.", encoding="utf-8")
+    assert not reloaded.is_unchanged(path, hash_file(path), metadata_hash)
+
+
+def test_chunk_ids_diff_into_added_changed_and_removed_chunks(tmp_path):
+    path, metadata_hash = "lesson.txt", hash_metadata(MLOPS)
+    before = ["intro", "embeddings", "chunking", "summary"]
+    after = ["new opening", "intro", "embeddings", "chunking, revised"]
+    manifest = IngestManifest(str(tmp_path / "ingest_manifest.json"))
+    old_chunks = chunk_ids_for(path, before, metadata_hash)
+    manifest.update(path, "file-hash", metadata_hash, old_chunks)
+
+    old_ids = set(manifest.chunk_ids(path))
+    new_chunks = chunk_ids_for(path, after, metadata_hash)
+    added = [i for i in new_chunks if i not in old_ids]
+    removed = sorted(old_ids - set(new_chunks))
+
+    ids = dict(zip(before, old_chunks))
+    new_ids = dict(zip(after, new_chunks))
+    assert new_ids["intro"] == ids["intro"]
+    assert new_ids["embeddings"] == ids["embeddings"]
+    assert added == [new_ids["new opening"], new_ids["chunking, revised"]]
+    assert removed == sorted([ids["chunking"], ids["summary"]])
+
+
+def test_metadata_change_gives_every_chunk_a_new_id():
+    texts = ["intro", "intro"]
+    mlops = chunk_ids_for("lesson.txt", texts, hash_metadata(MLOPS))
+    llmops = chunk_ids_for("lesson.txt", texts, hash_metadata(LLMOPS))
+
+    assert len(mlops) == 2
+    assert not set(mlops) & set(llmops)
@@ -0,0 +1,56 @@
+import random
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.ingestion.pipeline import CHUNK_OVERLAP, CHUNK_SIZE
+from app.retrieval.packing import SEPARATOR, ContextPacker
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def lesson_chunks(count: int):
+    """`count` adjacent chunks of one file, split the way ingestion splits them."""
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(5000)]
+    text = " ".join(rng.choice(words) for _ in range(count * 200))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = splitter.split_text(text)[:count]
+    return [Document(page_content=c, metadata={"source": "30-days-of-react.pdf"}) for c in chunks]
+
+
+def test_stitched_passage_over_budget_is_split_back_into_chunks():
+    docs = lesson_chunks(10)
+    packer = ContextPacker(budget=lambda: 1500, count_tokens=count_tokens)
+    assert count_tokens(packer._stitch(docs)[0].text) > 1500
+
+    context = packer.pack(docs)
+
+    assert context
+    assert count_tokens(context) <= 1500
+    # The most relevant chunk is kept whole.
+    assert docs[0].page_content in context
+    assert packer.stats()["tokens_out"] > 0
+
+
+def test_single_chunk_over_budget_is_cut_to_the_budget():
+    docs = lesson_chunks(1)
+    packer = ContextPacker(budget=lambda: 100, count_tokens=count_tokens)
+
+    context = packer.pack(docs)
+
+    assert context
+    assert count_tokens(context) <= 100
+    assert docs[0].page_content.startswith(context)
+
+
+def test_passages_that_fit_are_packed_whole():
+    docs = lesson_chunks(3)
+    packer = ContextPacker(budget=lambda: 3000, count_tokens=count_tokens)
+
+    context = packer.pack(docs)
+
+    assert SEPARATOR not in context
+    assert all(doc.page_content in context for doc in docs)
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+from app.llms import routing
+from app.llms.routing import CircuitBreaker, RoutingChatModel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DelayedModel(FakeListChatModel):
+    delay: float = 0.0
+
+    def _generate(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return await super()._agenerate(*args, **kwargs)
+
+
+def routed(primary_delay: float, fallback_delay: float = 0.0, **breaker) -> RoutingChatModel:
+    model = RoutingChatModel(
+        primary=DelayedModel(responses=["primary"], delay=primary_delay),
+        fallback=DelayedModel(responses=["fallback"], delay=fallback_delay),
+        hedge_min_delay=0.05,
+        hedge_max_delay=0.05,
+    )
+    model._breaker = CircuitBreaker(**breaker)
+    return model
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(routing.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, slow_call_seconds=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.degraded
+    breaker.record_success(0.1)
+    assert not breaker.degraded
+
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_slow_success_counts_as_a_failure(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30, slow_call_seconds=1)
+    breaker.record_success(1.5)
+    breaker.record_success(2.0)
+    assert breaker.state == "open"
+    assert breaker.slow_calls == 2
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, slow_call_seconds=10)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 2
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, slow_call_seconds=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+
+
+def test_hedge_answers_while_the_degraded_primary_is_slow():
+    model = routed(primary_delay=0.5, slow_call_seconds=10)
+    model.breaker.record_failure()
+
+    assert model.invoke([HumanMessage(content="hi")]).content == "fallback"
+    counters = model.stats()["counters"]
+    assert counters["hedges_started"] == 1
+    assert counters["hedges_won"] == 1
+
+
+def test_consistently_slow_primary_opens_the_breaker():
+    model = routed(primary_delay=0.5, fallback_delay=0.01, slow_call_seconds=0.3)
+
+    async def run():
+        return [(await model.ainvoke("hi")).content for _ in range(5)]
+
+    answers = asyncio.run(run())
+    assert answers[0] == "primary"
+    assert answers[1:] == ["fallback"] * 4
+    assert model.breaker.state == "open"
+    assert model.stats()["counters"]["short_circuited"] >= 1
+
+
+def test_consistently_slow_primary_opens_the_breaker_sync():
+    model = routed(primary_delay=0.2, fallback_delay=0.01, slow_call_seconds=0.1)
+    for _ in range(4):
+        model.invoke("hi")
+    assert model.breaker.state == "open"
+    # The abandoned primaries finish later without being counted twice.
+    time.sleep(0.3)
+    assert model.breaker.consecutive_failures == 3
+
+
+def test_stream_closed_early_gives_back_the_trial():
+    model = routed(primary_delay=0.0, failure_threshold=1, reset_seconds=0)
+    model.breaker.record_failure()
+
+    async def first_chunk():
+        stream = model._astream([HumanMessage(content="hi")])
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(first_chunk())
+    assert not model.breaker.trial_in_flight
+    assert model.breaker.allow()
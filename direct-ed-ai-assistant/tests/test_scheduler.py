@@ -0,0 +1,114 @@
+import pytest
+
+from app.llms import scheduler
+from app.llms.scheduler import AdmissionRejected, LLMScheduler, QueueClass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def make(max_concurrency=1, tutoring=(3, 10, 5.0), quiz=(1, 10, 5.0)) -> LLMScheduler:
+    return LLMScheduler(
+        max_concurrency,
+        {"tutoring": QueueClass(*tutoring), "quiz_generation": QueueClass(*quiz)},
+    )
+
+
+def hold(s: LLMScheduler, request_type: str):
+    """Takes a slot without the context manager; asserts one was free."""
+    assert s._enter(request_type, lambda: None) is None
+
+
+def measured(s: LLMScheduler, clock: Clock, seconds: float) -> None:
+    with s.slot("tutoring"):
+        clock.now += seconds
+
+
+def test_freed_slots_follow_smooth_weighted_round_robin(clock):
+    s = make()
+    hold(s, "tutoring")
+    order = []
+    for i in range(8):
+        for queue in ("tutoring", "quiz_generation"):
+            s._enter(queue, lambda queue=queue: order.append(queue))
+
+    for _ in range(8):
+        s._release(None)
+
+    assert order == ["tutoring", "tutoring", "quiz_generation", "tutoring"] * 2
+    assert s.stats()["queues"]["tutoring"]["waiting"] == 2
+    assert s.stats()["queues"]["quiz_generation"]["waiting"] == 6
+
+
+def test_queued_wait_is_measured_on_the_clock(clock):
+    s = make()
+    hold(s, "tutoring")
+    s._enter("quiz_generation", lambda: None)
+    clock.now += 2.5
+
+    s._release(None)
+
+    assert s._waits["quiz_generation"].percentile(100) == pytest.approx(2.5, rel=0.2)
+
+
+def test_full_queue_is_rejected_with_429_and_a_retry_after_estimate(clock):
+    s = make(max_concurrency=2, tutoring=(3, 2, 5.0), quiz=(1, 1, 5.0))
+    measured(s, clock, 4.0)
+    hold(s, "tutoring")
+    hold(s, "tutoring")
+    s._enter("tutoring", lambda: None)
+    s._enter("tutoring", lambda: None)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        s._enter("tutoring", lambda: None)
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 6)
+
+    s._enter("quiz_generation", lambda: None)
+    with pytest.raises(AdmissionRejected) as rejected:
+        s.check("quiz_generation")
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 8)
+    assert s.stats()["queues"]["tutoring"]["rejected"] == 1
+    assert s.stats()["queues"]["quiz_generation"]["rejected"] == 1
+
+
+def test_retry_after_is_capped(clock):
+    s = make(tutoring=(3, 0, 5.0))
+    measured(s, clock, 600.0)
+    hold(s, "tutoring")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        s.check("tutoring")
+    assert rejected.value.retry_after == scheduler.MAX_RETRY_AFTER_SECONDS
+
+
+def test_wait_past_the_queue_timeout_is_rejected_with_503(clock):
+    s = make(max_concurrency=1, quiz=(1, 10, 0.0))
+    measured(s, clock, 3.0)
+    hold(s, "tutoring")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        with s.slot("quiz_generation"):
+            pass
+
+    assert (rejected.value.status_code, rejected.value.retry_after) == (503, 3)
+    stats = s.stats()["queues"]["quiz_generation"]
+    assert (stats["timed_out"], stats["waiting"], stats["admitted"]) == (1, 0, 0)
+
+
+def test_unknown_request_types_share_the_lowest_weight_queue(clock):
+    s = make()
+    hold(s, "flashcard_creation")
+
+    assert s.stats()["queues"]["quiz_generation"]["admitted"] == 1
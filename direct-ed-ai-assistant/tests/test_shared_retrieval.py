@@ -0,0 +1,45 @@
+import pytest
+
+from app.retrieval.numpy_index import NumpyIndex
+from app.retrieval.scoped import ScopedRetriever
+from app.retrieval.search import numpy_vector_lookup, numpy_vector_search
+from app.retrieval.shared import shared_candidates, shared_retrieval
+from benchmarks.stubs import StubEmbeddings, synthetic_chunks
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    texts, metadatas = synthetic_chunks(500, 0)
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    index = NumpyIndex.from_arrays(StubEmbeddings().embed_documents(texts), ids, texts, metadatas)
+    return ScopedRetriever(
+        search=numpy_vector_search(index),
+        embeddings=StubEmbeddings(),
+        vectors=numpy_vector_lookup(index),
+        adaptive=True,
+    )
+
+
+def retrieve(retriever, question: str, profile: str):
+    candidates = shared_candidates(
+        question, None, None, lambda: retriever.fetch_candidates(question)
+    )
+    return retriever.invoke(question, profile=profile, candidates=candidates)
+
+
+def test_profiles_in_one_batch_share_a_search(retriever):
+    question = "How do useState and props work together?"
+    profiles = ["quiz_generation", "flashcard_creation", "quiz_generation"]
+    with shared_retrieval() as shared:
+        batched = [retrieve(retriever, question, profile) for profile in profiles]
+
+    assert shared.stats == {"searches": 1, "shared": 2}
+    for profile, docs in zip(profiles, batched):
+        alone = [doc for doc, _ in retriever.search_with_scores(question, profile=profile)]
+        assert [d.id for d in docs] == [d.id for d in alone]
+
+
+def test_outside_a_batch_each_request_searches(retriever):
+    question = "How do useState and props work together?"
+    assert shared_candidates(question, None, None, lambda: pytest.fail("searched")) is None
+    assert retrieve(retriever, question, "quiz_generation")
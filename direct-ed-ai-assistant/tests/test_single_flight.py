@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableGenerator
+
+from app.cache.single_flight import SharedGenerationCancelled, SingleFlight, with_single_flight
+
+
+def chain(chunks_before_hang: int):
+    """The first run yields `chunks_before_hang` chunks and then hangs; later runs finish."""
+    runs = []
+
+    async def generate(input):
+        async for _ in input:
+            pass
+        runs.append(1)
+        if len(runs) == 1:
+            for chunk in ["Hel", "lo"][:chunks_before_hang]:
+                yield chunk
+            await asyncio.Event().wait()
+        for chunk in ["Hel", "lo"]:
+            yield chunk
+
+    return RunnableGenerator(generate), runs
+
+
+async def collect(runnable, x):
+    return [chunk async for chunk in runnable.astream(x)]
+
+
+async def lead_and_follow(chunks_before_hang: int):
+    bound, runs = chain(chunks_before_hang)
+    flights = SingleFlight()
+    runnable = with_single_flight(bound, flights, key_fn=lambda x: (x,))
+    leader = asyncio.create_task(collect(runnable, "hello"))
+    while not runs:
+        await asyncio.sleep(0)
+    follower = asyncio.create_task(collect(runnable, "hello"))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    leader.cancel()
+    result = await asyncio.gather(follower, return_exceptions=True)
+    return result[0], runs, flights
+
+
+def test_follower_reruns_when_the_leader_is_cancelled_before_the_first_chunk():
+    result, runs, flights = asyncio.run(lead_and_follow(0))
+    assert result == ["Hel", "lo"]
+    assert len(runs) == 2
+    assert flights.stats["leaders_cancelled"] == 1
+    assert flights.stats["followers_rerun"] == 1
+
+
+def test_follower_gets_a_public_error_when_the_leader_is_cancelled_mid_stream():
+    result, runs, flights = asyncio.run(lead_and_follow(1))
+    assert isinstance(result, SharedGenerationCancelled)
+    assert isinstance(result, RuntimeError)
+    assert str(result) == "shared generation was cancelled mid-stream"
+    assert len(runs) == 1
+
+
+def test_sync_follower_gets_a_public_error_when_the_leader_is_closed_mid_stream():
+    def generate(input):
+        for _ in input:
+            pass
+        yield "Hel"
+        yield "lo"
+
+    flights = SingleFlight()
+    runnable = with_single_flight(RunnableGenerator(generate), flights, key_fn=lambda x: (x,))
+    leader = runnable.stream("hello")
+    assert next(leader) == "Hel"
+    follower = runnable.stream("hello")
+    assert next(follower) == "Hel"
+    leader.close()
+    with pytest.raises(SharedGenerationCancelled):
+        next(follower)
@@ -0,0 +1,43 @@
+import json
+import os
+import time
+
+from app.retrieval.snapshots import RETIRED_FILE, list_versions, prune, set_current
+
+
+def published(root, *versions):
+    for version in versions:
+        os.makedirs(os.path.join(root, version))
+        with open(os.path.join(root, version, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": 1, "version": version}, f)
+
+
+def age(root, version, seconds):
+    path = os.path.join(root, version, RETIRED_FILE)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_prune_keeps_a_just_retired_version_for_the_grace_period(tmp_path):
+    root = str(tmp_path)
+    published(root, "v1", "v2", "v3")
+    for version in ("v1", "v2", "v3"):
+        set_current(version, root)
+
+    assert prune(root, keep=1, grace_seconds=40) == []
+    assert list_versions(root) == ["v1", "v2", "v3"]
+
+    age(root, "v1", 60)
+    assert prune(root, keep=1, grace_seconds=40) == ["v1"]
+    assert list_versions(root) == ["v2", "v3"]
+
+
+def test_prune_never_deletes_the_current_version(tmp_path):
+    root = str(tmp_path)
+    published(root, "v1", "v2")
+    set_current("v2", root)
+    set_current("v1", root)
+    age(root, "v2", 60)
+
+    assert prune(root, keep=0, grace_seconds=40) == ["v2"]
+    assert list_versions(root) == ["v1"]